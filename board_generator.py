@@ -0,0 +1,202 @@
+'''
+Generates synthetic KiCad PCB files of configurable size,
+for testing how placeholder detection and injection scale.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import math
+import random
+import uuid
+
+import click
+
+# The layers placeholders may be on
+PLACEHOLDER_LAYERS = ('F.Cu', 'B.Cu', 'F.SilkS', 'B.SilkS')
+# Zones can only be on copper layers
+ZONE_LAYERS = ('F.Cu', 'B.Cu')
+# Size of the grid cells (in mm) all the placeholders and decoys are placed in,
+# so they do not overlap
+CELL_SIZE = 25
+MIN_PLACEHOLDER_SIZE = 5
+MAX_PLACEHOLDER_SIZE = 20
+
+HEADER = '''(kicad_pcb (version 20211014) (generator board_generator)
+
+  (general
+    (thickness 1.6)
+  )
+
+  (paper "A4")
+  (layers
+    (0 "F.Cu" signal)
+    (31 "B.Cu" signal)
+    (34 "B.Paste" user)
+    (35 "F.Paste" user)
+    (36 "B.SilkS" user "B.Silkscreen")
+    (37 "F.SilkS" user "F.Silkscreen")
+    (38 "B.Mask" user)
+    (39 "F.Mask" user)
+    (44 "Edge.Cuts" user)
+    (48 "B.Fab" user)
+    (49 "F.Fab" user)
+  )
+
+  (setup
+    (pad_to_mask_clearance 0)
+  )
+
+  (net 0 "")
+  (net 1 "GND")
+'''
+
+class BoardGenerator:
+    '''
+    Writes the elements of a synthetic board as KiCad 6 S-expressions.
+    All the randomness comes from the seed,
+    so equal arguments always produce equal boards.
+    '''
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.cells = 0
+
+    def newUuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def nextCell(self, columns: int) -> (float, float):
+        '''
+        Returns the top-left corner (in mm) of the next free grid cell.
+        '''
+        (row, col) = divmod(self.cells, columns)
+        self.cells = self.cells + 1
+        return (10 + col * CELL_SIZE, 10 + row * CELL_SIZE)
+
+    def randomRect(self, columns: int) -> list:
+        (x, y) = self.nextCell(columns)
+        width = self.rng.uniform(MIN_PLACEHOLDER_SIZE, MAX_PLACEHOLDER_SIZE)
+        height = self.rng.uniform(MIN_PLACEHOLDER_SIZE, MAX_PLACEHOLDER_SIZE)
+        return [(x, y), (x + width, y), (x + width, y + height), (x, y + height)]
+
+    def randomDecoyPoints(self, columns: int) -> list:
+        '''
+        Returns the points of a polygon that is no placeholder:
+        a rotated rectangle, a triangle or a pentagon.
+        '''
+        (x, y) = self.nextCell(columns)
+        (center_x, center_y) = (x + CELL_SIZE / 2, y + CELL_SIZE / 2)
+        num_points = self.rng.choice((3, 4, 5))
+        angle = self.rng.uniform(0.1, 0.7)
+        radius = self.rng.uniform(MIN_PLACEHOLDER_SIZE, MAX_PLACEHOLDER_SIZE) / 2
+        return [(center_x + radius * math.cos(angle + 2 * math.pi * i / num_points),
+                center_y + radius * math.sin(angle + 2 * math.pi * i / num_points))
+                for i in range(num_points)]
+
+    @staticmethod
+    def formatPts(points) -> str:
+        return ' '.join(f'(xy {x:.4f} {y:.4f})' for (x, y) in points)
+
+    def polygon(self, points, layer) -> str:
+        return (f'  (gr_poly\n    (pts {BoardGenerator.formatPts(points)})'
+                + f' (layer "{layer}") (width 0) (fill solid) (tstamp {self.newUuid()}))\n')
+
+    def zone(self, points, layer) -> str:
+        return (f'  (zone (net 0) (net_name "") (layer "{layer}") (tstamp {self.newUuid()}) (hatch edge 0.508)\n'
+                + '    (connect_pads (clearance 0.508))\n'
+                + '    (min_thickness 0.254) (filled_areas_thickness no)\n'
+                + '    (fill (thermal_gap 0.508) (thermal_bridge_width 0.508))\n'
+                + f'    (polygon\n      (pts {BoardGenerator.formatPts(points)})\n    )\n'
+                + '  )\n')
+
+    def track(self, width_mm: float, height_mm: float) -> str:
+        (x, y) = (self.rng.uniform(0, width_mm), self.rng.uniform(0, height_mm))
+        (dx, dy) = (self.rng.uniform(-5, 5), self.rng.uniform(-5, 5))
+        layer = self.rng.choice(ZONE_LAYERS)
+        return (f'  (segment (start {x:.4f} {y:.4f}) (end {x + dx:.4f} {y + dy:.4f}) (width 0.25)'
+                + f' (layer "{layer}") (net 1) (tstamp {self.newUuid()}))\n')
+
+    def footprint(self, index: int, width_mm: float, height_mm: float) -> str:
+        (x, y) = (self.rng.uniform(0, width_mm), self.rng.uniform(0, height_mm))
+        font = '(effects (font (size 1 1) (thickness 0.15)))'
+        return (f'  (footprint "Generated:R_0805" (layer "F.Cu") (tstamp {self.newUuid()}) (at {x:.4f} {y:.4f})\n'
+                + f'    (fp_text reference "R{index + 1}" (at 0 -1.5) (layer "F.SilkS") {font} (tstamp {self.newUuid()}))\n'
+                + f'    (fp_text value "10k" (at 0 1.5) (layer "F.Fab") {font} (tstamp {self.newUuid()}))\n'
+                + f'    (pad "1" smd rect (at -1 0) (size 1 1.2) (layers "F.Cu" "F.Paste" "F.Mask") (net 1 "GND") (tstamp {self.newUuid()}))\n'
+                + f'    (pad "2" smd rect (at 1 0) (size 1 1.2) (layers "F.Cu" "F.Paste" "F.Mask") (tstamp {self.newUuid()}))\n'
+                + '  )\n')
+
+    @staticmethod
+    def outline(width_mm: float, height_mm: float) -> str:
+        corners = [(0, 0), (width_mm, 0), (width_mm, height_mm), (0, height_mm)]
+        lines = []
+        for (start, end) in zip(corners, corners[1:] + corners[:1]):
+            lines.append(f'  (gr_line (start {start[0]} {start[1]}) (end {end[0]} {end[1]}) (layer "Edge.Cuts") (width 0.1))\n')
+        return ''.join(lines)
+
+def generate_board(board_file, polygons=10, zones=0, decoys=0, tracks=0, footprints=0, seed=0) -> int:
+    '''
+    Writes a synthetic board with the given numbers of
+    placeholder polygons (on all the PLACEHOLDER_LAYERS in turn),
+    placeholder zones (on the ZONE_LAYERS in turn),
+    decoy polygons that are no placeholders, tracks and footprints.
+    Returns the number of placeholders on it.
+    '''
+    gen = BoardGenerator(seed)
+    columns = max(1, math.ceil(math.sqrt(polygons + zones + decoys)))
+    rows = max(1, math.ceil((polygons + zones + decoys) / columns))
+    (width_mm, height_mm) = (20 + columns * CELL_SIZE, 20 + rows * CELL_SIZE)
+    with open(board_file, 'w') as board_f:
+        board_f.write(HEADER)
+        board_f.write(BoardGenerator.outline(width_mm, height_mm))
+        for index in range(footprints):
+            board_f.write(gen.footprint(index, width_mm, height_mm))
+        for _ in range(tracks):
+            board_f.write(gen.track(width_mm, height_mm))
+        for index in range(zones):
+            board_f.write(gen.zone(gen.randomRect(columns), ZONE_LAYERS[index % len(ZONE_LAYERS)]))
+        for index in range(polygons):
+            board_f.write(gen.polygon(gen.randomRect(columns), PLACEHOLDER_LAYERS[index % len(PLACEHOLDER_LAYERS)]))
+        for _ in range(decoys):
+            board_f.write(gen.polygon(gen.randomDecoyPoints(columns), gen.rng.choice(PLACEHOLDER_LAYERS)))
+        board_f.write(')\n')
+    return polygons + zones
+
+def write_repl_idents_list(list_file, num_placeholders: int):
+    '''
+    Writes a replacement identifiers list file (see --repl-idents-list-file)
+    with one small QR-Code per placeholder.
+    '''
+    with open(list_file, 'w') as list_f:
+        for index in range(num_placeholders):
+            list_f.write(f"qr:Placeholder {index + 1}\n")
+
+@click.command()
+@click.option('--output', '-o', type=click.Path(dir_okay=False, file_okay=True, writable=True), required=1,
+        help='Path of the *.kicad_pcb file to generate')
+@click.option('--polygons', '-p', type=click.IntRange(min=0), default=10,
+        help='Number of placeholder polygons, spread over F.Cu, B.Cu, F.SilkS and B.SilkS (default: 10)')
+@click.option('--zones', '-z', type=click.IntRange(min=0), default=0,
+        help='Number of placeholder zones, spread over F.Cu and B.Cu (default: 0)')
+@click.option('--decoys', '-d', type=click.IntRange(min=0), default=0,
+        help='Number of polygons that are no placeholders (rotated rectangles, triangles and pentagons) (default: 0)')
+@click.option('--tracks', '-t', type=click.IntRange(min=0), default=0,
+        help='Number of tracks (default: 0)')
+@click.option('--footprints', '-f', type=click.IntRange(min=0), default=0,
+        help='Number of (two pad) footprints (default: 0)')
+@click.option('--seed', '-s', type=click.INT, default=0,
+        help='Seed for the random placement and sizes (default: 0)')
+@click.option('--repl-idents-list-file', '-l', type=click.Path(dir_okay=False, file_okay=True, writable=True),
+        default=None, help='Also write a matching replacement identifiers list file, with one QR-Code per placeholder')
+def generate_board_cli(output=None, polygons=10, zones=0, decoys=0, tracks=0, footprints=0, seed=0, repl_idents_list_file=None):
+    '''
+    Generates a synthetic KiCad PCB file,
+    for testing how the injector scales with board size.
+    '''
+    num_placeholders = generate_board(output, polygons, zones, decoys, tracks, footprints, seed)
+    if repl_idents_list_file is not None:
+        write_repl_idents_list(repl_idents_list_file, num_placeholders)
+    print(f"Written {output} with {num_placeholders} placeholders!")
+
+if __name__ == "__main__":
+    generate_board_cli()
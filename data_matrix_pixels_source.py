@@ -0,0 +1,79 @@
+'''
+Defines a class representing a black&white image of a Data Matrix code.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from pixels_source import PixelsSource
+
+import datamatrix
+import qrcode
+
+def _to_bytes(content) -> bytes:
+    return content if isinstance(content, bytes) else bytes(qrcode.QRUtil.stringToBytes(str(content)))
+
+def calc_data_matrix_size(content, border=1, shape=datamatrix.SHAPE_SQUARE) -> (int, int):
+    '''
+    Returns the size (in pixels) DataMatrixPixelsSource(content, border, shape) would have,
+    without laying out the symbol.
+    '''
+    data = _to_bytes(content)
+    (codewords, droppable) = datamatrix.encode(data)
+    found = datamatrix.find_symbol(len(codewords), droppable, shape)
+    if found is None:
+        raise RuntimeError(f"Too much data ({len(data)} bytes) for a {shape} Data Matrix")
+    (rows, cols) = found[0][:2]
+    return (cols + 2 * border, rows + 2 * border)
+
+class DataMatrixPixelsSource(PixelsSource):
+    '''
+    Allows to use a string of data as sources for black&white pixels,
+    encoded as a Data Matrix (ECC 200) code,
+    either square (10x10 to 144x144 modules),
+    or rectangular (8x18 to 16x48 modules, for thin placeholders).
+    '''
+    def __init__(self, content, border=1, shape=datamatrix.SHAPE_SQUARE):
+        '''
+        content may also be given as bytes, which are then encoded as-is.
+        shape is one of datamatrix.SHAPES.
+        '''
+        self.content = content
+        self.border = border
+        self.dm = datamatrix.DataMatrix(_to_bytes(content), shape)
+        (width, height) = self.dm.getSize()
+        self.size = (width + 2 * border, height + 2 * border)
+
+    def __str__(self):
+        content = self.content.decode('latin-1') if isinstance(self.content, bytes) else self.content
+        return f"Data-Matrix-PixelsSource[data: '{content}', size: {self.dm.cols}x{self.dm.rows}]"
+
+    def getSize(self):
+        return self.size
+
+    def getData(self):
+        data = []
+        empty_line = [0] * self.size[0]
+        for _ in range(self.border):
+            data.extend(empty_line)
+        for row in self.dm.modules:
+            data.extend([0] * self.border)
+            data.extend(1 if dark else 0 for dark in row)
+            data.extend([0] * self.border)
+        for _ in range(self.border):
+            data.extend(empty_line)
+        return data
+
+def testing():
+    '''
+    Testing - output to stdout.
+    '''
+
+    for shape in datamatrix.SHAPES:
+        pixels = DataMatrixPixelsSource("My Data", 1, shape)
+        print(pixels)
+        pixels.debug_to_stdout()
+
+if __name__ == "__main__":
+    testing()
@@ -0,0 +1,409 @@
+'''
+Data Matrix (ECC 200) generator, following ISO/IEC 16022.
+For many payloads, Data Matrix symbols need fewer modules than QR Codes,
+and they also come in rectangular shapes,
+which fit thin placeholders (e.g. silk-screen strips).
+The data is encoded in a single one of the ASCII, C40, Text and Base256
+encodation schemes, whichever results in the fewest codewords.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+SHAPE_SQUARE = 'square'
+SHAPE_RECTANGLE = 'rectangle'
+SHAPES = [SHAPE_SQUARE, SHAPE_RECTANGLE]
+
+# (symbol rows, symbol columns, data region rows, data region columns,
+# data codewords, error correction codewords, interleaved blocks),
+# smallest first; the data regions are given without their finder patterns
+SYMBOLS = {
+    SHAPE_SQUARE: [
+        (10, 10, 8, 8, 3, 5, 1),
+        (12, 12, 10, 10, 5, 7, 1),
+        (14, 14, 12, 12, 8, 10, 1),
+        (16, 16, 14, 14, 12, 12, 1),
+        (18, 18, 16, 16, 18, 14, 1),
+        (20, 20, 18, 18, 22, 18, 1),
+        (22, 22, 20, 20, 30, 20, 1),
+        (24, 24, 22, 22, 36, 24, 1),
+        (26, 26, 24, 24, 44, 28, 1),
+        (32, 32, 14, 14, 62, 36, 1),
+        (36, 36, 16, 16, 86, 42, 1),
+        (40, 40, 18, 18, 114, 48, 1),
+        (44, 44, 20, 20, 144, 56, 1),
+        (48, 48, 22, 22, 174, 68, 1),
+        (52, 52, 24, 24, 204, 84, 2),
+        (64, 64, 14, 14, 280, 112, 2),
+        (72, 72, 16, 16, 368, 144, 4),
+        (80, 80, 18, 18, 456, 192, 4),
+        (88, 88, 20, 20, 576, 224, 4),
+        (96, 96, 22, 22, 696, 272, 4),
+        (104, 104, 24, 24, 816, 336, 6),
+        (120, 120, 18, 18, 1050, 408, 6),
+        (132, 132, 20, 20, 1304, 496, 8),
+        (144, 144, 22, 22, 1558, 620, 10),
+    ],
+    SHAPE_RECTANGLE: [
+        (8, 18, 6, 16, 5, 7, 1),
+        (8, 32, 6, 14, 10, 11, 1),
+        (12, 26, 10, 24, 16, 14, 1),
+        (12, 36, 10, 16, 22, 18, 1),
+        (16, 36, 14, 16, 32, 24, 1),
+        (16, 48, 14, 22, 49, 28, 1),
+    ],
+}
+
+# Special codewords
+PAD = 129
+LATCH_C40 = 230
+LATCH_BASE256 = 231
+UPPER_SHIFT = 235
+LATCH_TEXT = 239
+UNLATCH = 254
+# The values of the shift characters within C40 and Text
+SHIFT_1 = 0
+SHIFT_2 = 1
+SHIFT_3 = 2
+C40_UPPER_SHIFT = 30
+SHIFT_2_CHARS = '!"#$%&\'()*+,-./:;<=>?@[\\]^_'
+
+def _init_gf():
+    '''
+    Builds the exponent and logarithm tables of GF(256),
+    with the prime modulus polynomial 301 used by Data Matrix.
+    '''
+    exp = [0] * 512
+    log = [0] * 256
+    value = 1
+    for i in range(255):
+        exp[i] = value
+        log[value] = i
+        value <<= 1
+        if value & 0x100:
+            value ^= 301
+    for i in range(255, 512):
+        exp[i] = exp[i - 255]
+    return (exp, log)
+
+(GF_EXP, GF_LOG) = _init_gf()
+
+def _gf_mult(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+# Generator polynomials by number of error correction codewords
+_generators = {}
+
+def _generator(ecCount: int) -> list:
+    '''
+    Returns the coefficients (highest degree first) of the product
+    of (x - 2^i), for i from 1 to ecCount.
+    '''
+    poly = _generators.get(ecCount)
+    if poly is None:
+        poly = [1]
+        for i in range(1, ecCount + 1):
+            factor = GF_EXP[i]
+            poly = [(poly[j] if j < len(poly) else 0) ^ (_gf_mult(poly[j - 1], factor) if j > 0 else 0)
+                    for j in range(len(poly) + 1)]
+        poly = _generators.setdefault(ecCount, poly)
+    return poly
+
+def reed_solomon(data: list, ecCount: int) -> list:
+    '''
+    Returns the error correction codewords for a block of data codewords.
+    '''
+    generator = _generator(ecCount)
+    ecc = [0] * ecCount
+    for codeword in data:
+        factor = codeword ^ ecc[0]
+        ecc = ecc[1:] + [0]
+        if factor != 0:
+            for i in range(ecCount):
+                ecc[i] ^= _gf_mult(generator[i + 1], factor)
+    return ecc
+
+def encode_ascii(data: bytes) -> list:
+    codewords = []
+    index = 0
+    while index < len(data):
+        byte = data[index]
+        if (index + 1 < len(data) and 0x30 <= byte <= 0x39 and 0x30 <= data[index + 1] <= 0x39):
+            # two digits in one codeword
+            codewords.append(130 + (byte - 0x30) * 10 + (data[index + 1] - 0x30))
+            index += 2
+            continue
+        if byte >= 128:
+            codewords.append(UPPER_SHIFT)
+            byte -= 128
+        codewords.append(byte + 1)
+        index += 1
+    return codewords
+
+def _triplet_values(byte: int, text: bool) -> list:
+    '''
+    Returns the C40 (or if text, Text) values encoding one byte.
+    '''
+    values = []
+    if byte >= 128:
+        values += [SHIFT_2, C40_UPPER_SHIFT]
+        byte -= 128
+    char = chr(byte)
+    if char == ' ':
+        values.append(3)
+    elif '0' <= char <= '9':
+        values.append(byte - 0x30 + 4)
+    elif ('a' <= char <= 'z') if text else ('A' <= char <= 'Z'):
+        values.append(ord(char.upper()) - 0x41 + 14)
+    elif byte < 32:
+        values += [SHIFT_1, byte]
+    elif char in SHIFT_2_CHARS:
+        values += [SHIFT_2, SHIFT_2_CHARS.index(char)]
+    elif ('A' <= char <= 'Z') if text else ('a' <= char <= 'z'):
+        values += [SHIFT_3, ord(char.lower()) - 0x60]
+    else:
+        # one of `{|}~ and DEL
+        values += [SHIFT_3, byte - 0x60]
+    return values
+
+def encode_triplets(data: bytes, text: bool = False) -> (list, bool):
+    '''
+    Encodes data in the C40 (or if text, the Text) encodation scheme.
+    The values of the last characters, that do not fill a whole triplet,
+    are encoded in ASCII, after an unlatch.
+    Returns the codewords, and whether the last one is an unlatch
+    that may be left out, if the symbol is full without it.
+    '''
+    values_per_byte = [_triplet_values(byte, text) for byte in data]
+    num_bytes = len(data)
+    num_values = sum(len(values) for values in values_per_byte)
+    while num_values % 3 != 0:
+        num_bytes -= 1
+        num_values -= len(values_per_byte[num_bytes])
+    values = [value for byte_values in values_per_byte[:num_bytes] for value in byte_values]
+    codewords = [LATCH_TEXT if text else LATCH_C40]
+    for start in range(0, len(values), 3):
+        packed = 1600 * values[start] + 40 * values[start + 1] + values[start + 2] + 1
+        codewords += [packed >> 8, packed & 0xff]
+    codewords.append(UNLATCH)
+    rest = encode_ascii(data[num_bytes:])
+    return (codewords + rest, len(rest) == 0)
+
+def _randomize_255(value: int, position: int) -> int:
+    pseudo = ((149 * position) % 255) + 1
+    return (value + pseudo) % 256
+
+def encode_base256(data: bytes) -> list:
+    '''
+    Encodes data in the Base256 encodation scheme,
+    starting at the first codeword of the symbol.
+    '''
+    if len(data) <= 249:
+        field = [len(data)]
+    else:
+        field = [len(data) // 250 + 249, len(data) % 250]
+    codewords = [LATCH_BASE256]
+    for value in field + list(data):
+        codewords.append(_randomize_255(value, len(codewords) + 1))
+    return codewords
+
+def encode(data: bytes) -> (list, bool):
+    '''
+    Encodes data in the encodation scheme resulting in the fewest codewords.
+    Returns the codewords, and whether the last one may be left out
+    (see encode_triplets()).
+    '''
+    candidates = [
+        (encode_ascii(data), False),
+        encode_triplets(data),
+        encode_triplets(data, text=True),
+        (encode_base256(data), False),
+    ]
+    return min(candidates, key=lambda candidate: len(candidate[0]) - (1 if candidate[1] else 0))
+
+def find_symbol(length: int, droppable: bool = False, shape: str = SHAPE_SQUARE) -> tuple:
+    '''
+    Returns the smallest symbol of the given shape (see SYMBOLS)
+    fitting length data codewords (or one less, if the last is droppable),
+    and whether to drop the last one; or None if none fits.
+    '''
+    for symbol in SYMBOLS[shape]:
+        capacity = symbol[4]
+        if droppable and capacity == length - 1:
+            return (symbol, True)
+        if capacity >= length:
+            return (symbol, False)
+    return None
+
+def pad(codewords: list, capacity: int) -> list:
+    '''
+    Fills the rest of the symbol capacity with pad codewords.
+    '''
+    codewords = list(codewords)
+    if len(codewords) < capacity:
+        codewords.append(PAD)
+    while len(codewords) < capacity:
+        pseudo = ((149 * (len(codewords) + 1)) % 253) + 1
+        value = PAD + pseudo
+        codewords.append(value if value <= 254 else value - 254)
+    return codewords
+
+class DataMatrix:
+    '''
+    A Data Matrix (ECC 200) symbol encoding some data (bytes),
+    of the smallest size of the given shape that fits it.
+
+    dm = DataMatrix(b'Hello')
+    for row in dm.modules:
+        for dark in row:
+            # set pixel ...
+    '''
+
+    def __init__(self, data: bytes, shape: str = SHAPE_SQUARE):
+        self.data = data
+        self.shape = shape
+        (codewords, droppable) = encode(data)
+        found = find_symbol(len(codewords), droppable, shape)
+        if found is None:
+            raise RuntimeError(f"Too much data ({len(data)} bytes) for a {shape} Data Matrix")
+        (self.symbol, drop) = found
+        if drop:
+            codewords = codewords[:-1]
+        (self.rows, self.cols, self.regionRows, self.regionCols, dataCount, ecCount, blocks) = self.symbol
+        self.codewords = self._addErrorCorrection(pad(codewords, dataCount), ecCount, blocks)
+        self.modules = self._layOut(self._placeCodewords())
+
+    def getSize(self) -> (int, int):
+        '''
+        Returns the size of the symbol as (width, height), in modules.
+        '''
+        return (self.cols, self.rows)
+
+    @staticmethod
+    def _addErrorCorrection(data: list, ecCount: int, blocks: int) -> list:
+        '''
+        Appends the error correction codewords,
+        calculated for interleaved blocks of the data.
+        '''
+        blockEcCount = ecCount // blocks
+        codewords = data + [0] * ecCount
+        for block in range(blocks):
+            ecc = reed_solomon(data[block::blocks], blockEcCount)
+            for (index, codeword) in enumerate(ecc):
+                codewords[len(data) + block + index * blocks] = codeword
+        return codewords
+
+    def _placeCodewords(self) -> list:
+        '''
+        Places the bits of the codewords into the mapping matrix
+        (all the data regions, without finder patterns),
+        as described in ISO/IEC 16022, annex F.
+        '''
+        numRows = self.rows - 2 * (self.rows // (self.regionRows + 2))
+        numCols = self.cols - 2 * (self.cols // (self.regionCols + 2))
+        matrix = [[None] * numCols for _ in range(numRows)]
+        codewords = self.codewords
+
+        def module(row, col, pos, bit):
+            if row < 0:
+                row += numRows
+                col += 4 - ((numRows + 4) % 8)
+            if col < 0:
+                col += numCols
+                row += 4 - ((numCols + 4) % 8)
+            matrix[row][col] = ((codewords[pos] >> (8 - bit)) & 1) == 1
+
+        def utah(row, col, pos):
+            module(row - 2, col - 2, pos, 1)
+            module(row - 2, col - 1, pos, 2)
+            module(row - 1, col - 2, pos, 3)
+            module(row - 1, col - 1, pos, 4)
+            module(row - 1, col, pos, 5)
+            module(row, col - 2, pos, 6)
+            module(row, col - 1, pos, 7)
+            module(row, col, pos, 8)
+
+        def corner(pos, cells):
+            for (bit, (row, col)) in enumerate(cells):
+                module(row, col, pos, bit + 1)
+
+        pos = 0
+        row = 4
+        col = 0
+        while True:
+            if row == numRows and col == 0:
+                corner(pos, [(numRows - 1, 0), (numRows - 1, 1), (numRows - 1, 2), (0, numCols - 2),
+                        (0, numCols - 1), (1, numCols - 1), (2, numCols - 1), (3, numCols - 1)])
+                pos += 1
+            if row == numRows - 2 and col == 0 and numCols % 4 != 0:
+                corner(pos, [(numRows - 3, 0), (numRows - 2, 0), (numRows - 1, 0), (0, numCols - 4),
+                        (0, numCols - 3), (0, numCols - 2), (0, numCols - 1), (1, numCols - 1)])
+                pos += 1
+            if row == numRows - 2 and col == 0 and numCols % 8 == 4:
+                corner(pos, [(numRows - 3, 0), (numRows - 2, 0), (numRows - 1, 0), (0, numCols - 2),
+                        (0, numCols - 1), (1, numCols - 1), (2, numCols - 1), (3, numCols - 1)])
+                pos += 1
+            if row == numRows + 4 and col == 2 and numCols % 8 == 0:
+                corner(pos, [(numRows - 1, 0), (numRows - 1, numCols - 1), (0, numCols - 3), (0, numCols - 2),
+                        (0, numCols - 1), (1, numCols - 3), (1, numCols - 2), (1, numCols - 1)])
+                pos += 1
+            # sweep up and to the right
+            while True:
+                if row < numRows and col >= 0 and matrix[row][col] is None:
+                    utah(row, col, pos)
+                    pos += 1
+                row -= 2
+                col += 2
+                if row < 0 or col >= numCols:
+                    break
+            row += 1
+            col += 3
+            # sweep down and to the left
+            while True:
+                if row >= 0 and col < numCols and matrix[row][col] is None:
+                    utah(row, col, pos)
+                    pos += 1
+                row += 2
+                col -= 2
+                if row >= numRows or col < 0:
+                    break
+            row += 3
+            col += 1
+            if row >= numRows and col >= numCols:
+                break
+        # the unused modules in the bottom-right corner, if any
+        if matrix[numRows - 1][numCols - 1] is None:
+            matrix[numRows - 1][numCols - 1] = True
+            matrix[numRows - 2][numCols - 2] = True
+            matrix[numRows - 1][numCols - 2] = False
+            matrix[numRows - 2][numCols - 1] = False
+        return matrix
+
+    def _layOut(self, matrix: list) -> list:
+        '''
+        Splits the mapping matrix into the data regions,
+        and surrounds each with its finder pattern:
+        solid on the left and bottom, alternating on the top and right.
+        '''
+        blockRows = self.regionRows + 2
+        blockCols = self.regionCols + 2
+        modules = []
+        for row in range(self.rows):
+            (blockRow, localRow) = divmod(row, blockRows)
+            line = []
+            for col in range(self.cols):
+                (blockCol, localCol) = divmod(col, blockCols)
+                if localCol == 0 or localRow == blockRows - 1:
+                    dark = True
+                elif localRow == 0:
+                    dark = localCol % 2 == 0
+                elif localCol == blockCols - 1:
+                    dark = localRow % 2 == 1
+                else:
+                    dark = matrix[blockRow * self.regionRows + localRow - 1][blockCol * self.regionCols + localCol - 1]
+                line.append(dark)
+            modules.append(line)
+        return modules
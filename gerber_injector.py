@@ -0,0 +1,313 @@
+'''
+Injects images and QR-Codes straight into already plotted Gerber files,
+skipping the round-trip through KiCad (re-plotting the whole board).
+This way, a single plot can be reused for many variants.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import re
+import shutil
+import string
+import time
+
+import click
+import gerber.rs274x
+
+from image_pixels_source import BINARIZE_METHODS
+from qr_code_pixels_source import MASK_PENALTY, MASK_STRATEGIES
+from placeholder2image import (PixelsSourcesCache, Replacement, ReplIdentsList,
+        expand_variables, parse_range, read_placeholders_cache, scanForPlaceholders,
+        write_placeholders_cache)
+
+NM_PER_MM = 1000000
+MM_PER_INCH = 25.4
+# Gerber X2 file functions of the layers placeholders may be on
+FILE_FUNCTIONS = {
+    'F.Cu': re.compile(r"^Copper,L1,Top"),
+    'B.Cu': re.compile(r"^Copper,L\d+,Bot"),
+    'F.SilkS': re.compile(r"^Legend,Top"),
+    'B.SilkS': re.compile(r"^Legend,Bot"),
+}
+# File names of the same layers, as generated by KiCad,
+# for Gerber files without X2 attributes
+FILE_NAME_PATTERNS = {
+    'F.Cu': re.compile(r"(-F_Cu\.[a-z0-9]+|\.gtl)$", re.IGNORECASE),
+    'B.Cu': re.compile(r"(-B_Cu\.[a-z0-9]+|\.gbl)$", re.IGNORECASE),
+    'F.SilkS': re.compile(r"(-F_Silk(S|screen)\.[a-z0-9]+|\.gto)$", re.IGNORECASE),
+    'B.SilkS': re.compile(r"(-B_Silk(S|screen)\.[a-z0-9]+|\.gbo)$", re.IGNORECASE),
+}
+# Either a proper X2 attribute, or the X1 compatible comment form
+R_FILE_FUNCTION = re.compile(r"TF\.FileFunction,([^*]*)\*")
+R_END_OF_FILE = re.compile(r"M02\*\s*$")
+
+def detect_layer(gerber_path, text) -> str:
+    '''
+    Returns the name of the KiCad layer a Gerber file was plotted from,
+    if it is one placeholders may be on, None otherwise.
+    '''
+    file_function = R_FILE_FUNCTION.search(text)
+    if file_function is not None:
+        for (layer_name, pattern) in FILE_FUNCTIONS.items():
+            if pattern.match(file_function.group(1)):
+                return layer_name
+        return None
+    for (layer_name, pattern) in FILE_NAME_PATTERNS.items():
+        if pattern.search(gerber_path):
+            return layer_name
+    return None
+
+def _extract_header(text) -> str:
+    '''
+    Returns the leading parameters (format, units, apertures, ...)
+    and comments of a Gerber file,
+    which is all that is needed to know how to write coordinates.
+    '''
+    header = []
+    for line in text.splitlines(keepends=True):
+        if not (line.startswith('%') or line.startswith('G04') or line.strip() == ''):
+            break
+        header.append(line)
+    return ''.join(header)
+
+class GerberLayer:
+    '''
+    A plotted Gerber file, to inject regions into.
+    Only its header is parsed (using pcb-tools),
+    the rest of its contents are copied through unchanged.
+    '''
+    def __init__(self, path):
+        self.path = path
+        with open(path) as gerber_f:
+            self.text = gerber_f.read()
+        self.layer_name = detect_layer(path, self.text)
+        settings = gerber.rs274x.loads(_extract_header(self.text) + 'M02*\n', path).settings
+        self.units = settings.units
+        (self.format_int, self.format_dec) = settings.format
+        self.zero_suppression = settings.zero_suppression
+
+    def __str__(self):
+        return f"Gerber-Layer[path: '{self.path}', layer: {self.layer_name}]"
+
+    def formatCoordinate(self, value_nm: int) -> str:
+        value = value_nm / NM_PER_MM
+        if self.units == 'inch':
+            value = value / MM_PER_INCH
+        value = int(round(value * 10 ** self.format_dec))
+        sign = '-' if value < 0 else ''
+        if self.zero_suppression == 'trailing':
+            digits = f"{abs(value):0{self.format_int + self.format_dec}d}".rstrip('0')
+            return sign + (digits if digits != '' else '0')
+        return sign + str(abs(value))
+
+    def _formatPoint(self, x: int, y: int, origin: (int, int), operation: str) -> str:
+        # Gerber Y points up, KiCad Y points down
+        return f"X{self.formatCoordinate(x - origin[0])}Y{self.formatCoordinate(origin[1] - y)}{operation}*\n"
+
+    def createRegions(self, rects: list, origin: (int, int)) -> str:
+        '''
+        Creates one region (G36/G37) per rectangle,
+        with rects given as (x_min, y_min, x_max, y_max)
+        in KiCad board coordinates.
+        '''
+        regions = []
+        for (x_min, y_min, x_max, y_max) in rects:
+            regions.append("G36*\n")
+            regions.append(self._formatPoint(x_min, y_min, origin, "D02"))
+            regions.append(self._formatPoint(x_max, y_min, origin, "D01"))
+            regions.append(self._formatPoint(x_max, y_max, origin, "D01"))
+            regions.append(self._formatPoint(x_min, y_max, origin, "D01"))
+            regions.append(self._formatPoint(x_min, y_min, origin, "D01"))
+            regions.append("G37*\n")
+        return ''.join(regions)
+
+    def inject(self, replacements: list, origin: (int, int), clear_placeholders: bool = True) -> str:
+        '''
+        Returns the contents of this Gerber file,
+        with the pixels of the replacements added at its end.
+        If clear_placeholders, the placeholder areas are cleared first,
+        as the placeholders themselves were plotted too,
+        including their outlines, which stick out by half their line width.
+        Openings in the solder-mask are plotted to other files,
+        and are left alone, so copper pixels stay exposed.
+        '''
+        block = ["G04 Injected by kicad-image-injector*\n", "G01*\n"]
+        if clear_placeholders:
+            block.append("%LPC*%\n")
+            clear_rects = []
+            for repl in replacements:
+                margin = (repl.placeholder.width + 1) // 2
+                clear_rects.append((repl.placeholder.top_left[0] - margin, repl.placeholder.top_left[1] - margin,
+                        repl.placeholder.bottom_right[0] + margin, repl.placeholder.bottom_right[1] + margin))
+            block.append(self.createRegions(clear_rects, origin))
+        block.append("%LPD*%\n")
+        for repl in replacements:
+            comment = re.sub(r"[*%]", "_", str(repl.pixels))
+            block.append(f"G04 {comment}*\n")
+            block.append(self.createRegions(repl.getRects(), origin))
+        block = ''.join(block)
+        end = R_END_OF_FILE.search(self.text)
+        if end is None:
+            return self.text + block
+        return self.text[:end.start()] + block + self.text[end.start():]
+
+def load_gerber_layers(gerber_dir) -> list:
+    '''
+    Loads all the Gerber files in gerber_dir
+    that were plotted from layers placeholders may be on.
+    '''
+    gerber_layers = []
+    for file_name in sorted(os.listdir(gerber_dir)):
+        path = os.path.join(gerber_dir, file_name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, errors='replace') as gerber_f:
+            head = gerber_f.read(4096)
+        if detect_layer(file_name, head) is not None:
+            gerber_layers.append(GerberLayer(path))
+    return gerber_layers
+
+def load_placeholders(input=None, placeholders_cache=None) -> (list, (int, int)):
+    '''
+    Returns the placeholders and the auxiliary origin of a board,
+    preferably from the cache file (see write_placeholders_cache()),
+    if it is not older then the board itself.
+    Otherwise the board is loaded and scanned,
+    and the cache file - if given - is (re)written.
+    '''
+    if placeholders_cache is not None and os.path.exists(placeholders_cache) and (
+            input is None or os.path.getmtime(placeholders_cache) >= os.path.getmtime(input)):
+        return read_placeholders_cache(placeholders_cache)
+    if input is None:
+        raise RuntimeError("Either --input or an existing --placeholders cache file is required!")
+    # imported here, so KiCad is only required when there is no up-to-date cache
+    import pcbnew
+
+    pcb = pcbnew.LoadBoard(input)
+    placeholders = scanForPlaceholders(pcb)
+    aux_origin = pcb.GetDesignSettings().GetAuxOrigin()
+    aux_origin = (aux_origin.x, aux_origin.y)
+    if placeholders_cache is not None:
+        write_placeholders_cache(placeholders_cache, placeholders, aux_origin)
+    return (placeholders, aux_origin)
+
+def inject_all(gerber_layers, placeholders, pixels_sources, origin: (int, int), clear_placeholders=True) -> dict:
+    '''
+    Injects the pixels sources into the Gerber layers
+    their placeholders are on.
+    Returns the new contents of the changed layers, by path.
+    '''
+    if len(pixels_sources) != len(placeholders):
+        raise RuntimeError(f"{len(placeholders)} placeholders were found "
+                + f"but {len(pixels_sources)} pixels-sources were supplied; "
+                + "they need to be the same amount!")
+    layer_replacements = {}
+    for (placeholder, pixels_source) in zip(placeholders, pixels_sources):
+        if pixels_source is not None:
+            repl = Replacement(None, placeholder, pixels_source)
+            layer_replacements.setdefault(placeholder.getLayerName(), []).append(repl)
+    gerber_texts = {}
+    for (layer_name, replacements) in layer_replacements.items():
+        layers = [gerber_layer for gerber_layer in gerber_layers if gerber_layer.layer_name == layer_name]
+        if len(layers) == 0:
+            raise RuntimeError(f"No Gerber file found for layer {layer_name}")
+        for gerber_layer in layers:
+            gerber_texts[gerber_layer.path] = gerber_layer.inject(replacements, origin, clear_placeholders)
+    return gerber_texts
+
+def write_gerbers(gerber_dir, output_dir, gerber_texts: dict):
+    '''
+    Copies all files from gerber_dir to output_dir,
+    replacing the contents of the ones in gerber_texts.
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    for file_name in sorted(os.listdir(gerber_dir)):
+        path = os.path.join(gerber_dir, file_name)
+        if not os.path.isfile(path):
+            continue
+        out_path = os.path.join(output_dir, file_name)
+        if path in gerber_texts:
+            with open(out_path, 'w') as out_f:
+                out_f.write(gerber_texts[path])
+        else:
+            shutil.copyfile(path, out_path)
+
+@click.command()
+@click.argument("repl_identifiers", type=click.STRING, nargs=-1)
+@click.option('--gerber-dir', '-g', type=click.Path(exists=True, dir_okay=True, file_okay=False, readable=True), required=1,
+        help='Directory containing the Gerber (and drill) files plotted from the board, with the placeholders still in place')
+@click.option('--output-dir', '-o', type=click.STRING, required=1,
+        help='Where to write the resulting Gerber (and drill) files to; when expanding templates (--range, --vars-csv), this is a template too')
+@click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True),
+        default=None, help='Path to the *.kicad_pcb file the Gerbers were plotted from; only loaded if --placeholders is not given or outdated')
+@click.option('--placeholders', '-p', type=click.Path(dir_okay=False, file_okay=True), envvar='PLACEHOLDERS_CACHE',
+        default=None, help='JSON file caching the placeholders of the board; written if it does not exist or is older then --input')
+@click.option('--use-aux-origin', '-a', is_flag=True,
+        help='The Gerbers were plotted relative to the auxiliary (drill/place file) origin')
+@click.option('--keep-placeholders', '-k', is_flag=True,
+        help='Do not clear the placeholder areas before injecting the pixels (use if the Gerbers were plotted without the placeholders)')
+@click.option('--images-root', '-r', type=click.Path(exists=True, dir_okay=True, file_okay=False, readable=True), envvar='IMAGES_ROOT',
+        default=None, help='Where to resolve relative image paths to (default: CWD)')
+@click.option('--repl-idents-list-file', '-l', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), envvar='REPL_IDENTS_LIST_FILE',
+        default=None, help='File that contains a list of image paths (one per line) to inject')
+@click.option('--fit', '-f', type=click.Choice(BINARIZE_METHODS), envvar='FIT',
+        default=None, help='Downsample images that are too large for their placeholder (at the minimum pixel size) to fit, binarizing them with the given method (default: fail on too large images)')
+@click.option('--range', 'ranges', type=click.STRING, multiple=True,
+        help='Treat the identifiers as templates, and create one output per value of this variable, given as NAME=START:STOP[:STEP] (STOP is exclusive)')
+@click.option('--vars-csv', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), envvar='VARS_CSV',
+        default=None, help='Treat the identifiers as templates, and create one output per row of this CSV file, which has to start with a header row, naming the variables')
+@click.option('--qr-mask', type=click.Choice(MASK_STRATEGIES), envvar='QR_MASK',
+        default=MASK_PENALTY, help='How to choose the mask pattern of QR-Codes: "penalty" as by the QR-Code specification, or "geometry", to minimize the number of regions drawn (default: penalty)')
+def inject_gerbers_cli(repl_identifiers={}, gerber_dir=None, output_dir=None, input=None, placeholders=None, use_aux_origin=False, keep_placeholders=False,
+        images_root=None, repl_idents_list_file=None, fit=None, ranges=(), vars_csv=None, qr_mask=MASK_PENALTY):
+    '''
+    Replaces all image- and QRCode-template polygons with the actual pixels,
+    directly in the Gerber files plotted from a KiCad board,
+    by adding regions to the silk-screen and copper layers.
+
+    REPL_IDENTIFIERS - see placeholder2image.py --help
+    '''
+    if images_root is None:
+        images_root = os.curdir
+    if os.path.abspath(output_dir) == os.path.abspath(gerber_dir):
+        raise RuntimeError("Gerber input and output directories can not be the same!")
+
+    repl_idents_list = ReplIdentsList(list(repl_identifiers))
+    if repl_idents_list_file is not None:
+        if len(repl_identifiers) > 0:
+            raise RuntimeError("You may not specify replacement identifiers both on the command line (REPL_IDENTIFIERS) and through a file (--repl-idents-list-file)!")
+        repl_idents_list = ReplIdentsList.read(repl_idents_list_file)
+    repl_identifiers = repl_idents_list.getFor(input if input is not None else '')
+
+    (placeholders, aux_origin) = load_placeholders(input, placeholders)
+    origin = aux_origin if use_aux_origin else (0, 0)
+    gerber_layers = load_gerber_layers(gerber_dir)
+    cache = PixelsSourcesCache()
+
+    if len(ranges) > 0 or vars_csv is not None:
+        if all(field is None for (_, field, _, _) in string.Formatter().parse(output_dir)):
+            raise RuntimeError("When expanding templates, --output-dir has to be a template too (e.g. 'gerbers-{serial}')!")
+        variants = expand_variables([parse_range(spec) for spec in ranges], vars_csv)
+    else:
+        variants = [None]
+
+    for (index, variables) in enumerate(variants):
+        start = time.perf_counter()
+        if variables is not None:
+            variables = dict({'index': index}, **variables)
+        pixels_sources = []
+        for (phi, psi) in enumerate(repl_identifiers):
+            fit_size = None
+            if fit is not None and phi < len(placeholders):
+                fit_size = placeholders[phi].getMaxPixelGrid()
+            pixels_sources.append(cache.get(images_root, psi, fit_size, fit, variables, qr_mask))
+        gerber_texts = inject_all(gerber_layers, placeholders, pixels_sources, origin, not keep_placeholders)
+        variant_output_dir = output_dir if variables is None else output_dir.format(**variables)
+        write_gerbers(gerber_dir, variant_output_dir, gerber_texts)
+        print(f"Written {variant_output_dir} ({len(gerber_texts)} Gerber files changed) in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    inject_gerbers_cli()
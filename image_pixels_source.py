@@ -10,34 +10,119 @@ from PIL import Image
 
 from pixels_source import PixelsSource
 
-def load_as_binary_image(image_path):
+BINARIZE_THRESHOLD = 'threshold'
+BINARIZE_DITHER = 'dither'
+BINARIZE_METHODS = (BINARIZE_THRESHOLD, BINARIZE_DITHER)
+
+def calc_fit_size(image_size: (int, int), max_size: (int, int)) -> (int, int):
+    '''
+    Returns the largest size with the aspect ratio of image_size
+    that fits into max_size.
+    If the image already fits, its size is returned unchanged.
+    '''
+    scale = min(max_size[0] / image_size[0], max_size[1] / image_size[1])
+    if scale >= 1:
+        return image_size
+    return (max(1, int(image_size[0] * scale)), max(1, int(image_size[1] * scale)))
+
+def read_image_size(image_path, max_size: (int, int) = None) -> (int, int):
+    '''
+    Returns the size (in pixels) an image would be loaded with
+    (see load_as_binary_image()), reading only the file header.
+    '''
+    with Image.open(image_path) as img:
+        size = img.size
+    if max_size is not None:
+        size = calc_fit_size(size, max_size)
+    return size
+
+def _reduce_to_fit(img, fit_size: (int, int)):
+    '''
+    Shrinks an image (that was not yet loaded) to exactly fit_size.
+    Where the file format supports it (e.g. JPEG),
+    the image is decoded at a reduced scale right away;
+    otherwise it is first reduced by an integer factor (cheap),
+    and only then resampled to the final size.
+    '''
+    img.draft("L", fit_size)
+    factor = min(img.size[0] // fit_size[0], img.size[1] // fit_size[1])
+    if img.mode != "L":
+        img = img.convert("L")
+    if factor >= 2:
+        img = img.reduce(factor)
+    if img.size != fit_size:
+        img = img.resize(fit_size, resample=Image.LANCZOS)
+    return img
+
+def _palette_luminance(img) -> bytes:
+    '''
+    Returns the luminance of each entry of the palette of an image,
+    exactly as converting the image to greyscale would calculate it.
+    '''
+    indices = Image.frombytes("P", (256, 1), bytes(range(256)))
+    indices.putpalette(img.getpalette())
+    return indices.convert("L").tobytes()
+
+def load_as_binary_image(image_path, max_size: (int, int) = None, binarize: str = BINARIZE_DITHER):
     '''
     Loads a pixel image from a file,
     converting it to a binary one (== black&white),
     if it is not yet one.
+    If max_size is given and the image is larger then that,
+    it gets downsampled to the largest size that fits,
+    before being binarized with the given method
+    (see BINARIZE_METHODS).
+    Bi-level images are used as they are,
+    and palette images are binarized through a lookup table in one pass,
+    unless they need to be dithered.
     '''
+    if binarize not in BINARIZE_METHODS:
+        raise RuntimeError(f"Unknown binarization method '{binarize}', choose one of: {BINARIZE_METHODS}")
     with Image.open(image_path) as img:
-        if img.mode != "1":
-            img = img.convert("L")
-            img = img.convert("1")
-        return img
+        if max_size is not None:
+            fit_size = calc_fit_size(img.size, max_size)
+            if fit_size != img.size:
+                img = _reduce_to_fit(img, fit_size)
+        if img.mode == "1":
+            img.load()
+            return img
+        palette = _palette_luminance(img) if img.mode == "P" else None
+        if palette is not None and (binarize == BINARIZE_THRESHOLD or set(palette) <= {0, 255}):
+            return img.point([255 if luminance >= 128 else 0 for luminance in palette], "1")
+        img = img.convert("L")
+        dither = Image.FLOYDSTEINBERG if binarize == BINARIZE_DITHER else Image.NONE
+        return img.convert("1", dither=dither)
 
 class ImagePixelsSource(PixelsSource):
     '''
     Allows to use pixel image files as sources for black&white pixels.
+    The pixels are kept packed, eight to a byte,
+    each row starting on a new byte.
     '''
-    def __init__(self, image_path):
+    def __init__(self, image_path, max_size: (int, int) = None, binarize: str = BINARIZE_DITHER):
+        '''
+        If max_size is given, images larger then that
+        are downsampled to fit (see load_as_binary_image()).
+        '''
         self.image_path = image_path
-        self.image = load_as_binary_image(image_path)
+        image = load_as_binary_image(image_path, max_size, binarize)
+        self.size = image.size
+        self.packed = image.tobytes()
 
     def __str__(self):
         return f"Image-PixelsSource[path: '{self.image_path}']"
 
     def getSize(self):
-        return self.image.size
+        return self.size
 
     def getData(self):
-        return self.image.getdata()
+        return Image.frombytes("1", self.size, self.packed).getdata()
+
+    def getBitRows(self):
+        (width, height) = self.size
+        stride = (width + 7) // 8
+        return [format(int.from_bytes(self.packed[row * stride:(row + 1) * stride], 'big'), f'0{stride * 8}b')[:width]
+                for row in range(height)]
 
 def testing():
     '''
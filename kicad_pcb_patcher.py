@@ -0,0 +1,252 @@
+'''
+Writes replacements into a KiCad PCB file by patching its text,
+instead of having KiCad write the whole board again.
+Only the replaced placeholders are cut out,
+and the generated footprints are inserted in their place;
+all the rest of the file stays byte-for-byte the same.
+Placeholders can also be found in the text directly,
+without loading the board.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import re
+
+NM_PER_MM = 1000000
+# The board elements that may be placeholders
+PLACEHOLDER_ELEMENTS = ('gr_poly', 'zone')
+# The first file format version (KiCad 7) that writes the line width
+# of graphic shapes as "(stroke (width ..) (type ..))"
+STROKE_FORMAT_VERSION = 20221018
+R_VERSION = re.compile(r"^\(kicad_pcb\s+\(version\s+(\d+)\)")
+R_INDENT = re.compile(r"\n([ \t]+)\(")
+# A string or a parenthesis, as they appear in S-expressions
+R_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[()]')
+R_XY = re.compile(r"\(xy\s+(-?[\d.]+)\s+(-?[\d.]+)\s*\)")
+R_LAYERS = re.compile(r'\(layers?((?:\s+(?:"[^"]*"|[^\s()"]+))+)\s*\)')
+R_LAYER_NAME = re.compile(r'"([^"]*)"|([^\s"]+)')
+# The line width of a graphic shape, in the KiCad 6 and 7+ formats
+R_WIDTH = re.compile(r"\((?:stroke\s+\()?width\s+([\d.]+)\s*\)")
+R_ANY_ID = re.compile(r'\((?:uuid|tstamp)\s+"?([0-9a-fA-F-]+)"?\)')
+
+def _find_element_end(text, start) -> int:
+    '''
+    Returns the index just after the S-expression starting at start.
+    '''
+    depth = 0
+    for token in R_TOKEN.finditer(text, start):
+        if token.group() == '(':
+            depth = depth + 1
+        elif token.group() == ')':
+            depth = depth - 1
+            if depth == 0:
+                return token.end()
+    raise RuntimeError("Unbalanced parenthesis in KiCad PCB file")
+
+def find_placeholder_element(text, element_uuid, indent) -> (int, int, str):
+    '''
+    Finds the top-level board element (see PLACEHOLDER_ELEMENTS)
+    with the given UUID in the text of a KiCad PCB file.
+    Returns its span (start of its line, end of the element),
+    and the keyword its UUID is stored under ("uuid" or "tstamp").
+    Only the element itself is scanned, not the whole file.
+    '''
+    r_id = re.compile(r'\((uuid|tstamp)\s+"?' + re.escape(element_uuid) + r'"?\)')
+    pos = text.find(element_uuid)
+    while pos >= 0:
+        # top-level elements start on their own line, indented once
+        start = text.rfind('\n' + indent + '(', 0, pos) + 1
+        name_start = start + len(indent) + 1
+        name = text[name_start:name_start + 16].split(None, 1)[0].rstrip(')')
+        if start > 0 and name in PLACEHOLDER_ELEMENTS:
+            end = _find_element_end(text, start + len(indent))
+            id_match = r_id.search(text, start, end)
+            if id_match is not None and id_match.start() <= pos < id_match.end():
+                return (start, end, id_match.group(1))
+        pos = text.find(element_uuid, pos + 1)
+    raise RuntimeError(f"Placeholder {element_uuid} not found in the KiCad PCB file")
+
+def _parse_rectangle(text, pts_start) -> ((int, int), (int, int)):
+    '''
+    Parses the "(pts ...)" list starting at pts_start,
+    returning its (top-left, bottom-right) corners in nanometers,
+    if it is an axis-aligned rectangle, or None otherwise.
+    '''
+    pts = text[pts_start:_find_element_end(text, pts_start)]
+    points = R_XY.findall(pts)
+    if len(points) != 4 or '(arc' in pts:
+        return None
+    x_s = set(int(round(float(x) * NM_PER_MM)) for (x, _) in points)
+    y_s = set(int(round(float(y) * NM_PER_MM)) for (_, y) in points)
+    if len(x_s) != 2 or len(y_s) != 2:
+        return None
+    return ((min(x_s), min(y_s)), (max(x_s), max(y_s)))
+
+def scan_placeholder_elements(text) -> list:
+    '''
+    Finds the elements in the text of a KiCad PCB file that are placeholders
+    (axis-aligned rectangles, see placeholder2image.scanForPlaceholders()),
+    without loading the board.
+    Returns their properties as dicts with the keys
+    uuid, top_left, bottom_right (in nanometers), layers (names), zone
+    and width (of the outline, in nanometers; 0 for zones);
+    zones first, each in file order.
+    '''
+    indent_match = R_INDENT.search(text)
+    indent = indent_match.group(1) if indent_match is not None else '  '
+    r_element = re.compile(r"\n" + re.escape(indent) + r"\((gr_poly|zone)\b")
+    zones = []
+    polygons = []
+    for element in r_element.finditer(text):
+        start = element.start() + 1
+        end = text.find('\n' + indent + '(', start)
+        if end < 0:
+            end = len(text)
+        zone = element.group(1) == 'zone'
+        if zone:
+            # the fill comes last, and is of no interest here
+            fill_start = text.find('(filled_polygon', start, end)
+            if fill_start >= 0:
+                end = fill_start
+            outline_start = text.find('(polygon', start, end)
+            if outline_start < 0 or text.find('(polygon', outline_start + 1, end) >= 0:
+                continue
+            pts_start = text.find('(pts', outline_start, end)
+        else:
+            pts_start = text.find('(pts', start, end)
+        if pts_start < 0:
+            continue
+        corners = _parse_rectangle(text, pts_start)
+        layers_match = R_LAYERS.search(text, start, end)
+        id_match = R_ANY_ID.search(text, start, end)
+        width_match = None if zone else R_WIDTH.search(text, start, end)
+        if corners is None or layers_match is None:
+            continue
+        props = {
+            'uuid': id_match.group(1) if id_match is not None else None,
+            'top_left': corners[0],
+            'bottom_right': corners[1],
+            'layers': [quoted or bare for (quoted, bare) in R_LAYER_NAME.findall(layers_match.group(1))],
+            'zone': zone,
+            'width': int(round(float(width_match.group(1)) * NM_PER_MM)) if width_match is not None else 0,
+        }
+        (zones if zone else polygons).append(props)
+    return zones + polygons
+
+def _format_mm(nm) -> str:
+    '''
+    Formats a length in nanometers as KiCad does, in millimeters.
+    '''
+    mm = f"{int(round(nm)) / NM_PER_MM:.6f}".rstrip('0').rstrip('.')
+    return '0' if mm == '-0' else mm
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+def _format_id(id_key: str, element_uuid: str) -> str:
+    if id_key == 'uuid':
+        return f'(uuid "{element_uuid}")'
+    return f'(tstamp {element_uuid})'
+
+def format_footprint(replacement, rects, indent, id_key, version) -> str:
+    '''
+    Formats the footprint drawing a replacement as an S-expression,
+    from its rectangles relative to the first pixel position
+    (see Replacement.getRects()).
+    The UUIDs are the same as when drawing it through KiCad
+    (see Replacement.getUuid()).
+    '''
+    inner = indent + ('\t' if indent.startswith('\t') else '  ')
+    side = 'B.Cu' if replacement.placeholder.reverse else 'F.Cu'
+    layer = replacement.placeholder.getLayerName()
+    if version >= STROKE_FORMAT_VERSION:
+        width = '(stroke (width 0) (type solid))'
+    else:
+        width = '(width 0)'
+    (pos_x, pos_y) = replacement.first_pixel_pos
+    lines = [
+        f'{indent}(footprint "" (layer "{side}")',
+        f'{inner}{_format_id(id_key, replacement.getUuid())}',
+        f'{inner}(at {_format_mm(pos_x)} {_format_mm(pos_y)})',
+        f'{inner}(descr "{_escape(f"Replaced template - {replacement.pixels}")}")',
+    ]
+    for (index, (x_min, y_min, x_max, y_max)) in enumerate(rects):
+        (x_min, y_min, x_max, y_max) = (_format_mm(x_min), _format_mm(y_min), _format_mm(x_max), _format_mm(y_max))
+        lines.append(f'{inner}(fp_poly (pts (xy {x_max} {y_max}) (xy {x_max} {y_min}) (xy {x_min} {y_min}) (xy {x_min} {y_max}))'
+                + f' (layer "{layer}") {width} (fill solid) {_format_id(id_key, replacement.getUuid(index))})')
+    lines.append(f'{indent})')
+    return '\n'.join(lines)
+
+def format_text(label, indent, id_key) -> str:
+    '''
+    Formats the text of an order label (see placeholder2image.OrderLabel)
+    as an S-expression.
+    '''
+    inner = indent + ('\t' if indent.startswith('\t') else '  ')
+    (pos_x, pos_y) = label.position
+    size = _format_mm(label.size)
+    justify = ' (justify mirror)' if label.placeholder.reverse else ''
+    return '\n'.join([
+        f'{indent}(gr_text "{_escape(label.text)}" (at {_format_mm(pos_x)} {_format_mm(pos_y)})'
+                + f' (layer "{label.placeholder.getLayerName()}") {_format_id(id_key, label.getUuid())}',
+        f'{inner}(effects (font (size {size} {size}) (thickness {_format_mm(label.thickness)})){justify})',
+        f'{indent})',
+    ])
+
+def patch_text(text, replacements, rects_cache: dict = None) -> str:
+    '''
+    Patches the text of a KiCad PCB file,
+    replacing the placeholder of each replacement with its footprint
+    (or its text, for order labels).
+    Cost scales with the number and size of the replacements,
+    not with the size of the board.
+    The rectangles of each footprint are cached in rects_cache
+    (by geometry key), which may be kept for later calls.
+    '''
+    version_match = R_VERSION.match(text)
+    version = int(version_match.group(1)) if version_match is not None else 0
+    indent_match = R_INDENT.search(text)
+    indent = indent_match.group(1) if indent_match is not None else '  '
+    newline = '\r\n' if '\r\n' in text[:1000] else '\n'
+
+    # Replacements with an equal geometry key have the same footprint contents
+    if rects_cache is None:
+        rects_cache = {}
+    edits = []
+    for repl in replacements:
+        if repl.placeholder.uuid is None:
+            raise RuntimeError("Placeholders without UUID can not be patched into a KiCad PCB file")
+        (start, end, id_key) = find_placeholder_element(text, repl.placeholder.uuid, indent)
+        if hasattr(repl, 'getRects'):
+            key = repl.getGeometryKey()
+            if key not in rects_cache:
+                rects_cache[key] = repl.getRects(relative=True)
+            element = format_footprint(repl, rects_cache[key], indent, id_key, version)
+        else:
+            element = format_text(repl, indent, id_key)
+        edits.append((start, end, element.replace('\n', newline)))
+
+    edits.sort()
+    parts = []
+    pos = 0
+    for (start, end, element) in edits:
+        if start < pos:
+            raise RuntimeError("Overlapping placeholders in KiCad PCB file")
+        parts.append(text[pos:start])
+        parts.append(element)
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+def patch_board(input, output, replacements):
+    '''
+    Writes the KiCad PCB file input to output,
+    with the placeholders of the replacements replaced by their footprints;
+    see patch_text().
+    '''
+    with open(input, encoding='utf-8', newline='') as input_f:
+        text = input_f.read()
+    with open(output, 'w', encoding='utf-8', newline='') as output_f:
+        output_f.write(patch_text(text, replacements))
@@ -0,0 +1,78 @@
+'''
+Defines a class representing a black&white image of a Micro QR-Code.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from pixels_source import PixelsSource
+
+import micro_qrcode
+import qrcode
+
+def _to_bytes(content) -> bytes:
+    return content if isinstance(content, bytes) else bytes(qrcode.QRUtil.stringToBytes(str(content)))
+
+def calc_micro_qr_code_size(content, border=1) -> (int, int):
+    '''
+    Returns the size (in pixels) MicroQrCodePixelsSource(content, border) would have,
+    from the capacity tables only, without encoding anything.
+    '''
+    data = _to_bytes(content)
+    found = micro_qrcode.min_version(data)
+    if found is None:
+        raise RuntimeError(f"Too much data ({len(data)} bytes) for a Micro QR-Code")
+    size = 11 + 2 * micro_qrcode.VERSIONS.index(found[0]) + 2 * border
+    return (size, size)
+
+class MicroQrCodePixelsSource(PixelsSource):
+    '''
+    Allows to use a short string of data as sources for black&white pixels,
+    encoded as a Micro QR-Code (versions M1 to M4, 11x11 to 17x17 modules).
+    These hold at most 35 digits, 21 alpha-numeric characters or 15 bytes,
+    but need fewer pixels than even the smallest QR-Code.
+    '''
+    def __init__(self, content, border=1, version=None):
+        '''
+        content may also be given as bytes, which are then encoded as-is.
+        If version (e.g. "M2") is None,
+        the smallest one that fits the content is used.
+        '''
+        self.content = content
+        self.border = border
+        self.qrc = micro_qrcode.MicroQRCode(_to_bytes(content), version)
+        self.len = self.qrc.getModuleCount() + (self.border * 2)
+
+    def __str__(self):
+        content = self.content.decode('latin-1') if isinstance(self.content, bytes) else self.content
+        return f"Micro-QR-Code-PixelsSource[data: '{content}', version: {self.qrc.version}]"
+
+    def getSize(self):
+        return (self.len, self.len)
+
+    def getData(self):
+        data = []
+        empty_line = [0] * self.len
+        for _ in range(self.border):
+            data.extend(empty_line)
+        for row in self.qrc.modules:
+            data.extend([0] * self.border)
+            data.extend(1 if dark else 0 for dark in row)
+            data.extend([0] * self.border)
+        for _ in range(self.border):
+            data.extend(empty_line)
+        return data
+
+def testing():
+    '''
+    Testing - output to stdout.
+    '''
+
+    for data in ("12345", "01234567", "SN-0042", "My Data"):
+        pixels = MicroQrCodePixelsSource(data, 1)
+        print(pixels)
+        pixels.debug_to_stdout()
+
+if __name__ == "__main__":
+    testing()
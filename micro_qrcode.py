@@ -0,0 +1,287 @@
+'''
+Micro QR Code (versions M1 to M4) generator,
+following ISO/IEC 18004:2015.
+Micro QR Codes have a single finder pattern,
+and need far fewer modules than even a version 1 QR Code
+(11x11 to 17x17, instead of 21x21),
+which makes them fit into small placeholders.
+The Reed-Solomon arithmetic is shared with qrcode.py.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from qrcode import BitBuffer, Polynomial, QRUtil
+
+VERSIONS = ('M1', 'M2', 'M3', 'M4')
+MODE_NUMBER = 'number'
+MODE_ALPHA_NUM = 'alpha_num'
+MODE_8BIT_BYTE = '8bit_byte'
+ALPHA_NUM_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+# The mode indicator values, and the modes supported per version
+MODE_INDICATORS = {MODE_NUMBER: 0, MODE_ALPHA_NUM: 1, MODE_8BIT_BYTE: 2}
+# Length (in bits) of the mode indicator, per version
+MODE_INDICATOR_BITS = {'M1': 0, 'M2': 1, 'M3': 2, 'M4': 3}
+# Length (in bits) of the character count indicator, per version and mode;
+# a version not supporting a mode has no entry for it
+CHAR_COUNT_BITS = {
+    'M1': {MODE_NUMBER: 3},
+    'M2': {MODE_NUMBER: 4, MODE_ALPHA_NUM: 3},
+    'M3': {MODE_NUMBER: 5, MODE_ALPHA_NUM: 4, MODE_8BIT_BYTE: 4},
+    'M4': {MODE_NUMBER: 6, MODE_ALPHA_NUM: 5, MODE_8BIT_BYTE: 5},
+}
+# Length (in bits) of the terminator, per version
+TERMINATOR_BITS = {'M1': 3, 'M2': 5, 'M3': 7, 'M4': 9}
+# Per version and error correction level:
+# (symbol number, data capacity in bits, data codewords, error correction codewords);
+# in M1 and M3, the last data codeword is only 4 bits long.
+# M1 only supports error detection, which is given as level 'L' here.
+SYMBOLS = {
+    ('M1', 'L'): (0, 20, 3, 2),
+    ('M2', 'L'): (1, 40, 5, 5),
+    ('M2', 'M'): (2, 32, 4, 6),
+    ('M3', 'L'): (3, 84, 11, 6),
+    ('M3', 'M'): (4, 68, 9, 8),
+    ('M4', 'L'): (5, 128, 16, 8),
+    ('M4', 'M'): (6, 112, 14, 10),
+    ('M4', 'Q'): (7, 80, 10, 14),
+}
+ERROR_CORRECT_LEVELS = ('L', 'M', 'Q')
+# The format information is masked differently than in QR Codes
+FORMAT_INFO_MASK = 0x4445
+PAD_CODEWORDS = (0xEC, 0x11)
+
+def _mask_function(maskPattern):
+    '''
+    The four mask patterns of Micro QR Codes
+    (equal to the QR Code patterns 001, 100, 110 and 111).
+    '''
+    return (
+        lambda i, j: i % 2 == 0,
+        lambda i, j: (i // 2 + j // 3) % 2 == 0,
+        lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
+        lambda i, j: ((i + j) % 2 + (i * j) % 3) % 2 == 0,
+    )[maskPattern]
+
+def choose_mode(data: bytes) -> str:
+    '''
+    Returns the most compact mode that can encode all of data.
+    '''
+    if len(data) > 0 and all(0x30 <= byte <= 0x39 for byte in data):
+        return MODE_NUMBER
+    if all(chr(byte) in ALPHA_NUM_CHARS for byte in data):
+        return MODE_ALPHA_NUM
+    return MODE_8BIT_BYTE
+
+def data_length_in_bits(version: str, mode: str, length: int) -> int:
+    '''
+    Returns the length of the encoded data (without terminator),
+    or None if the version does not support the mode,
+    or can not store that many characters.
+    '''
+    count_bits = CHAR_COUNT_BITS[version].get(mode)
+    if count_bits is None or length >= (1 << count_bits):
+        return None
+    if mode == MODE_NUMBER:
+        payload = 10 * (length // 3) + (0, 4, 7)[length % 3]
+    elif mode == MODE_ALPHA_NUM:
+        payload = 11 * (length // 2) + 6 * (length % 2)
+    else:
+        payload = 8 * length
+    return MODE_INDICATOR_BITS[version] + count_bits + payload
+
+def min_version(data: bytes, errorCorrectLevel: str = 'L') -> (str, str):
+    '''
+    Returns the smallest (version, error correction level) that fits data,
+    at least at errorCorrectLevel, or None if none does.
+    M1 is only used with level 'L', as it only detects errors.
+    '''
+    mode = choose_mode(data)
+    for version in VERSIONS:
+        symbol = SYMBOLS.get((version, errorCorrectLevel))
+        if symbol is None:
+            continue
+        length = data_length_in_bits(version, mode, len(data))
+        if length is not None and length <= symbol[1]:
+            return (version, errorCorrectLevel)
+    return None
+
+class MicroQRCode:
+    '''
+    A Micro QR Code encoding some data (bytes) in a single segment,
+    using the most compact mode that supports all of it.
+    If version is None, the smallest one that fits the data is used.
+
+    qr = MicroQRCode(b'12345')
+    for row in qr.modules:
+        for dark in row:
+            # set pixel ...
+    '''
+
+    def __init__(self, data: bytes, version: str = None, errorCorrectLevel: str = 'L', maskPattern: int = None):
+        self.data = data
+        self.errorCorrectLevel = errorCorrectLevel
+        if version is None:
+            found = min_version(data, errorCorrectLevel)
+            if found is None:
+                raise RuntimeError(f"Too much data ({len(data)} bytes) for a Micro QR Code")
+            version = found[0]
+        if (version, errorCorrectLevel) not in SYMBOLS:
+            raise RuntimeError(f"Micro QR Code version {version} does not support error correction level {errorCorrectLevel}")
+        self.version = version
+        self.moduleCount = 11 + 2 * VERSIONS.index(version)
+        self.mode = choose_mode(data)
+        self.codewords = self._createCodewords()
+        self.maskPattern = None
+        self.modules = []
+        self.make(maskPattern)
+
+    def getModuleCount(self):
+        return self.moduleCount
+
+    def isDark(self, row, col):
+        return self.modules[row][col]
+
+    def make(self, maskPattern=None):
+        '''
+        Lays out the modules with the given mask pattern (0 to 3),
+        or with the one the specification prefers, if None.
+        '''
+        if maskPattern is None:
+            scores = []
+            for pattern in range(4):
+                self._make(pattern)
+                scores.append((self.getMaskScore(), -pattern))
+            maskPattern = -max(scores)[1]
+        self._make(maskPattern)
+
+    def getMaskScore(self) -> int:
+        '''
+        Evaluates the current mask pattern, the higher the better:
+        only the dark modules on the right and bottom edges are counted.
+        '''
+        last = self.moduleCount - 1
+        sum1 = sum(1 for row in range(1, self.moduleCount) if self.modules[row][last])
+        sum2 = sum(1 for col in range(1, self.moduleCount) if self.modules[last][col])
+        if sum1 <= sum2:
+            return sum1 * 16 + sum2
+        return sum2 * 16 + sum1
+
+    def _encodeData(self, buf: BitBuffer):
+        buf.put(MODE_INDICATORS[self.mode], MODE_INDICATOR_BITS[self.version])
+        buf.put(len(self.data), CHAR_COUNT_BITS[self.version][self.mode])
+        if self.mode == MODE_NUMBER:
+            digits = self.data.decode('ascii')
+            for start in range(0, len(digits), 3):
+                group = digits[start:start + 3]
+                buf.put(int(group), (0, 4, 7, 10)[len(group)])
+        elif self.mode == MODE_ALPHA_NUM:
+            chars = [ALPHA_NUM_CHARS.index(chr(byte)) for byte in self.data]
+            for start in range(0, len(chars) - 1, 2):
+                buf.put(chars[start] * 45 + chars[start + 1], 11)
+            if len(chars) % 2 == 1:
+                buf.put(chars[-1], 6)
+        else:
+            for byte in self.data:
+                buf.put(byte, 8)
+
+    def _createCodewords(self) -> (list, list):
+        '''
+        Encodes the data, and appends the error correction codewords.
+        The data codewords are returned as bytes,
+        with the 4 bit long last one of M1 and M3 in the upper nibble.
+        '''
+        (_, capacity, dataCount, ecCount) = SYMBOLS[(self.version, self.errorCorrectLevel)]
+        buf = BitBuffer()
+        self._encodeData(buf)
+        if buf.getLengthInBits() > capacity:
+            raise RuntimeError(f"Too much data ({len(self.data)} bytes) for Micro QR Code version {self.version}-{self.errorCorrectLevel}")
+        # the terminator may be truncated, if the symbol is full
+        buf.put(0, min(TERMINATOR_BITS[self.version], capacity - buf.getLengthInBits()))
+        # full bytes end at the last 8 bit long data codeword
+        bytesEnd = (capacity // 8) * 8
+        if buf.getLengthInBits() < bytesEnd:
+            while buf.getLengthInBits() % 8 != 0:
+                buf.putBit(False)
+            index = 0
+            while buf.getLengthInBits() < bytesEnd:
+                buf.put(PAD_CODEWORDS[index % 2], 8)
+                index += 1
+        # the rest (of a 4 bit long codeword) is padded with zeros
+        buf.put(0, capacity - buf.getLengthInBits())
+        data = [0xff & buf.getBuffer()[i] for i in range(dataCount)]
+
+        rsPoly = QRUtil.getErrorCorrectPolynomial(ecCount)
+        modPoly = Polynomial(data, rsPoly.getLength() - 1).mod(rsPoly)
+        ecData = [0] * ecCount
+        for i in range(ecCount):
+            modIndex = i + modPoly.getLength() - ecCount
+            ecData[i] = modPoly.get(modIndex) if modIndex >= 0 else 0
+        return (data, ecData)
+
+    def _getBits(self) -> list:
+        '''
+        Returns the bits to place into the data region, in order.
+        '''
+        (_, capacity, _, _) = SYMBOLS[(self.version, self.errorCorrectLevel)]
+        (data, ecData) = self.codewords
+        bits = []
+        for (index, codeword) in enumerate(data):
+            length = min(8, capacity - index * 8)
+            bits.extend(((codeword >> (7 - i)) & 1) == 1 for i in range(length))
+        for codeword in ecData:
+            bits.extend(((codeword >> (7 - i)) & 1) == 1 for i in range(8))
+        return bits
+
+    def _setupFunctionPatterns(self):
+        count = self.moduleCount
+        self.modules = [[None] * count for i in range(count)]
+        # finder pattern, with its separator
+        for r in range(8):
+            for c in range(8):
+                self.modules[r][c] = (
+                    (r <= 6 and c <= 6)
+                    and (r in (0, 6) or c in (0, 6) or (2 <= r <= 4 and 2 <= c <= 4)))
+        # timing patterns, along the top and left edges
+        for i in range(8, count):
+            self.modules[0][i] = i % 2 == 0
+            self.modules[i][0] = i % 2 == 0
+        # reserve the format information
+        for i in range(1, 9):
+            self.modules[8][i] = False
+            self.modules[i][8] = False
+
+    def _setupFormatInfo(self, maskPattern):
+        symbolNumber = SYMBOLS[(self.version, self.errorCorrectLevel)][0]
+        data = (symbolNumber << 2) | maskPattern
+        bits = QRUtil.getBCHTypeInfo(data) ^ QRUtil.G15_MASK ^ FORMAT_INFO_MASK
+        for i in range(8):
+            # vertical, right of the finder pattern, top to bottom
+            self.modules[i + 1][8] = ((bits >> i) & 1) == 1
+            # horizontal, below the finder pattern, left to right
+            self.modules[8][i + 1] = ((bits >> (14 - i)) & 1) == 1
+
+    def _make(self, maskPattern):
+        self._setupFunctionPatterns()
+        reserved = [[cell is not None for cell in row] for row in self.modules]
+        maskFunc = _mask_function(maskPattern)
+        bits = self._getBits()
+        index = 0
+        upwards = True
+        # two module wide columns, right to left, zig-zagging up and down;
+        # there is no vertical timing pattern in the way, unlike in QR Codes
+        for col in range(self.moduleCount - 1, 0, -2):
+            rows = range(self.moduleCount - 1, -1, -1) if upwards else range(self.moduleCount)
+            for row in rows:
+                for c in (col, col - 1):
+                    if reserved[row][c]:
+                        continue
+                    dark = index < len(bits) and bits[index]
+                    index += 1
+                    if maskFunc(row, c):
+                        dark = not dark
+                    self.modules[row][c] = dark
+            upwards = not upwards
+        self.maskPattern = maskPattern
+        self._setupFormatInfo(maskPattern)
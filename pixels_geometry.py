@@ -0,0 +1,56 @@
+'''
+Converts black&white pixels into the geometry to draw.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import re
+
+from pixels_source import PixelsSource
+
+R_ON_RUN = re.compile('1+')
+R_OFF_RUN = re.compile('0+')
+
+def pixels_to_rects(pixels: PixelsSource, negative: bool = False) -> list:
+    '''
+    Covers the "on" pixels (or the "off" ones, if negative)
+    of a pixels source with axis-aligned rectangles,
+    given as (column, row, width, height), in pixels.
+    Horizontal runs of pixels are merged into a single rectangle,
+    and so are runs of the same extent in consecutive rows.
+    The rectangles are ordered by their top-left pixel,
+    top to bottom, left to right.
+    '''
+    r_run = R_OFF_RUN if negative else R_ON_RUN
+    rects = []
+    # rectangles that may still be extended downwards,
+    # by (column, width) of their bottom run
+    open_rects = {}
+    for (row, bits) in enumerate(pixels.getBitRows()):
+        runs = [(run.start(), run.end() - run.start()) for run in r_run.finditer(bits)]
+        still_open = {}
+        for run in runs:
+            rect = open_rects.get(run)
+            if rect is None:
+                rect = [run[0], row, run[1], 0]
+                rects.append(rect)
+            rect[3] = rect[3] + 1
+            still_open[run] = rect
+        open_rects = still_open
+    return [tuple(rect) for rect in rects]
+
+def testing():
+    '''
+    Testing - output to stdout.
+    '''
+    from qr_code_pixels_source import QrCodePixelsSource
+    pixels = QrCodePixelsSource("My Data", 1)
+    rects = pixels_to_rects(pixels)
+    print(f"{len(rects)} rectangles:")
+    for rect in rects:
+        print(rect)
+
+if __name__ == "__main__":
+    testing()
@@ -6,6 +6,12 @@ Defines an abstract class representing a black&white image.
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import hashlib
+
+# Converts the characters of the rows returned by PixelsSource.getBitRows()
+# to one byte per pixel
+_BIT_CHARS_TO_BYTES = bytes.maketrans(b'01', b'\x00\x01')
+
 class PixelsSource:
     '''
     Defines an abstract source of a rectangular image
@@ -30,6 +36,31 @@ class PixelsSource:
         '''
         return (0, 0)
 
+    def getBitRows(self) -> list:
+        '''
+        Returns the lines of pixels, top to bottom,
+        each as a string of '1' ("on") and '0' ("off") characters.
+        Sources that store their pixels packed override this,
+        so they never need one Python int per pixel.
+        '''
+        width = self.getSize()[0]
+        bits = ''.join('0' if pixel == 0 else '1' for pixel in self.getData())
+        return [bits[start:start + width] for start in range(0, len(bits), width)]
+
+    def getDigest(self) -> str:
+        '''
+        Returns a hash of the size and the pixels of this image.
+        It is equal for equal images, no matter where they come from.
+        '''
+        digest = getattr(self, '_digest', None)
+        if digest is None:
+            hasher = hashlib.sha1()
+            hasher.update(str(self.getSize()).encode())
+            hasher.update(''.join(self.getBitRows()).encode('ascii').translate(_BIT_CHARS_TO_BYTES))
+            digest = hasher.hexdigest()
+            self._digest = digest
+        return digest
+
     def debug_to_stdout(self) -> None:
         '''
         Prints out this image as ASCII-art onto stdout,
@@ -10,23 +10,140 @@ $ qrencode -S -v 1 -s 1 -m 1 -o qr.png "My Data"
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import concurrent.futures
+import contextlib
+import cProfile
+import csv
+import fnmatch
+import functools
+import glob
+import hashlib
+import itertools
+import json
 import os
+import pstats
 import re
+import shutil
+import string
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
 
 import click
-import pcbnew
+try:
+    import pcbnew
+except ImportError:
+    # Without KiCad, only the parts working on the board file text are available:
+    # scan_placeholders_text(), --dry-run, --patch, --watch and preview_renderer.py
+    pcbnew = None
 
 from pixels_source import PixelsSource
-from image_pixels_source import ImagePixelsSource
-from qr_code_pixels_source import QrCodePixelsSource
+from pixels_geometry import pixels_to_rects
+from image_pixels_source import ImagePixelsSource, BINARIZE_METHODS, read_image_size
+from kicad_pcb_patcher import patch_board, patch_text, scan_placeholder_elements
+from qr_code_pixels_source import QrCodePixelsSource, QrCodeTemplate, MASK_PENALTY, MASK_STRATEGIES, calc_qr_code_size, format_compact_stats
+from qr_payload import QrCompaction, TRANSFORMS as QR_TRANSFORMS, read_prefix_map
+from micro_qr_code_pixels_source import MicroQrCodePixelsSource, calc_micro_qr_code_size
+from rmqr_code_pixels_source import RmqrCodePixelsSource, calc_rmqr_code_size
+from data_matrix_pixels_source import DataMatrixPixelsSource, calc_data_matrix_size
+from datamatrix import SHAPE_SQUARE, SHAPE_RECTANGLE
 from string_pixels_source import StringPixelsSource
+from preview_renderer import PREVIEW_FORMATS, preview_path, write_preview
 
 # MIN_PIXEL_WIDTH = 0.5 * mm # TODO
 MIN_PIXEL_WIDTH = 0.5 * 100000 # TODO Is this the correct multiplier
 MIN_PIXEL_HEIGHT = MIN_PIXEL_WIDTH
 R_KICAD_PCB_EXT = re.compile(r"\.kicad_pcb$")
+# The default output paths (see generate_jobs()), including the templated ones
+R_REPLACED_PCB = re.compile(r"-REPLACED(-[^/]*)?\.kicad_pcb$")
+R_SECTION_HEADER = re.compile(r"^\[(.+)\]$")
+R_RANGE = re.compile(r"^(\w+)=(-?\d+):(-?\d+)(?::(-?\d+))?$")
 ID_PREFIX_QR_CODE = 'qr:'
+ID_PREFIX_MICRO_QR_CODE = 'mqr:'
+ID_PREFIX_RMQR_CODE = 'rmqr:'
+ID_PREFIX_DATA_MATRIX = 'dm:'
+ID_PREFIX_DATA_MATRIX_RECT = 'dmr:'
+# Data Matrix shapes, by identifier prefix
+DATA_MATRIX_SHAPES = {
+    ID_PREFIX_DATA_MATRIX: SHAPE_SQUARE,
+    ID_PREFIX_DATA_MATRIX_RECT: SHAPE_RECTANGLE,
+}
 ID_PREFIX_IMAGE = ''
+# The layer IDs of KiCad 6 to 8, by their names in pcbnew,
+# used in case pcbnew is not available
+FALLBACK_LAYER_IDS = {
+    'F_Cu': 0,
+    **{f"In{num}_Cu": num for num in range(1, 31)},
+    'B_Cu': 31,
+    'B_Adhes': 32,
+    'F_Adhes': 33,
+    'B_Paste': 34,
+    'F_Paste': 35,
+    'B_SilkS': 36,
+    'F_SilkS': 37,
+    'B_Mask': 38,
+    'F_Mask': 39,
+    'Dwgs_User': 40,
+    'Cmts_User': 41,
+    'Eco1_User': 42,
+    'Eco2_User': 43,
+    'Edge_Cuts': 44,
+    'Margin': 45,
+    'B_CrtYd': 46,
+    'F_CrtYd': 47,
+    'B_Fab': 48,
+    'F_Fab': 49,
+    **{f"User_{num}": 49 + num for num in range(1, 10)},
+}
+
+def layer_id(name: str) -> int:
+    '''
+    Returns the ID of a layer by its name in pcbnew (e.g. "F_SilkS"),
+    or None if there is no such layer.
+    '''
+    if pcbnew is None:
+        return FALLBACK_LAYER_IDS.get(name)
+    return getattr(pcbnew, name, None)
+
+def require_pcbnew():
+    if pcbnew is None:
+        raise RuntimeError("Loading and saving boards requires KiCad's python module 'pcbnew', which was not found!")
+
+F_CU = layer_id('F_Cu')
+B_CU = layer_id('B_Cu')
+F_SILKS = layer_id('F_SilkS')
+B_SILKS = layer_id('B_SilkS')
+F_MASK = layer_id('F_Mask')
+B_MASK = layer_id('B_Mask')
+# The layers placeholders may be on, by their (KiCad standard) names
+LAYER_NAMES = {
+    F_CU: 'F.Cu',
+    B_CU: 'B.Cu',
+    F_SILKS: 'F.SilkS',
+    B_SILKS: 'B.SilkS',
+}
+# The layer on the other side of the board, for each of the above
+FLIPPED_LAYERS = {
+    F_CU: B_CU,
+    B_CU: F_CU,
+    F_SILKS: B_SILKS,
+    B_SILKS: F_SILKS,
+}
+# Roughly how many rectangles are needed to draw an image,
+# per pixel (see pixels_geometry.pixels_to_rects());
+# measured on QR-Codes, other images usually need fewer
+ESTIMATED_RECTS_PER_PIXEL = 0.15
+# Values for show_order (see process_board())
+SHOW_ORDER_TEXT = 'text'
+SHOW_ORDER_RASTER = 'raster'
+# All the UUIDs of generated board elements are derived from this
+UUID_NAMESPACE = uuid.UUID('9a3c4e7e-2d1b-5f0a-8c6e-0b7d3f1e5a42')
+# How often (in seconds) to check the watched files for changes (see --watch)
+WATCH_INTERVAL = 0.5
+# Size of the grid cells of RectsIndex, in nanometers (10mm)
+RECTS_INDEX_CELL = 10000000
 
 def _minus(vec1, vec2) -> (int, int):
     return (vec1[0] - vec2[0], vec1[1] - vec2[1])
@@ -56,47 +173,170 @@ def remove_prefix(text, prefix):
         return text[len(prefix):]
     return text
 
-def ident2pixels_source(images_root, str):
+def render_ident(ident, variables: dict = None):
+    '''
+    Fills variables into a templated identifier,
+    which uses Python format syntax, e.g. "qr:https://x.org/{serial}".
+    Without variables, identifiers are used literally.
+    '''
+    if variables is None:
+        return ident
+    return ident.format(**variables)
+
+@functools.lru_cache(maxsize=None)
+def qr_code_template(template: str) -> QrCodeTemplate:
+    return QrCodeTemplate(template)
+
+def ident2pixels_source(images_root, str, fit_size: (int, int) = None, binarize: str = None, variables: dict = None, qr_mask: str = MASK_PENALTY, qr_compact: QrCompaction = None):
+    '''
+    Creates a PixelsSource from an identifier (see replace_all_cli()).
+    If fit_size is given, images larger then that (in pixels)
+    get downsampled to fit, using the binarize method
+    (see image_pixels_source.BINARIZE_METHODS).
+    If variables are given, the identifier is treated as a template
+    (see render_ident()).
+    qr_mask is the strategy to choose QR-Code mask patterns with
+    (see qr_code_pixels_source.MASK_STRATEGIES),
+    and qr_compact the optional compaction of QR-Code payloads
+    (see qr_payload.QrCompaction).
+    '''
     if str in ('', 'skip'):
         # skip replacing this viable placeholder polygon
         ps = None
     elif str.startswith(ID_PREFIX_QR_CODE):
         qr_code_data = remove_prefix(str, ID_PREFIX_QR_CODE)
-        ps = QrCodePixelsSource(qr_code_data)
+        if variables is None:
+            ps = QrCodePixelsSource(qr_code_data, maskStrategy=qr_mask, compaction=qr_compact)
+        else:
+            ps = qr_code_template(qr_code_data).createPixelsSource(variables, maskStrategy=qr_mask, compaction=qr_compact)
+    elif str.startswith(ID_PREFIX_MICRO_QR_CODE):
+        ps = MicroQrCodePixelsSource(remove_prefix(render_ident(str, variables), ID_PREFIX_MICRO_QR_CODE))
+    elif str.startswith(ID_PREFIX_RMQR_CODE):
+        ps = RmqrCodePixelsSource(remove_prefix(render_ident(str, variables), ID_PREFIX_RMQR_CODE))
+    elif str.startswith(tuple(DATA_MATRIX_SHAPES)):
+        prefix = str[:str.index(':') + 1]
+        ps = DataMatrixPixelsSource(remove_prefix(render_ident(str, variables), prefix), shape=DATA_MATRIX_SHAPES[prefix])
     elif str.startswith(ID_PREFIX_IMAGE):
-        image_path = remove_prefix(str, ID_PREFIX_IMAGE)
-        ps = ImagePixelsSource(os.path.join(images_root, image_path))
+        image_path = remove_prefix(render_ident(str, variables), ID_PREFIX_IMAGE)
+        if fit_size is None:
+            ps = ImagePixelsSource(os.path.join(images_root, image_path))
+        else:
+            ps = ImagePixelsSource(os.path.join(images_root, image_path), fit_size, binarize)
     else:
         raise RuntimeError(f"Failed to creae PixelsSource from identifier '{str}'")
     return ps
 
 class Placeholder:
+    '''
+    An axis-aligned rectangle on the board, to be replaced by pixels.
+    All the properties derived from the board element
+    are evaluated once, at construction.
+    '''
+    __slots__ = ('board_element', 'uuid', 'top_left', 'bottom_right', 'size_space',
+            'layer', 'reverse', 'silk', 'front', 'zone', 'width')
+
     def __init__(self, board_element, top_left: (int, int), bottom_right: (int, int)):
         self.board_element = board_element
+        self.uuid = self.board_element.m_Uuid.AsString()
+        self._setGeometry(top_left, bottom_right, self.board_element.GetLayerSet().Seq())
+        self.zone = self.board_element.GetClass() == "ZONE_CONTAINER"
+        # The line width the outline of the placeholder is plotted with,
+        # which sticks out of it by half of that
+        self.width = 0 if self.zone else self.board_element.GetWidth()
+
+    def _setGeometry(self, top_left: (int, int), bottom_right: (int, int), layers):
         self.top_left = top_left
         self.bottom_right = bottom_right
         self.size_space = _minus(self.bottom_right, self.top_left)
-        self.reverse = pcbnew.B_SilkS in self.board_element.GetLayerSet().Seq() or pcbnew.B_Cu in self.board_element.GetLayerSet().Seq()
+        self.layer = Placeholder._findNonMaskLayer(layers)
+        self.reverse = B_SILKS in layers or B_CU in layers
+        self.silk = F_SILKS in layers or B_SILKS in layers
+        self.front = self.layer in (F_CU, F_SILKS)
+
+    @staticmethod
+    def fromLayers(uuid: str, top_left: (int, int), bottom_right: (int, int), layers: list, zone: bool, width: int = 0):
+        '''
+        Creates a placeholder without a board element,
+        from the (sorted) IDs of the layers it is on,
+        e.g. as read from the board file text (see scan_placeholders_text()).
+        '''
+        placeholder = Placeholder.__new__(Placeholder)
+        placeholder.board_element = None
+        placeholder.uuid = uuid
+        placeholder._setGeometry(top_left, bottom_right, layers)
+        placeholder.zone = zone
+        placeholder.width = width
+        return placeholder
+
+    def toDict(self) -> dict:
+        '''
+        Returns all of this placeholders properties (but the board element)
+        in a JSON-serializable form; see Placeholder.fromDict().
+        '''
+        return {
+            'uuid': self.uuid,
+            'top_left': list(self.top_left),
+            'bottom_right': list(self.bottom_right),
+            'layer': LAYER_NAMES.get(self.layer, self.layer),
+            'reverse': self.reverse,
+            'silk': self.silk,
+            'front': self.front,
+            'zone': self.zone,
+            'width': self.width,
+        }
+
+    @staticmethod
+    def fromDict(props: dict):
+        '''
+        Recreates a placeholder from the output of Placeholder.toDict(),
+        without its board element.
+        '''
+        layer_ids = {name: layer for (layer, name) in LAYER_NAMES.items()}
+        placeholder = Placeholder.__new__(Placeholder)
+        placeholder.board_element = None
+        placeholder.uuid = props.get('uuid')
+        placeholder.top_left = tuple(props['top_left'])
+        placeholder.bottom_right = tuple(props['bottom_right'])
+        placeholder.size_space = _minus(placeholder.bottom_right, placeholder.top_left)
+        placeholder.layer = layer_ids.get(props['layer'], props['layer'])
+        placeholder.reverse = props['reverse']
+        placeholder.silk = props['silk']
+        placeholder.front = props['front']
+        placeholder.zone = props['zone']
+        placeholder.width = props.get('width', 0)
+        return placeholder
+
+    def getLayerName(self) -> str:
+        return LAYER_NAMES.get(self.layer, str(self.layer))
+
+    @staticmethod
+    def _findNonMaskLayer(layers):
+        for layer in layers:
+            if layer not in (F_MASK, B_MASK):
+                return layer
+        raise RuntimeError("No non-mask layer found!")
 
     def isSilk(self):
-        layers = self.board_element.GetLayerSet().Seq()
-        return pcbnew.F_SilkS in layers or pcbnew.B_SilkS in layers
+        return self.silk
 
     def isCopper(self):
-        return not self.isSilk()
+        return not self.silk
 
     def isFront(self):
-        return self.getLayer() in (pcbnew.F_Cu, pcbnew.F_SilkS)
+        return self.front
 
     def isZone(self):
-        return self.board_element.GetClass() == "ZONE_CONTAINER"
+        return self.zone
 
     def getLayer(self):
-        for layer in self.board_element.GetLayerSet().Seq():
-            if layer not in (pcbnew.F_Mask, pcbnew.B_Mask):
-                return layer
-        raise RuntimeError("No non-mask layer found!")
+        return self.layer
 
+    def getMaxPixelGrid(self) -> (int, int):
+        '''
+        Returns the largest number of pixels (width, height)
+        that fit into this placeholder at the minimum pixel size.
+        '''
+        return (int(self.size_space[0] // MIN_PIXEL_WIDTH), int(self.size_space[1] // MIN_PIXEL_HEIGHT))
 
     def __eq__(self, other):
         return self.isCopper() == other.isCopper() and self.isFront() == other.isFront() and self.top_left == other.top_left and self.bottom_right == other.bottom_right and self.isZone() == other.isZone()
@@ -122,12 +362,36 @@ class Placeholder:
     def __str__(self):
         return f'Placeholder[copper: {self.isCopper()}, front: {self.isFront()}, zone: {self.isZone()}, top-left: {self.top_left}, bottom-right: {self.bottom_right}]'
 
+def calc_pixel_size(size_space: (int, int), size_repl: (int, int), stretch: bool = False) -> (int, int):
+    '''
+    Returns the size of a single pixel,
+    when size_repl pixels are drawn into a placeholder of size_space;
+    square, unless stretch.
+    '''
+    maxPixelSize = _div(size_space, size_repl)
+    if stretch:
+        pixelSize = maxPixelSize
+    else:
+        minBoth = min(maxPixelSize)
+        pixelSize = (minBoth, minBoth)
+    if pixelSize[0] < MIN_PIXEL_WIDTH:
+        raise RuntimeError("Replacement image is too large (width) for the template area"
+                + " (images may be downsampled with --fit)")
+    if pixelSize[1] < MIN_PIXEL_HEIGHT:
+        raise RuntimeError("Replacement image is too large (height) for the template area"
+                + " (images may be downsampled with --fit)")
+    return pixelSize
+
 class Replacement:
     '''
     A single tempalte replacement in a KiCad PCB file.
     This keeps track of what to replace,
     and of *with* what to replace.
+    All the geometry is calculated once, at construction.
     '''
+    __slots__ = ('pcb', 'placeholder', 'stretch', 'pixels', 'negative',
+            'size_repl', 'size_pixel', 'first_pixel_pos', 'layer', 'mirror')
+
     def __init__(self, pcb, placeholder: Placeholder, pixels: PixelsSource, stretch: bool = False, negative: bool = False):
         self.pcb = pcb
         self.placeholder = placeholder
@@ -137,19 +401,12 @@ class Replacement:
         self.size_repl = self.pixels.getSize()
         self.size_pixel = self._calcPixelSize()
         self.first_pixel_pos = self._calcFirstPixelPos()
+        self.layer = self.placeholder.getLayer()
+        # On the back side, pixels are laid out from right to left
+        self.mirror = -1 if self.placeholder.reverse else 1
 
     def _calcPixelSize(self) -> (int, int):
-        maxPixelSize = _div(self.placeholder.size_space, self.size_repl)
-        if self.stretch:
-            pixelSize = maxPixelSize
-        else:
-            minBoth = min(maxPixelSize)
-            pixelSize = (minBoth, minBoth)
-        if pixelSize[0] < MIN_PIXEL_WIDTH:
-            raise RuntimeError("Replacement image is too large (width) for the template area")
-        if pixelSize[1] < MIN_PIXEL_HEIGHT:
-            raise RuntimeError("Replacement image is too large (height) for the template area")
-        return pixelSize
+        return calc_pixel_size(self.placeholder.size_space, self.size_repl, self.stretch)
 
     def _calcFirstPixelPos(self) -> (int, int):
         border = _minus(self.placeholder.size_space, _mult(self.size_repl, self.size_pixel))
@@ -157,56 +414,112 @@ class Replacement:
         if self.placeholder.reverse:
             first_pixel_pos = (self.placeholder.bottom_right[0] - border[0], self.placeholder.top_left[1] + border[1])
         else:
-            first_pixel_pos = self.placeholder.top_left + border
+            first_pixel_pos = _plus(self.placeholder.top_left, border)
         return first_pixel_pos
 
-    def _createAxisAlignedRect(self, footprint: pcbnew.FOOTPRINT, pos: (int, int), size: (int, int)):
+    def getRects(self, relative: bool = False) -> list:
+        '''
+        Returns the pixels to draw as axis-aligned rectangles
+        (x_min, y_min, x_max, y_max) in board coordinates
+        (or relative to the first pixel position, if relative),
+        with adjacent pixels merged (see pixels_geometry.pixels_to_rects()).
+        '''
+        (pixel_width, pixel_height) = self.size_pixel
+        (origin_x, origin_y) = (0, 0) if relative else self.first_pixel_pos
+        step_x = self.mirror * pixel_width
+        rects = []
+        for (col, row, width, height) in pixels_to_rects(self.pixels, self.negative):
+            x_start = origin_x + col * step_x
+            x_end = origin_x + (col + width) * step_x
+            rects.append((min(x_start, x_end), origin_y + row * pixel_height,
+                    max(x_start, x_end), origin_y + (row + height) * pixel_height))
+        return rects
+
+    def _createAxisAlignedRect(self, footprint: 'pcbnew.FOOTPRINT', x_min: int, y_min: int, x_max: int, y_max: int):
         '''
         Builds an axis-aligned rectangle (as a polygon) as a graphical element/drawing.
         '''
         polygon = pcbnew.FP_SHAPE(footprint)
         polygon.SetShape(pcbnew.S_POLYGON)
         polygon.SetWidth(0)
-        layer = self.placeholder.getLayer()
-        polygon.SetLayer(layer)
+        polygon.SetLayer(self.layer)
         polygon.GetPolyShape().NewOutline()
-        polygon.GetPolyShape().Append(pos[0] + size[0], pos[1] + size[1])
-        polygon.GetPolyShape().Append(pos[0] + size[0], pos[1])
-        polygon.GetPolyShape().Append(pos[0], pos[1])
-        polygon.GetPolyShape().Append(pos[0], pos[1] + size[1])
+        polygon.GetPolyShape().Append(x_max, y_max)
+        polygon.GetPolyShape().Append(x_max, y_min)
+        polygon.GetPolyShape().Append(x_min, y_min)
+        polygon.GetPolyShape().Append(x_min, y_max)
         polygon.SetFilled(True)
         return polygon
 
-    def _drawPixel(self, footprint: pcbnew.FOOTPRINT, index: int, pos: (int, int)):
-        footprint.Add(self._createAxisAlignedRect(footprint, pos, self.size_pixel))
-
     def drawPixels(self):
+        '''
+        Draws the pixels into a new footprint,
+        one polygon per rectangle of merged pixels (see getRects()).
+        '''
         footprint = pcbnew.FOOTPRINT(self.pcb)
         footprint.SetDescription(f"Replaced template - {self.pixels}")
-        footprint.SetLayer(self.placeholder.getLayer())
+        footprint.SetLayer(self.layer)
 
         footprint.SetPosition(pcbnew.wxPoint(self.first_pixel_pos[0], self.first_pixel_pos[1]))
-        pos = (0, 0)
-        pixel_i = 0
-        x_i = 0
-        for pixel in self.pixels.getData():
-            if (pixel != 0 and not self.negative) or (pixel == 0 and self.negative):
-                self._drawPixel(footprint, pixel_i, pos)
-            pixel_i = pixel_i + 1
-            x_i = (x_i + 1) % self.size_repl[0]
-            if x_i == 0:
-                pos_adjust = (-(self.size_pixel[0] * (self.size_repl[0] - 1)), self.size_pixel[1])
-            else:
-                pos_adjust = (self.size_pixel[0], 0)
-            if self.placeholder.reverse:
-                pos_adjust = _mult((-1, 1), pos_adjust)
-            pos = _plus(pos, pos_adjust)
+        for (x_min, y_min, x_max, y_max) in self.getRects(relative=True):
+            footprint.Add(self._createAxisAlignedRect(footprint, x_min, y_min, x_max, y_max))
+        self._assignUuids(footprint)
         self.pcb.Add(footprint)
+        return footprint
+
+    def getUuid(self, index=None) -> str:
+        '''
+        Returns a UUID for an element of the footprint of this replacement,
+        derived from the placeholder position, the pixels and the index
+        of the element within the footprint (None for the footprint itself),
+        so the same inputs always produce the same board file.
+        '''
+        name = f"{self.placeholder.top_left}/{self.placeholder.bottom_right}/{self.placeholder.getLayerName()}/{self.pixels.getDigest()}/{self.negative}/{index}"
+        return str(uuid.uuid5(UUID_NAMESPACE, name))
+
+    def _assignUuids(self, footprint: 'pcbnew.FOOTPRINT'):
+        '''
+        Replaces the random UUIDs of a footprint and its elements
+        with the ones from getUuid(), and clears its edit time.
+        '''
+        footprint.m_Uuid.Clone(pcbnew.KIID(self.getUuid()))
+        footprint.Reference().m_Uuid.Clone(pcbnew.KIID(self.getUuid('reference')))
+        footprint.Value().m_Uuid.Clone(pcbnew.KIID(self.getUuid('value')))
+        for (index, item) in enumerate(footprint.GraphicalItems()):
+            item.m_Uuid.Clone(pcbnew.KIID(self.getUuid(index)))
+        if hasattr(footprint, 'SetLastEditTime'):
+            footprint.SetLastEditTime(0)
+
+    def getGeometryKey(self, flipped: bool = False) -> tuple:
+        '''
+        Returns a key that is equal for all replacements
+        that result in the same footprint (relative to its position).
+        If flipped, the key is the one of a replacement
+        on the other side of the board.
+        '''
+        layer = FLIPPED_LAYERS.get(self.layer) if flipped else self.layer
+        return (self.pixels.getDigest(), self.size_pixel, self.negative, layer)
+
+    def placeCopy(self, footprint: 'pcbnew.FOOTPRINT', flip: bool = False):
+        '''
+        Instead of drawing all the pixels again,
+        places a copy of a footprint drawn for an other replacement
+        with an equal geometry key (see getGeometryKey()).
+        If flip, that one was on the other side of the board.
+        '''
+        copy = footprint.Duplicate().Cast()
+        if flip:
+            copy.Flip(copy.GetPosition(), True)
+        copy.SetDescription(f"Replaced template - {self.pixels}")
+        copy.SetPosition(pcbnew.wxPoint(self.first_pixel_pos[0], self.first_pixel_pos[1]))
+        self._assignUuids(copy)
+        self.pcb.Add(copy)
+        return copy
 
     def _drawCaption(self):
         # used many times...
         # half_number_of_elements = arrayToDraw.__len__() / 2
-        width = self.pixels.getSize()[0]
+        width = self.size_repl[0]
         half_width = width / 2
 
         #int((5 + half_number_of_elements) * self.size_pixel[0]))
@@ -222,9 +535,9 @@ class Replacement:
         if self.reverse:
             footprint.Value().Flip(pcbnew.wxPoint(0, 0))
             footprint.Reference().Flip(pcbnew.wxPoint(0, 0))
-            text_layer = pcbnew.B_SilkS
+            text_layer = B_SILKS
         else:
-            text_layer = pcbnew.F_SilkS
+            text_layer = F_SILKS
         footprint.Value().SetPosition(pcbnew.wxPoint(0, - text_pos))
         footprint.Reference().SetPosition(pcbnew.wxPoint(0, text_pos))
         footprint.Value().SetLayer(text_layer)
@@ -253,6 +566,7 @@ def scanForPlaceholders(pcb):
                 (top_left, bottom_right) = extractCorners(zone, poly_shape)
             except RuntimeWarning as re:
                 print("NOTE: %s" % re)
+                continue
             placeholder = Placeholder(zone, top_left, bottom_right)
             placeholders.append(placeholder)
 
@@ -263,6 +577,7 @@ def scanForPlaceholders(pcb):
                 (top_left, bottom_right) = extractCorners(drawing, poly_shape)
             except RuntimeWarning as re:
                 print("NOTE: %s" % re)
+                continue
             placeholder = Placeholder(drawing, top_left, bottom_right)
             placeholders.append(placeholder)
 
@@ -271,53 +586,1207 @@ def scanForPlaceholders(pcb):
 
     return placeholders
 
-def replace_all_with(pcb, placeholders, pixels_sources, stretch=False):
+def _layer_ids(layer_names) -> list:
+    '''
+    Converts layer names as used in KiCad PCB files to (sorted) layer IDs.
+    '''
+    layers = set()
+    for name in layer_names:
+        if name in ('*.Cu', 'F&B.Cu'):
+            layers.update((F_CU, B_CU))
+        else:
+            layer = layer_id(name.replace('.', '_'))
+            if layer is not None:
+                layers.add(layer)
+    return sorted(layers)
+
+@functools.lru_cache(maxsize=None)
+def scan_placeholders_text(board_path) -> list:
+    '''
+    Like scanForPlaceholders(), but reads the placeholders
+    straight from the text of the board file, without loading it through KiCad;
+    they have no board element then.
+    The result is cached per path.
+    '''
+    with open(board_path, encoding='utf-8') as board_f:
+        return placeholders_from_text(board_f.read())
+
+def placeholders_from_text(text) -> list:
+    '''
+    Reads the placeholders straight from the text of a KiCad PCB file
+    (see scan_placeholders_text()).
+    '''
+    placeholders = []
+    for props in scan_placeholder_elements(text):
+        layers = _layer_ids(props['layers'])
+        if len(layers) > 0:
+            placeholders.append(Placeholder.fromLayers(props['uuid'], props['top_left'], props['bottom_right'],
+                    layers, props['zone'], props['width']))
+    placeholders.sort()
+    return placeholders
+
+def write_placeholders_cache(cache_file, placeholders, aux_origin: (int, int) = (0, 0)):
+    '''
+    Stores the (sorted) placeholders of a board in a JSON file,
+    so they can be used without loading the board again;
+    see read_placeholders_cache().
+    '''
+    with open(cache_file, 'w') as cache_f:
+        json.dump({
+            'aux_origin': list(aux_origin),
+            'placeholders': [placeholder.toDict() for placeholder in placeholders],
+        }, cache_f, indent=2)
+
+def read_placeholders_cache(cache_file) -> (list, (int, int)):
+    '''
+    Reads placeholders stored with write_placeholders_cache().
+    Returns the placeholders (without board elements)
+    and the boards auxiliary (drill/place file) origin.
+    '''
+    with open(cache_file) as cache_f:
+        cache = json.load(cache_f)
+    placeholders = [Placeholder.fromDict(props) for props in cache['placeholders']]
+    return (placeholders, tuple(cache['aux_origin']))
+
+class CachedPixelsSource(PixelsSource):
+    '''
+    Stands in for the pixels source of a footprint
+    loaded from a FootprintLibraryCache,
+    which only knows the size and the digest of the pixels,
+    as that is all that is needed to place a copy of the footprint.
+    '''
+    def __init__(self, size: (int, int), digest: str, description: str, footprint):
+        self.size = size
+        self._digest = digest
+        self.description = description
+        self.footprint = footprint
+
+    def __str__(self):
+        return self.description
+
+    def getSize(self):
+        return self.size
+
+    def getData(self):
+        raise RuntimeError(f"The pixels of the cached footprint '{self.footprint.GetFPID().GetLibItemName()}' are not available")
+
+class FootprintLibraryCache:
+    '''
+    A KiCad footprint library (a "*.pretty" directory)
+    of the footprints drawn for replacements,
+    named by a hash of everything they are made from
+    (see getName()), so later runs just load them,
+    without even creating their pixels sources.
+    The footprints are stored on the layer they were drawn on.
+    '''
+    # Prefix of the descriptions of the drawn footprints
+    DESCRIPTION_PREFIX = "Replaced template - "
+
+    def __init__(self, library_dir):
+        self.library_dir = library_dir
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.library_dir, exist_ok=True)
+
+    @staticmethod
+    def getName(images_root, ident, placeholder: Placeholder, fit: str = None, variables: dict = None, qr_mask: str = MASK_PENALTY, qr_compact: QrCompaction = None) -> str:
+        '''
+        Returns the name of the footprint for an identifier in a placeholder,
+        derived from the rendered identifier, the content of the image file
+        (for images), the size and layer of the placeholder and the settings
+        the pixels source depends on,
+        or None if the placeholder is skipped.
+        '''
+        rendered = render_ident(ident, variables)
+        if rendered in ('', 'skip'):
+            return None
+        compaction = None if qr_compact is None else (qr_compact.transforms, qr_compact.prefix_map)
+        parts = [rendered, placeholder.size_space, placeholder.getLayer(), placeholder.reverse, fit, qr_mask, compaction]
+        if depends_on_fit_size(rendered):
+            # an image
+            parts.append(file_digest(os.path.join(images_root, remove_prefix(rendered, ID_PREFIX_IMAGE))))
+        layer_name = placeholder.getLayerName().replace('.', '_')
+        return f"{hashlib.sha256(repr(parts).encode()).hexdigest()[:40]}-{layer_name}"
+
+    def getPath(self, name) -> str:
+        return os.path.join(self.library_dir, name + '.kicad_mod')
+
+    def load(self, name):
+        '''
+        Returns a CachedPixelsSource holding the cached footprint
+        of the given name, or None if there is none yet.
+        '''
+        if not os.path.exists(self.getPath(name)):
+            return None
+        footprint = pcbnew.FootprintLoad(self.library_dir, name)
+        if footprint is None:
+            return None
+        # see store()
+        (size, digest) = footprint.GetKeywords().split(' ')
+        (width, height) = size.split('x')
+        description = remove_prefix(footprint.GetDescription(), FootprintLibraryCache.DESCRIPTION_PREFIX)
+        return CachedPixelsSource((int(width), int(height)), digest, description, footprint)
+
+    def lookup(self, images_root, identifiers, placeholders, fit: str = None, variables: dict = None, qr_mask: str = MASK_PENALTY, qr_compact: QrCompaction = None, load: bool = True) -> (list, list):
+        '''
+        Looks up the cached footprint for each identifier and its placeholder.
+        Returns the footprint names (see getName()),
+        and a future for each cached one (None for the others),
+        resolving to its CachedPixelsSource,
+        to be passed to submit_pixels_sources(),
+        so only the pixels sources of the misses get created.
+        If not load, only the names are returned.
+        '''
+        names = [None] * len(identifiers)
+        futures = [None] * len(identifiers)
+        if len(placeholders) != len(identifiers):
+            # replace_all_with() reports this
+            return (names, futures)
+        for (phi, ident) in enumerate(identifiers):
+            names[phi] = FootprintLibraryCache.getName(images_root, ident, placeholders[phi], fit, variables, qr_mask, qr_compact)
+            if names[phi] is None or not load:
+                continue
+            pixels = self.load(names[phi])
+            if pixels is None:
+                self.misses = self.misses + 1
+            else:
+                self.hits = self.hits + 1
+                futures[phi] = concurrent.futures.Future()
+                futures[phi].set_result(pixels)
+        return (names, futures)
+
+    def store(self, name, repl: Replacement, footprint: 'pcbnew.FOOTPRINT'):
+        copy = footprint.Duplicate().Cast()
+        copy.SetFPID(pcbnew.LIB_ID('', name))
+        # What is needed to place it, without the pixels source (see load())
+        (width, height) = repl.size_repl
+        copy.SetKeywords(f"{width}x{height} {repl.pixels.getDigest()}")
+        # Written to a temporary library first, and then moved into place,
+        # so other processes (see --jobs) never load a partially written file
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', suffix='.pretty', dir=self.library_dir)
+        try:
+            pcbnew.FootprintSave(tmp_dir, copy)
+            os.replace(os.path.join(tmp_dir, name + '.kicad_mod'), self.getPath(name))
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def replace_all_with(pcb, placeholders, pixels_sources, stretch=False, draw=True, footprint_cache: FootprintLibraryCache = None, footprint_names=None):
+    '''
+    Replaces each placeholder with the pixels source of the same index,
+    skipping the ones where that is None.
+    If not draw, the board is left untouched,
+    and only the replacements get calculated
+    (see kicad_pcb_patcher.patch_board()).
+    Cached footprints (see FootprintLibraryCache.lookup()) are placed
+    instead of drawn, and if a footprint_cache is given,
+    the drawn ones are stored in it, under their footprint_names.
+    '''
     if len(pixels_sources) != len(placeholders):
         raise RuntimeError(f"{len(placeholders)} placeholders were found "
                 + f"but {len(pixels_sources)} pixels-sources were supplied; "
                 + "they need to be the same amount!")
     replacements = []
+    names = []
     phi = 0
     for psi in pixels_sources:
         if psi is not None:
             replacements.append(Replacement(pcb, placeholders[phi], psi, stretch=stretch))
+            names.append(None if footprint_names is None else footprint_names[phi])
         phi = phi + 1
+    if not draw:
+        return replacements
 
-    for repl in replacements:
-        repl.drawPixels()
+    # Each distinct footprint is drawn only once,
+    # and then copied to all the other placeholders it goes into.
+    footprints = {}
+    for (repl, name) in zip(replacements, names):
+        if isinstance(repl.pixels, CachedPixelsSource):
+            repl.placeCopy(repl.pixels.footprint)
+            continue
+        key = repl.getGeometryKey()
+        flipped_key = repl.getGeometryKey(flipped=True)
+        if key in footprints:
+            repl.placeCopy(footprints[key])
+        elif flipped_key in footprints:
+            repl.placeCopy(footprints[flipped_key], flip=True)
+        else:
+            footprints[key] = repl.drawPixels()
+            if footprint_cache is not None and name is not None:
+                footprint_cache.store(name, repl, footprints[key])
+    mark_stage('drawPixels')
 
     for repl in replacements:
         pcb.Remove(repl.placeholder.board_element)
 
-def show_placeholder_order(pcb):
-    placeholders = scanForPlaceholders(pcb)
-    pixels_sources = []
-    for i in range(0, len(placeholders)):
-        ps = StringPixelsSource(str(i + 1))
-        pixels_sources.append(ps)
-    replace_all_with(pcb, placeholders, pixels_sources, stretch=True)
-
-def replace_all(pcb, images_root, pixels_sources_identifiers):
-    placeholders = scanForPlaceholders(pcb)
-    pixels_sources = []
-    for psi in pixels_sources_identifiers:
-        ps = ident2pixels_source(images_root, psi)
-        pixels_sources.append(ps)
-    replace_all_with(pcb, placeholders, pixels_sources)
+    return replacements
+
+class OrderLabel:
+    '''
+    Replaces a placeholder with a native KiCad text,
+    showing the number of the placeholder (see --show-order).
+    This is a lot lighter than drawing the number with pixels.
+    '''
+    __slots__ = ('pcb', 'placeholder', 'text', 'position', 'size', 'thickness')
+
+    # Width of a glyph of the KiCad stroke font, relative to its height
+    GLYPH_WIDTH = 0.8
+
+    def __init__(self, pcb, placeholder: Placeholder, text: str):
+        self.pcb = pcb
+        self.placeholder = placeholder
+        self.text = text
+        self.position = _div(_plus(self.placeholder.top_left, self.placeholder.bottom_right), (2, 2))
+        (space_width, space_height) = self.placeholder.size_space
+        self.size = int(min(space_height * 0.8, space_width * 0.8 / (len(text) * OrderLabel.GLYPH_WIDTH)))
+        self.thickness = self.size // 8
+
+    def getUuid(self) -> str:
+        '''
+        Returns a deterministic UUID for the text (see Replacement.getUuid()).
+        '''
+        name = f"{self.placeholder.top_left}/{self.placeholder.bottom_right}/{self.placeholder.getLayerName()}/text:{self.text}"
+        return str(uuid.uuid5(UUID_NAMESPACE, name))
+
+    def draw(self):
+        text = pcbnew.PCB_TEXT(self.pcb)
+        text.SetText(self.text)
+        text.SetLayer(self.placeholder.getLayer())
+        text.SetTextSize(pcbnew.wxSize(self.size, self.size))
+        text.SetTextThickness(self.thickness)
+        text.SetPosition(pcbnew.wxPoint(self.position[0], self.position[1]))
+        text.SetMirrored(self.placeholder.reverse)
+        text.m_Uuid.Clone(pcbnew.KIID(self.getUuid()))
+        self.pcb.Add(text)
+        return text
+
+def show_placeholder_order(pcb, draw=True, raster=False, placeholders=None):
+    '''
+    Replaces each placeholder with its number (starting at 1),
+    in the order they get replaced in.
+    By default, these are KiCad texts (see OrderLabel);
+    if raster, they are drawn with pixels, like images.
+    See replace_all_with() for draw, and replace_all() for placeholders.
+    '''
+    if placeholders is None:
+        placeholders = scanForPlaceholders(pcb)
+    if raster:
+        pixels_sources = []
+        for i in range(0, len(placeholders)):
+            ps = StringPixelsSource(str(i + 1))
+            pixels_sources.append(ps)
+        return replace_all_with(pcb, placeholders, pixels_sources, stretch=True, draw=draw)
+    labels = [OrderLabel(pcb, placeholder, str(i + 1)) for (i, placeholder) in enumerate(placeholders)]
+    if draw:
+        for label in labels:
+            label.draw()
+            pcb.Remove(label.placeholder.board_element)
+    return labels
+
+class PixelsSourcesCache:
+    '''
+    Caches the PixelsSource created for each identifier,
+    so images get decoded and QR-Codes encoded only once,
+    even if they are used on multiple boards.
+    This is thread-safe.
+    '''
+    def __init__(self):
+        self.sources = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, images_root, ident, fit_size: (int, int) = None, fit: str = None, variables: dict = None, qr_mask: str = MASK_PENALTY, qr_compact: QrCompaction = None) -> PixelsSource:
+        '''
+        Like ident2pixels_source(), but returns the cached result
+        if it was called with the same arguments before.
+        '''
+        key = (images_root, render_ident(ident, variables), fit_size, fit, qr_mask, qr_compact)
+        with self.lock:
+            future = self.sources.get(key)
+            owner = future is None
+            if owner:
+                # Concurrent requests for the same key wait for this one,
+                # instead of creating the same source again
+                self.misses = self.misses + 1
+                future = concurrent.futures.Future()
+                self.sources[key] = future
+            else:
+                self.hits = self.hits + 1
+        if owner:
+            try:
+                future.set_result(run_profiled(ident2pixels_source, images_root, ident, fit_size, fit, variables, qr_mask, qr_compact))
+            except Exception as err:
+                future.set_exception(err)
+        return future.result()
+
+    def evict(self, ident, variables: dict = None):
+        '''
+        Drops the cached sources for an identifier,
+        e.g. because its image file changed.
+        '''
+        rendered = render_ident(ident, variables)
+        with self.lock:
+            for key in [key for key in self.sources if key[1] == rendered]:
+                del self.sources[key]
+
+# Shared by all boards processed in this process
+_pixels_sources_cache = PixelsSourcesCache()
+
+class MemoryProfiler:
+    '''
+    Takes tracemalloc snapshots at the boundaries between the stages
+    of processing a board (see mark_stage()),
+    and reports which code allocated the most memory in each stage.
+    Only memory allocated by Python code is traced,
+    not the one allocated within KiCad itself.
+    '''
+    def __init__(self, frames=1):
+        self.snapshots = []
+        tracemalloc.start(frames)
+
+    def snapshot(self, stage: str):
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        self.snapshots.append((stage, snapshot, tracemalloc.get_traced_memory()))
+
+    def report(self, limit=10):
+        tracemalloc.stop()
+        previous = None
+        for (stage, snapshot, (current, peak)) in self.snapshots:
+            print(f"Memory after {stage}: {current / (1024 * 1024):.1f} MiB traced (peak {peak / (1024 * 1024):.1f} MiB); "
+                    + "top allocation sites since the previous stage:")
+            if previous is None:
+                stats = snapshot.statistics('lineno')
+                for stat in stats[:limit]:
+                    print(f"    {stat.traceback}: {stat.size / 1024:.1f} KiB ({stat.count} blocks)")
+            else:
+                stats = snapshot.compare_to(previous, 'lineno')
+                for stat in stats[:limit]:
+                    print(f"    {stat.traceback}: {stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+} blocks)")
+            previous = snapshot
+
+# Set while profiling memory (see --profile-mem)
+_memory_profiler = None
+
+def mark_stage(stage: str):
+    '''
+    Marks the end of a stage of processing a board
+    (e.g. "LoadBoard"), for memory profiling.
+    '''
+    if _memory_profiler is not None:
+        _memory_profiler.snapshot(stage)
+
+# Set while profiling CPU time (see --profile-cpu);
+# collects the profilers of the worker threads (see run_profiled())
+_thread_cpu_profilers = None
+_thread_cpu_profilers_lock = threading.Lock()
+
+def run_profiled(func, *args):
+    '''
+    Calls func with args, under a profiler of its own
+    if CPU time is being profiled and this is not the main thread,
+    as cProfile only covers the thread it was enabled in.
+    The profilers get merged into the main one (see profiling()).
+    '''
+    profilers = _thread_cpu_profilers
+    if profilers is None or threading.current_thread() is threading.main_thread():
+        return func(*args)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Since Python 3.12, one profiler covers all threads,
+        # and no second one may be enabled
+        return func(*args)
+    try:
+        return func(*args)
+    finally:
+        profiler.disable()
+        with _thread_cpu_profilers_lock:
+            profilers.append(profiler)
+
+@contextlib.contextmanager
+def profiling(profile_cpu=None, profile_mem=False):
+    '''
+    Profiles the CPU time spent within this context with cProfile,
+    writing the stats (pstats format) to the file profile_cpu, if given,
+    and/or the memory allocated per stage (see MemoryProfiler), if profile_mem.
+    The CPU time of the worker threads creating the pixels sources
+    is included (see run_profiled()), but other processes are not profiled.
+    '''
+    global _memory_profiler, _thread_cpu_profilers
+    cpu_profiler = None
+    if profile_cpu is not None:
+        _thread_cpu_profilers = []
+        cpu_profiler = cProfile.Profile()
+        cpu_profiler.enable()
+    if profile_mem:
+        _memory_profiler = MemoryProfiler()
+    try:
+        yield
+    finally:
+        if cpu_profiler is not None:
+            cpu_profiler.disable()
+            stats = pstats.Stats(cpu_profiler)
+            for profiler in _thread_cpu_profilers:
+                stats.add(profiler)
+            _thread_cpu_profilers = None
+            stats.dump_stats(profile_cpu)
+            print(f"Written CPU profile to {profile_cpu} (view it with e.g. snakeviz, or convert it with flameprof)")
+        if _memory_profiler is not None:
+            _memory_profiler.report()
+            _memory_profiler = None
+
+def depends_on_fit_size(ident) -> bool:
+    '''
+    Whether the PixelsSource for an identifier depends on the size
+    of its placeholder, when fitting images (see --fit).
+    '''
+    return ident not in ('', 'skip') and not ident.startswith((ID_PREFIX_QR_CODE, ID_PREFIX_MICRO_QR_CODE, ID_PREFIX_RMQR_CODE) + tuple(DATA_MATRIX_SHAPES))
+
+def submit_pixels_sources(executor, images_root, identifiers, fit=None, placeholders=None, variables: dict = None, cache: PixelsSourcesCache = None, futures=None, qr_mask: str = MASK_PENALTY, qr_compact: QrCompaction = None) -> list:
+    '''
+    Starts creating the PixelsSource for each identifier on the executor.
+    Returns one future per identifier, in the same order.
+    When fitting images, those depend on the size of their placeholder,
+    so without placeholders, their futures are left as None.
+    Calling this again with the placeholders and the futures
+    returned the first time, starts the missing ones.
+    '''
+    if cache is None:
+        cache = _pixels_sources_cache
+    if futures is None:
+        futures = [None] * len(identifiers)
+    for (phi, psi) in enumerate(identifiers):
+        if futures[phi] is not None:
+            continue
+        fit_size = None
+        if fit is not None and depends_on_fit_size(psi):
+            if placeholders is None:
+                continue
+            if phi < len(placeholders):
+                fit_size = placeholders[phi].getMaxPixelGrid()
+        futures[phi] = executor.submit(cache.get, images_root, psi, fit_size, fit, variables, qr_mask, qr_compact)
+    return futures
+
+def replace_all(pcb, images_root, pixels_sources_identifiers, fit=None, cache: PixelsSourcesCache = None, variables: dict = None, executor=None, futures=None, draw=True, qr_mask: str = MASK_PENALTY, footprint_cache: FootprintLibraryCache = None, qr_compact: QrCompaction = None, placeholders=None, load_cached=True):
+    '''
+    If fit is one of image_pixels_source.BINARIZE_METHODS,
+    images too large for their placeholder get downsampled to fit,
+    and binarized with that method.
+    If variables are given, the identifiers are treated as templates
+    (see render_ident()).
+    The pixels sources are created on the executor (a new thread pool by default),
+    reusing the futures of an earlier call to submit_pixels_sources(), if given.
+    See replace_all_with() for draw.
+    If a footprint_cache is given, the cached footprints for the placeholders
+    (see FootprintLibraryCache.lookup()) are placed instead of drawn -
+    if load_cached - and the drawn ones are stored in it.
+    If placeholders are given (e.g. read from the board text,
+    see scan_placeholders_text()), pcb is not scanned for them,
+    and may be None if not draw.
+    '''
+    if executor is None:
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            return replace_all(pcb, images_root, pixels_sources_identifiers, fit, cache, variables, executor, futures, draw, qr_mask, footprint_cache, qr_compact, placeholders, load_cached)
+    if placeholders is None:
+        placeholders = scanForPlaceholders(pcb)
+    footprint_names = None
+    if footprint_cache is not None:
+        # The footprints are named after the placeholders they go into,
+        # so this has to wait for those; only the misses get created then
+        (footprint_names, cached) = footprint_cache.lookup(images_root, pixels_sources_identifiers, placeholders, fit, variables,
+                qr_mask, qr_compact, load=load_cached)
+        if futures is None:
+            futures = cached
+        else:
+            futures = [future if cached_future is None else cached_future for (future, cached_future) in zip(futures, cached)]
+    futures = submit_pixels_sources(executor, images_root, pixels_sources_identifiers, fit, placeholders, variables, cache, futures, qr_mask, qr_compact)
+    # joined in placeholder order
+    pixels_sources = [future.result() for future in futures]
+    mark_stage('pixels sources')
+    return replace_all_with(pcb, placeholders, pixels_sources, draw=draw, footprint_cache=footprint_cache, footprint_names=footprint_names)
+
+class RectsIndex:
+    '''
+    A spatial index of axis-aligned rectangles (x_min, y_min, x_max, y_max),
+    in a uniform grid of RECTS_INDEX_CELL sized cells,
+    answering whether a rectangle intersects any of them,
+    without checking each one.
+    '''
+    def __init__(self, rects=(), cell: int = RECTS_INDEX_CELL):
+        self.cell = cell
+        # (column, row) -> rectangles overlapping that cell
+        self.cells = {}
+        for rect in rects:
+            self.add(rect)
+
+    def _cellsOf(self, rect):
+        (x_min, y_min, x_max, y_max) = rect
+        for col in range(x_min // self.cell, x_max // self.cell + 1):
+            for row in range(y_min // self.cell, y_max // self.cell + 1):
+                yield (col, row)
+
+    def add(self, rect):
+        for key in self._cellsOf(rect):
+            self.cells.setdefault(key, []).append(rect)
+
+    def intersects(self, rect) -> bool:
+        (x_min, y_min, x_max, y_max) = rect
+        for key in self._cellsOf(rect):
+            for (o_x_min, o_y_min, o_x_max, o_y_max) in self.cells.get(key, ()):
+                if x_min <= o_x_max and o_x_min <= x_max and y_min <= o_y_max and o_y_min <= y_max:
+                    return True
+        return False
+
+def find_zones_to_refill(pcb, replacements) -> list:
+    '''
+    Returns the zones of the board whose bounding boxes intersect
+    one of the replaced copper placeholders on one of their layers,
+    grown by the biggest clearance of the board,
+    as zones keep that much distance to the pixels;
+    only these may have to be filled differently now.
+    '''
+    clearance = pcb.GetDesignSettings().GetBiggestClearanceValue()
+    indices = {}
+    for repl in replacements:
+        if repl.placeholder.isCopper():
+            placeholder = repl.placeholder
+            indices.setdefault(placeholder.getLayer(), RectsIndex()).add(
+                    _minus(placeholder.top_left, (clearance, clearance)) + _plus(placeholder.bottom_right, (clearance, clearance)))
+    zones = []
+    if len(indices) == 0:
+        return zones
+    for zone in pcb.Zones():
+        bbox = zone.GetBoundingBox()
+        rect = (bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom())
+        if any(zone.IsOnLayer(layer) and index.intersects(rect) for (layer, index) in indices.items()):
+            zones.append(zone)
+    return zones
+
+def refill_zones(pcb, replacements) -> dict:
+    '''
+    Refills the zones affected by copper replacements
+    (see find_zones_to_refill()) with KiCads zone filler,
+    leaving all the others as they are.
+    Returns how many zones were refilled, and how long that took.
+    '''
+    start = time.perf_counter()
+    zones = find_zones_to_refill(pcb, replacements)
+    if len(zones) > 0:
+        zones_vector = pcbnew.ZONES()
+        for zone in zones:
+            zones_vector.append(zone)
+        pcbnew.ZONE_FILLER(pcb).Fill(zones_vector)
+    return {
+        'zones_refilled': len(zones),
+        'zones_total': len(pcb.Zones()),
+        'refill_seconds': time.perf_counter() - start,
+    }
+
+class ReplIdentsList:
+    '''
+    The contents of a replacement identifiers list file
+    (see --repl-idents-list-file).
+    In its simplest form, this contains one identifier per line.
+    For batch processing, identifiers may be given per board,
+    in sections started by a line containing a board path glob pattern
+    within square brackets, for example:
+
+        default-image.png
+        qr:Default data
+        [panels/*.kicad_pcb]
+        panel-image.png
+        skip
+
+    The identifiers before the first section header are the default,
+    used for boards that match no section.
+    '''
+    def __init__(self, default: list = None):
+        self.default = [] if default is None else default
+        self.sections = []
+
+    @staticmethod
+    def read(list_file):
+        idents_list = ReplIdentsList()
+        idents = idents_list.default
+        with open(list_file) as idents_f:
+            for line in idents_f:
+                line = line.rstrip()
+                section_match = R_SECTION_HEADER.match(line)
+                if section_match:
+                    idents = []
+                    idents_list.sections.append((section_match.group(1), idents))
+                else:
+                    idents.append(line)
+        return idents_list
+
+    def getFor(self, board_path) -> list:
+        '''
+        Returns the identifiers of the first section matching board_path,
+        or the default ones.
+        '''
+        for (pattern, idents) in self.sections:
+            if fnmatch.fnmatch(board_path, pattern) or fnmatch.fnmatch(os.path.basename(board_path), pattern):
+                return idents
+        return self.default
+
+def discover_boards(batch) -> list:
+    '''
+    Finds all KiCad PCB files in the directory tree batch,
+    or matching the (recursive) glob pattern batch,
+    leaving out the ones generated by this tool.
+    '''
+    if os.path.isdir(batch):
+        pattern = os.path.join(batch, "**", "*.kicad_pcb")
+    else:
+        pattern = batch
+    boards = [board for board in glob.glob(pattern, recursive=True)
+            if R_KICAD_PCB_EXT.search(board) and not R_REPLACED_PCB.search(board)]
+    return sorted(boards)
+
+def parse_range(spec: str) -> (str, range):
+    '''
+    Parses a range of integer values for a template variable,
+    given as "NAME=START:STOP[:STEP]" (STOP is exclusive).
+    '''
+    match = R_RANGE.match(spec)
+    if match is None:
+        raise RuntimeError(f"Invalid range '{spec}', expected NAME=START:STOP[:STEP]")
+    (name, start, stop, step) = match.groups()
+    return (name, range(int(start), int(stop), 1 if step is None else int(step)))
+
+def _read_csv_rows(vars_csv):
+    with open(vars_csv, newline='') as csv_f:
+        for row in csv.DictReader(csv_f):
+            yield row
+
+def expand_variables(ranges: list, vars_csv=None):
+    '''
+    Lazily generates the variables for templated identifiers,
+    one dict per job:
+    for each row of the CSV file vars_csv (or just once, if there is none),
+    all combinations of the values of the ranges (see parse_range()).
+    '''
+    names = [name for (name, values) in ranges]
+    rows = [{}] if vars_csv is None else _read_csv_rows(vars_csv)
+    for row in rows:
+        for values in itertools.product(*[values for (name, values) in ranges]):
+            variables = dict(row)
+            variables.update(zip(names, values))
+            yield variables
+
+def process_board(input, output, images_root, repl_identifiers, show_order=False, fit=None, variables: dict = None, patch=False, qr_mask: str = MASK_PENALTY, footprint_cache_dir=None, preview=None, refill=False, qr_compact: QrCompaction = None) -> dict:
+    '''
+    Loads a single board, replaces its placeholders and writes the result.
+    If show_order is SHOW_ORDER_RASTER, the placeholder numbers are drawn
+    with pixels, otherwise (if set at all) as KiCad texts.
+    If patch, the result is written by patching the text of the input file
+    (see kicad_pcb_patcher.patch_board()), instead of KiCad writing the whole board,
+    and the placeholders are read from that text too (see scan_placeholders_text()),
+    so KiCad is only needed if that finds a different number of them
+    than there are repl_identifiers.
+    Returns statistics about what was done;
+    with qr_mask MASK_GEOMETRY, these include the number of rectangles
+    the QR-Codes are drawn with ('qr_rects'),
+    and how many they would have had with the penalty-chosen masks ('qr_rects_penalty').
+    If footprint_cache_dir is given, the drawn footprints are cached
+    in that library (see FootprintLibraryCache);
+    previews need the pixels sources though, so with preview,
+    footprints are only stored in the cache, not loaded from it,
+    and with patch, the cache is not used at all.
+    If preview is one of PREVIEW_FORMATS, a preview of the replacements
+    is written next to the output (see preview_renderer.preview_path()).
+    If refill, the zones affected by copper replacements are refilled
+    (see refill_zones()); silk-screen only boards are left alone.
+    With qr_compact, the stats include the QR-Code versions
+    before and after compaction ('qr_versions').
+    '''
+    if refill and patch:
+        raise RuntimeError("Zones can not be refilled when patching the output (--patch)!")
+    start = time.perf_counter()
+    footprint_cache = None if footprint_cache_dir is None else FootprintLibraryCache(footprint_cache_dir)
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = None
+        if patch:
+            # Patching writes the footprints as text, from their pixels
+            footprint_cache = None
+        load_cached = preview is None
+        if not show_order and (footprint_cache is None or not load_cached):
+            # Decoding images and encoding QR-Codes does not need the board,
+            # so it happens while the board is loading
+            futures = submit_pixels_sources(executor, images_root, repl_identifiers, fit, variables=variables, futures=futures, qr_mask=qr_mask,
+                    qr_compact=qr_compact)
+        pcb = None
+        placeholders = None
+        if patch:
+            placeholders = scan_placeholders_text(input)
+            mark_stage('scan placeholders')
+            if not show_order and len(placeholders) != len(repl_identifiers) and pcbnew is not None:
+                # KiCad might recognize placeholders the text scan does not
+                placeholders = None
+        if placeholders is None:
+            require_pcbnew()
+            pcb = pcbnew.LoadBoard(input)
+            mark_stage('LoadBoard')
+        if show_order:
+            replacements = show_placeholder_order(pcb, draw=not patch, raster=show_order == SHOW_ORDER_RASTER, placeholders=placeholders)
+            num_placeholders = len(replacements)
+        else:
+            replacements = replace_all(pcb, images_root, repl_identifiers, fit, variables=variables, executor=executor, futures=futures, draw=not patch, qr_mask=qr_mask,
+                    footprint_cache=footprint_cache, qr_compact=qr_compact, placeholders=placeholders, load_cached=load_cached)
+            num_placeholders = len(repl_identifiers)
+    refill_stats = None
+    if refill and any(repl.placeholder.isCopper() for repl in replacements):
+        refill_stats = refill_zones(pcb, replacements)
+        mark_stage('refill zones')
+    if patch:
+        patch_board(input, output, replacements)
+    else:
+        pcbnew.SaveBoard(output, pcb)
+    mark_stage('SaveBoard')
+    if preview is not None:
+        write_preview(preview_path(output, preview), replacements)
+    stats = {
+        'input': input,
+        'output': output,
+        'placeholders': num_placeholders,
+        'replaced': len(replacements),
+        'skipped': num_placeholders - len(replacements),
+        'seconds': time.perf_counter() - start,
+    }
+    mask_stats = [repl.pixels.maskStats for repl in replacements
+            if getattr(getattr(repl, 'pixels', None), 'maskStats', None) is not None]
+    if len(mask_stats) > 0:
+        stats['qr_rects'] = sum(mask['rects'] for mask in mask_stats)
+        stats['qr_rects_penalty'] = sum(mask['penalty_mask_rects'] for mask in mask_stats)
+    compact_stats = [repl.pixels.compactStats for repl in replacements
+            if getattr(getattr(repl, 'pixels', None), 'compactStats', None) is not None]
+    if len(compact_stats) > 0:
+        stats['qr_versions'] = compact_stats
+    if refill_stats is not None:
+        stats.update(refill_stats)
+    if footprint_cache is not None:
+        stats['footprint_cache_hits'] = footprint_cache.hits
+        stats['footprint_cache_misses'] = footprint_cache.misses
+    return stats
+
+class BoardWatcher:
+    '''
+    Keeps the output of a board up to date while it is being edited:
+    whenever the board, the replacement identifiers list file
+    or one of the images changes, only the affected work is redone.
+    The board is never loaded through KiCad;
+    its placeholders are read from its text,
+    and the output is written by patching that
+    (see kicad_pcb_patcher.patch_text()).
+    Pixels sources and the rectangles to draw them with
+    stay cached in memory between updates.
+    If preview is one of PREVIEW_FORMATS, a preview is written along with the output.
+    '''
+    def __init__(self, input, output, images_root, repl_identifiers, repl_idents_list_file=None, fit=None, qr_mask: str = MASK_PENALTY, preview=None, qr_compact: QrCompaction = None):
+        self.input = input
+        self.output = output
+        self.images_root = images_root
+        self.repl_identifiers = repl_identifiers
+        self.repl_idents_list_file = repl_idents_list_file
+        self.fit = fit
+        self.qr_mask = qr_mask
+        self.preview = preview
+        self.qr_compact = qr_compact
+        self.cache = PixelsSourcesCache()
+        self.rects_cache = {}
+        self.text = None
+        self.placeholders = None
+        # file path -> (modification time, size)
+        self.stats = {}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def getImagePaths(self) -> dict:
+        '''
+        Returns the image file path of each identifier that refers to one.
+        '''
+        return {os.path.join(self.images_root, remove_prefix(ident, ID_PREFIX_IMAGE)): ident
+                for ident in self.repl_identifiers if depends_on_fit_size(ident)}
+
+    def getWatchedPaths(self) -> list:
+        paths = [self.input]
+        if self.repl_idents_list_file is not None:
+            paths.append(self.repl_idents_list_file)
+        return paths + list(self.getImagePaths())
+
+    def findChanges(self) -> set:
+        '''
+        Returns the watched files that changed since the last call.
+        '''
+        changed = set()
+        for path in self.getWatchedPaths():
+            stat = BoardWatcher._stat(path)
+            if self.stats.get(path) != stat:
+                self.stats[path] = stat
+                changed.add(path)
+        return changed
+
+    def update(self, changed: set, executor):
+        '''
+        Redoes the work affected by the changed files,
+        and writes the output.
+        '''
+        if self.repl_idents_list_file in changed:
+            self.repl_identifiers = ReplIdentsList.read(self.repl_idents_list_file).getFor(self.input)
+            # newly referenced images
+            changed.update(self.findChanges())
+        if self.input in changed or self.text is None:
+            with open(self.input, encoding='utf-8', newline='') as input_f:
+                self.text = input_f.read()
+            self.placeholders = placeholders_from_text(self.text)
+        for (path, ident) in self.getImagePaths().items():
+            if path in changed:
+                self.cache.evict(ident)
+        futures = submit_pixels_sources(executor, self.images_root, self.repl_identifiers, self.fit, self.placeholders,
+                cache=self.cache, qr_mask=self.qr_mask, qr_compact=self.qr_compact)
+        pixels_sources = [future.result() for future in futures]
+        replacements = replace_all_with(None, self.placeholders, pixels_sources, draw=False)
+        with open(self.output, 'w', encoding='utf-8', newline='') as output_f:
+            output_f.write(patch_text(self.text, replacements, self.rects_cache))
+        if self.preview is not None:
+            write_preview(preview_path(self.output, self.preview), replacements)
+
+    def watch(self, interval: float = WATCH_INTERVAL):
+        '''
+        Checks the watched files for changes every interval seconds,
+        and updates the output, until interrupted.
+        A failed update (e.g. because a file was only half written)
+        is reported, and retried with the next change.
+        '''
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            while True:
+                changed = self.findChanges()
+                if len(changed) > 0:
+                    start = time.perf_counter()
+                    try:
+                        self.update(changed, executor)
+                        print(f"Written {self.output} ({(time.perf_counter() - start) * 1000:.0f} ms), after changes to: "
+                                + ', '.join(sorted(changed)))
+                    except Exception as err:
+                        print(f"Failed to update {self.output}: {err}")
+                time.sleep(interval)
+
+def format_qr_mask_stats(stats) -> str:
+    '''
+    Formats the QR-Code mask statistics from process_board(),
+    or returns an empty string if there are none.
+    '''
+    if 'qr_rects' not in stats:
+        return ''
+    return f"; QR-Codes drawn with {stats['qr_rects']} rectangles ({stats['qr_rects_penalty']} with penalty-chosen masks)"
+
+def format_qr_compact_stats(stats) -> str:
+    '''
+    Formats the QR-Code versions before and after compaction
+    from process_board(), or returns an empty string if there are none.
+    '''
+    if 'qr_versions' not in stats:
+        return ''
+    return "; QR-Codes compacted: " + ', '.join(format_compact_stats(versions) for versions in stats['qr_versions'])
+
+def format_refill_stats(stats) -> str:
+    '''
+    Formats the zone refill statistics from process_board(),
+    or returns an empty string if there are none.
+    '''
+    if 'zones_refilled' not in stats:
+        return ''
+    return f"; refilled {stats['zones_refilled']} of {stats['zones_total']} zones in {stats['refill_seconds']:.2f}s"
+
+def format_footprint_cache_stats(stats) -> str:
+    '''
+    Formats the footprint cache hits and misses from process_board(),
+    or returns an empty string if there are none.
+    '''
+    if 'footprint_cache_hits' not in stats:
+        return ''
+    return f"; footprint cache: {stats['footprint_cache_hits']} hits, {stats['footprint_cache_misses']} misses"
+
+def calc_pixels_size(images_root, ident, fit_size: (int, int) = None, variables: dict = None, qr_compact: QrCompaction = None) -> (int, int):
+    '''
+    Returns the size (in pixels) the PixelsSource for an identifier would have
+    (see ident2pixels_source()), or None for a skip,
+    without decoding images or encoding QR-Codes.
+    '''
+    if ident in ('', 'skip'):
+        return None
+    elif ident.startswith(ID_PREFIX_QR_CODE):
+        qr_code_data = remove_prefix(ident, ID_PREFIX_QR_CODE)
+        if variables is not None:
+            qr_code_data = qr_code_template(qr_code_data).render(variables)
+        return calc_qr_code_size(qr_code_data, compaction=qr_compact)
+    elif ident.startswith(ID_PREFIX_MICRO_QR_CODE):
+        return calc_micro_qr_code_size(remove_prefix(render_ident(ident, variables), ID_PREFIX_MICRO_QR_CODE))
+    elif ident.startswith(ID_PREFIX_RMQR_CODE):
+        return calc_rmqr_code_size(remove_prefix(render_ident(ident, variables), ID_PREFIX_RMQR_CODE))
+    elif ident.startswith(tuple(DATA_MATRIX_SHAPES)):
+        prefix = ident[:ident.index(':') + 1]
+        return calc_data_matrix_size(remove_prefix(render_ident(ident, variables), prefix), shape=DATA_MATRIX_SHAPES[prefix])
+    else:
+        image_path = remove_prefix(render_ident(ident, variables), ID_PREFIX_IMAGE)
+        return read_image_size(os.path.join(images_root, image_path), fit_size)
+
+def dry_run_board(input, images_root, repl_identifiers, show_order=False, fit=None, variables: dict = None, qr_compact: QrCompaction = None) -> dict:
+    '''
+    Checks whether the pixels sources fit into the placeholders of a board,
+    without loading the board through KiCad, decoding images,
+    encoding QR-Codes, drawing or writing anything.
+    Returns statistics like process_board(), plus the number of pixels,
+    an estimate of the number of shapes to draw,
+    and the smallest resulting pixel pitch (in nanometers).
+    '''
+    start = time.perf_counter()
+    placeholders = scan_placeholders_text(input)
+    if show_order:
+        repl_identifiers = [''] * len(placeholders)
+    if len(repl_identifiers) != len(placeholders):
+        raise RuntimeError(f"{len(placeholders)} placeholders were found "
+                + f"but {len(repl_identifiers)} pixels-sources were supplied; "
+                + "they need to be the same amount!")
+    num_replaced = 0
+    num_pixels = 0
+    min_pitch = None
+    for (phi, (placeholder, psi)) in enumerate(zip(placeholders, repl_identifiers)):
+        fit_size = placeholder.getMaxPixelGrid() if fit is not None and depends_on_fit_size(psi) else None
+        try:
+            size_repl = calc_pixels_size(images_root, psi, fit_size, variables, qr_compact)
+            if size_repl is None:
+                continue
+            pitch = min(calc_pixel_size(placeholder.size_space, size_repl))
+        except Exception as err:
+            raise RuntimeError(f"Placeholder {phi + 1} ({psi}): {err}")
+        num_replaced = num_replaced + 1
+        num_pixels = num_pixels + size_repl[0] * size_repl[1]
+        min_pitch = pitch if min_pitch is None else min(min_pitch, pitch)
+    return {
+        'input': input,
+        'placeholders': len(placeholders),
+        'replaced': num_replaced,
+        'skipped': len(placeholders) - num_replaced,
+        'pixels': num_pixels,
+        'shapes': int(num_pixels * ESTIMATED_RECTS_PER_PIXEL),
+        'min_pitch': min_pitch,
+        'seconds': time.perf_counter() - start,
+    }
+
+def dry_run_batch(board_jobs) -> int:
+    '''
+    Runs dry_run_board() for each job (see generate_jobs()),
+    printing the results and a summary.
+    Returns the number of jobs that would fail.
+    '''
+    start = time.perf_counter()
+    num_jobs = 0
+    num_failed = 0
+    for (input, output, images_root, repl_identifiers, show_order, fit, variables, *_, qr_compact) in board_jobs:
+        num_jobs = num_jobs + 1
+        try:
+            stats = dry_run_board(input, images_root, repl_identifiers, show_order, fit, variables, qr_compact)
+        except Exception as err:
+            num_failed = num_failed + 1
+            print(f"WOULD FAIL {output}: {err}")
+            continue
+        pitch = 'none' if stats['min_pitch'] is None else f"{stats['min_pitch'] / 1000000:.3f}mm"
+        print(f"OK {output} - replacing {stats['replaced']}, skipping {stats['skipped']} placeholders; "
+                + f"{stats['pixels']} pixels, ~{stats['shapes']} shapes, smallest pixel pitch {pitch}")
+    print(f"Dry-run: {num_jobs - num_failed} of {num_jobs} jobs would succeed; checked in {time.perf_counter() - start:.2f}s")
+    return num_failed
+
+def _process_board_job(job) -> dict:
+    '''
+    Runs process_board() for one batch job,
+    catching failures, so the other boards still get processed.
+    '''
+    (input, output, images_root, repl_identifiers, show_order, fit, variables, patch, qr_mask, footprint_cache_dir, preview, refill, qr_compact) = job
+    cache_hits = _pixels_sources_cache.hits
+    cache_misses = _pixels_sources_cache.misses
+    try:
+        stats = process_board(input, output, images_root, repl_identifiers, show_order, fit, variables, patch, qr_mask, footprint_cache_dir, preview, refill, qr_compact)
+    except Exception as err:
+        stats = {'input': input, 'output': output, 'error': str(err)}
+    stats['cache_hits'] = _pixels_sources_cache.hits - cache_hits
+    stats['cache_misses'] = _pixels_sources_cache.misses - cache_misses
+    return stats
+
+def generate_jobs(boards, images_root, repl_idents_list: ReplIdentsList, show_order=False, fit=None, root=None, output=None, variables_gen=None, patch=False, qr_mask: str = MASK_PENALTY, footprint_cache_dir=None, preview=None, refill=False, qr_compact: QrCompaction = None):
+    '''
+    Lazily generates the jobs for process_batch(), one per board,
+    or - if variables_gen is given - one per board and set of variables
+    generated by calling it (see expand_variables()).
+    In the later case, output is a template for the output file paths,
+    which may use the same variables, plus "index",
+    the 0-based number of the job on its board.
+    '''
+    for board in boards:
+        rel_board = board if root is None else os.path.relpath(board, root)
+        repl_identifiers = repl_idents_list.getFor(rel_board)
+        if variables_gen is None:
+            board_output = output
+            if board_output is None:
+                board_output = R_KICAD_PCB_EXT.sub("-REPLACED.kicad_pcb", board)
+            yield (board, board_output, images_root, repl_identifiers, show_order, fit, None, patch, qr_mask, footprint_cache_dir, preview, refill, qr_compact)
+        else:
+            output_template = output
+            if output_template is None:
+                escaped_board = board.replace('{', '{{').replace('}', '}}')
+                output_template = R_KICAD_PCB_EXT.sub("-REPLACED-{index}.kicad_pcb", escaped_board)
+            for (index, variables) in enumerate(variables_gen()):
+                variables = dict({'index': index}, **variables)
+                yield (board, output_template.format(**variables), images_root, repl_identifiers, show_order, fit, variables, patch, qr_mask, footprint_cache_dir, preview, refill, qr_compact)
+
+def _run_jobs(board_jobs, jobs=1):
+    '''
+    Runs _process_board_job() on each of board_jobs,
+    jobs of them concurrently (in separate processes),
+    yielding the results as they come in.
+    board_jobs is consumed lazily, so it may be a (long) generator.
+    '''
+    if jobs <= 1:
+        for job in board_jobs:
+            yield _process_board_job(job)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = set()
+        for job in board_jobs:
+            if len(pending) >= 2 * jobs:
+                (done, pending) = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(_process_board_job, job))
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+def process_batch(board_jobs, jobs=1) -> list:
+    '''
+    Processes many boards (see generate_jobs()),
+    jobs of them concurrently (in separate processes),
+    prints a summary and returns the paths of the written files.
+    The pixels sources are cached per process, and thus shared between
+    all the boards processed by it.
+    '''
+    start = time.perf_counter()
+    num_boards = 0
+    num_failed = 0
+    num_replaced = 0
+    num_skipped = 0
+    cache_hits = 0
+    cache_misses = 0
+    summed_stats = {}
+    outputs = []
+    for stats in _run_jobs(board_jobs, jobs):
+        num_boards = num_boards + 1
+        cache_hits = cache_hits + stats['cache_hits']
+        cache_misses = cache_misses + stats['cache_misses']
+        if 'error' in stats:
+            num_failed = num_failed + 1
+            print(f"FAILED {stats['input']}: {stats['error']}")
+        else:
+            num_replaced = num_replaced + stats['replaced']
+            num_skipped = num_skipped + stats['skipped']
+            outputs.append(stats['output'])
+            for key in ('qr_rects', 'qr_rects_penalty', 'footprint_cache_hits', 'footprint_cache_misses'):
+                if key in stats:
+                    summed_stats[key] = summed_stats.get(key, 0) + stats[key]
+            print(f"Written {stats['output']} - replaced {stats['replaced']}, skipped {stats['skipped']} placeholders in {stats['seconds']:.2f}s"
+                    + format_qr_mask_stats(stats) + format_qr_compact_stats(stats) + format_refill_stats(stats)
+                    + format_footprint_cache_stats(stats))
+    print(f"Summary: {num_boards - num_failed} of {num_boards} boards processed in {time.perf_counter() - start:.2f}s; "
+            + f"{num_replaced} placeholders replaced, {num_skipped} skipped; "
+            + f"pixels sources cache: {cache_hits} hits, {cache_misses} misses"
+            + format_qr_mask_stats(summed_stats) + format_footprint_cache_stats(summed_stats))
+    if num_failed > 0:
+        raise RuntimeError(f"{num_failed} of {num_boards} boards failed!")
+    return outputs
+
+def file_digest(path) -> str:
+    '''
+    Returns the SHA-256 hash of a files content.
+    '''
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as file_f:
+        for chunk in iter(lambda: file_f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def write_digest_file(digest_file, outputs) -> bool:
+    '''
+    Writes the hashes of the output files to digest_file,
+    in the format of `sha256sum` (so it may be checked with `sha256sum -c`).
+    Returns whether they changed since the last time,
+    so CI can skip downstream steps if they did not.
+    '''
+    lines = [f"{file_digest(output)}  {output}\n" for output in sorted(outputs)]
+    previous = None
+    if os.path.exists(digest_file):
+        with open(digest_file) as digest_f:
+            previous = digest_f.readlines()
+    changed = previous != lines
+    if changed:
+        with open(digest_file, 'w') as digest_f:
+            digest_f.writelines(lines)
+    return changed
 
 @click.command()
 @click.argument("repl_identifiers", type=click.STRING, nargs=-1)
-@click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), required=1,
+@click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True),
         default=None, help='Path to the input *.kicad_pcb file')
-@click.option('--output', '-o', type=click.Path(exists=True, dir_okay=False, file_okay=True, writable=True),
-        default=None, help='Output file path (default: input-REPLACED.kicad_pcb)')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, file_okay=True, writable=True),
+        default=None, help='Output file path (default: input-REPLACED.kicad_pcb); when expanding templates (--range, --vars-csv), this is a template too (default: input-REPLACED-{index}.kicad_pcb)')
+@click.option('--batch', '-b', type=click.STRING, envvar='BATCH',
+        default=None, help='Instead of a single --input, process all *.kicad_pcb files in this directory tree, or matching this (recursive, "**") glob pattern; each one is written to board-REPLACED.kicad_pcb')
+@click.option('--jobs', '-j', type=click.IntRange(min=1), envvar='JOBS',
+        default=1, help='How many boards to process concurrently in --batch mode (default: 1)')
 @click.option('--images-root', '-r', type=click.Path(exists=True, dir_okay=True, file_okay=False, readable=True), envvar='IMAGES_ROOT',
         default=None, help='Where to resolve relative image paths to (default: CWD)')
 @click.option('--repl-idents-list-file', '-l', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), envvar='REPL_IDENTS_LIST_FILE',
-        default=None, help='File that contains a list of image paths (one per line) to inject')
+        default=None, help='File that contains a list of image paths (one per line) to inject; may contain per-board sections, started by a "[board/glob/*.kicad_pcb]" line')
 @click.option('--show-order', '-s', is_flag=True,
-        help='Instead of supplied pixels sources, the placehodlers get replaced by images of numbers, according to their order as considered by this tool.')
-def replace_all_cli(repl_identifiers={}, input=None, output=None, images_root=None, repl_idents_list_file=None, show_order=False):
+        help='Instead of supplied pixels sources, the placehodlers get replaced by their numbers (as KiCad texts), according to their order as considered by this tool.')
+@click.option('--show-order-raster', is_flag=True,
+        help='Like --show-order, but draws the numbers with pixels, instead of as KiCad texts')
+@click.option('--fit', '-f', type=click.Choice(BINARIZE_METHODS), envvar='FIT',
+        default=None, help='Downsample images that are too large for their placeholder (at the minimum pixel size) to fit, binarizing them with the given method (default: fail on too large images)')
+@click.option('--range', 'ranges', type=click.STRING, multiple=True,
+        help='Treat the identifiers as templates (e.g. "qr:https://x.org/{serial}"), and create one output per value of this variable, given as NAME=START:STOP[:STEP] (STOP is exclusive); if given multiple times, all combinations are generated')
+@click.option('--vars-csv', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), envvar='VARS_CSV',
+        default=None, help='Treat the identifiers as templates (see --range), and create one output per row of this CSV file, which has to start with a header row, naming the variables')
+@click.option('--patch', '-p', is_flag=True,
+        help='Write the output by patching the text of the input file - only removing the placeholders and inserting the generated footprints - instead of having KiCad re-write the whole board; this is faster on large boards, leaves the rest of the file byte-for-byte unchanged, and does not need KiCad to be installed')
+@click.option('--digest-file', type=click.Path(dir_okay=False, file_okay=True, writable=True), envvar='DIGEST_FILE',
+        default=None, help='Write the SHA-256 hashes of all output files to this file (sha256sum format), and report whether they changed since the last run; output is deterministic, so CI may use this to skip downstream steps')
+@click.option('--qr-mask', type=click.Choice(MASK_STRATEGIES), envvar='QR_MASK',
+        default=MASK_PENALTY, help='How to choose the mask pattern of QR-Codes: "penalty" as by the QR-Code specification, or "geometry", to minimize the number of polygons drawn (among the masks with a reasonable penalty) (default: penalty)')
+@click.option('--qr-compact', type=click.Choice(QR_TRANSFORMS), multiple=True,
+        help='Make QR-Code payloads more compact, for smaller QR-Code versions (and fewer polygons): "segments" only encodes digits and upper-case runs more densely, without changing the data; "upper" also upper-cases URL schemes and hosts and hexadecimal strings; "hex-numeric" replaces hexadecimal strings with decimal digits; "base45-deflate" compresses the data and encodes that in base45 (the last two need readers that undo them); may be given multiple times; see also qr_payload.py')
+@click.option('--qr-prefix-map', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), envvar='QR_PREFIX_MAP',
+        default=None, help='File mapping long URL prefixes in QR-Code payloads to short ones (e.g. of a local redirection service), one "LONG SHORT" pair per line; implies --qr-compact segments')
+@click.option('--footprint-cache', type=click.Path(dir_okay=True, file_okay=False, writable=True), envvar='FOOTPRINT_CACHE',
+        default=None, help='KiCad footprint library directory (e.g. "~/.cache/kicad-image-injector.pretty") to store the drawn footprints in, and to load them from on later runs, instead of drawing them again; not used with --patch')
+@click.option('--preview', type=click.Choice(PREVIEW_FORMATS), envvar='PREVIEW',
+        default=None, help='Also write a preview of the injected regions next to each output (e.g. board-REPLACED-preview.svg), rendered straight from the generated geometry, without plotting the board through KiCad; see also preview_renderer.py')
+@click.option('--refill-zones', is_flag=True,
+        help='After injecting into copper layers, refill the zones whose bounding boxes intersect the replaced placeholders, leaving all other zones as they are; skipped if only silk-screen is replaced, and not available with --patch or --watch')
+@click.option('--dry-run', '-n', is_flag=True,
+        help='Only check whether all the pixels sources fit their placeholders, and report pixel counts and sizes per output; reads board files and image headers only, and writes nothing')
+@click.option('--watch', '-w', is_flag=True,
+        help='Keep running, and update the output whenever the input board, the replacement identifiers list file or one of the images changes; the output is written as with --patch')
+@click.option('--profile-cpu', type=click.Path(dir_okay=False, file_okay=True, writable=True),
+        default=None, help='Profile the run with cProfile, and write the stats (pstats format) to this file; covers all threads of the main process (including the ones creating the pixels sources), but not the worker processes, so best used with --jobs 1')
+@click.option('--profile-mem', is_flag=True,
+        help='Trace the memory allocated by Python code, and report the top allocation sites after each stage (LoadBoard or scan placeholders, pixels sources, drawPixels, SaveBoard); only covers the main process, so best used with --jobs 1')
+def replace_all_cli(repl_identifiers={}, input=None, output=None, batch=None, jobs=1, images_root=None, repl_idents_list_file=None, show_order=False, show_order_raster=False, fit=None, ranges=(), vars_csv=None, patch=False, digest_file=None, qr_mask=MASK_PENALTY, qr_compact=(), qr_prefix_map=None, footprint_cache=None, preview=None, refill_zones=False, dry_run=False, watch=False, profile_cpu=None, profile_mem=False):
     '''
     Replaces all image- and QRCode-template polygons with the actual pixels.
     It supports KiCad (PCBnew) "*.kicad_pcb" files,
@@ -332,33 +1801,96 @@ def replace_all_cli(repl_identifiers={}, input=None, output=None, images_root=No
 
     * for a QR-Code:  "qr:Data I want to be encoded in the QR-Code"
 
+    * for a Micro QR-Code (for short data, e.g. serial numbers): "mqr:SN-0042"
+
+    * for a rectangular Micro QR-Code (for narrow placeholders): "rmqr:Data"
+
+    * for a Data Matrix code: "dm:Data" (square) or "dmr:Data" (rectangular)
+
     * no replacement: "" or "skip"
+
+    Identifiers may be templates, for example for serial-number runs,
+    see --range and --vars-csv.
     '''
-    if output is None:
+    if (input is None) == (batch is None):
+        raise RuntimeError("Exactly one of --input and --batch has to be specified!")
+    if show_order_raster:
+        show_order = SHOW_ORDER_RASTER
+    elif show_order:
+        show_order = SHOW_ORDER_TEXT
+    if batch is not None and output is not None:
+        raise RuntimeError("--output can not be used together with --batch!")
+    variables_gen = None
+    if len(ranges) > 0 or vars_csv is not None:
+        parsed_ranges = [parse_range(spec) for spec in ranges]
+        variables_gen = lambda: expand_variables(parsed_ranges, vars_csv)
+        if output is not None and all(field is None for (_, field, _, _) in string.Formatter().parse(output)):
+            raise RuntimeError("When expanding templates, --output has to be a template too (e.g. 'board-{serial}.kicad_pcb')!")
+    if output is None and input is not None and variables_gen is None:
         output = R_KICAD_PCB_EXT.sub("-REPLACED.kicad_pcb", input)
     if images_root is None:
         images_root = os.curdir
 
-    if input == output:
+    if input is not None and input == output:
         raise RuntimeError("KiCad PCB input and output file names can not be the same!")
 
-    repl_identifiers_from_file = {}
+    repl_idents_list = ReplIdentsList(list(repl_identifiers))
     if repl_idents_list_file is not None:
-        with open(repl_idents_list_file) as idents_f:
-            repl_identifiers_from_file = [line.rstrip() for line in idents_f]
+        repl_idents_list_from_file = ReplIdentsList.read(repl_idents_list_file)
+        if len(repl_idents_list_from_file.default) > 0 or len(repl_idents_list_from_file.sections) > 0:
+            if len(repl_identifiers) > 0:
+                raise RuntimeError("You may not specify replacement identifiers both on the command line (REPL_IDENTIFIERS) and through a file (--repl-idents-list-file)!")
+            repl_idents_list = repl_idents_list_from_file
 
-    if len(repl_identifiers_from_file) > 0:
-        if len(repl_identifiers) > 0:
-            raise RuntimeError("You may not specify replacement identifiers both on the command line (REPL_IDENTIFIERS) and through a file (--repl-idents-list-file)!")
-        repl_identifiers = repl_identifiers_from_file
-
-    pcb = pcbnew.LoadBoard(input)
-    if show_order:
-        show_placeholder_order(pcb)
+    if len(qr_compact) > 0 or qr_prefix_map is not None:
+        qr_compact = QrCompaction(qr_compact, () if qr_prefix_map is None else read_prefix_map(qr_prefix_map))
     else:
-        replace_all(pcb, images_root, repl_identifiers)
-    pcbnew.SaveBoard(output, pcb)
-    print(f"Written {output}!")
+        qr_compact = None
+
+    if refill_zones and (patch or watch):
+        raise RuntimeError("--refill-zones needs KiCad to write the whole board, so it can not be used together with --patch or --watch!")
+
+    if watch and (input is None or variables_gen is not None or show_order or dry_run):
+        raise RuntimeError("--watch only works with --input, and not together with --range, --vars-csv, --show-order or --dry-run!")
+
+    with profiling(profile_cpu, profile_mem):
+        if watch:
+            BoardWatcher(input, output, images_root, repl_idents_list.getFor(input), repl_idents_list_file, fit, qr_mask, preview, qr_compact).watch()
+            return
+
+        if dry_run:
+            if batch is not None:
+                root = batch if os.path.isdir(batch) else None
+                board_jobs = generate_jobs(discover_boards(batch), images_root, repl_idents_list, show_order, fit, root,
+                        variables_gen=variables_gen, qr_compact=qr_compact)
+            else:
+                board_jobs = generate_jobs([input], images_root, repl_idents_list, show_order, fit,
+                        output=output, variables_gen=variables_gen, qr_compact=qr_compact)
+            num_failed = dry_run_batch(board_jobs)
+            if num_failed > 0:
+                raise RuntimeError(f"{num_failed} jobs would fail!")
+            return
+
+        if batch is not None:
+            root = batch if os.path.isdir(batch) else None
+            outputs = process_batch(generate_jobs(discover_boards(batch), images_root, repl_idents_list, show_order, fit, root,
+                    variables_gen=variables_gen, patch=patch, qr_mask=qr_mask, footprint_cache_dir=footprint_cache, preview=preview, refill=refill_zones, qr_compact=qr_compact), jobs)
+        elif variables_gen is not None:
+            outputs = process_batch(generate_jobs([input], images_root, repl_idents_list, show_order, fit,
+                    output=output, variables_gen=variables_gen, patch=patch, qr_mask=qr_mask, footprint_cache_dir=footprint_cache, preview=preview, refill=refill_zones, qr_compact=qr_compact), jobs)
+        else:
+            stats = process_board(input, output, images_root, repl_idents_list.getFor(input), show_order, fit, patch=patch, qr_mask=qr_mask,
+                    footprint_cache_dir=footprint_cache, preview=preview, refill=refill_zones, qr_compact=qr_compact)
+            print(f"Written {output}!" + format_qr_mask_stats(stats) + format_qr_compact_stats(stats) + format_refill_stats(stats)
+                    + format_footprint_cache_stats(stats))
+            outputs = [output]
+
+        if digest_file is not None:
+            if write_digest_file(digest_file, outputs):
+                print(f"Output changed, new hashes written to {digest_file}")
+            else:
+                print(f"Output unchanged, as recorded in {digest_file}")
+
 
 if __name__ == "__main__":
     replace_all_cli()
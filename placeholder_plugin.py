@@ -4,15 +4,14 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import pcbnew
+import functools
 import os
 import re
 import shutil
 import subprocess
 
-# Additional import for QRCode
-# see https://github.com/kazuhikoarase/qrcode-generator/blob/master/python/qrcode.py
-#import kicad_qrcode as qrcode  # TODO: local qrcode package is prefered, so we renamed it
-import qrcode
+from pixels_geometry import pixels_to_rects
+from qr_code_pixels_source import QrCodePixelsSource
 
 # TODO Document!!
 '''
@@ -28,6 +27,19 @@ MIN_PIXEL_HEIGHT = MIN_PIXEL_WIDTH
 
 import FootprintWizardBase
 
+@functools.lru_cache(maxsize=64)
+def qr_code_rects(content: str, border: int, negative: bool) -> ((int, int), tuple):
+    '''
+    Encodes content as a QR-Code, and returns its size (in pixels)
+    and the rectangles covering its pixels
+    (see pixels_geometry.pixels_to_rects()).
+    The results are cached by payload,
+    so changing any other parameter in the wizard dialog
+    does not encode the QR-Code again.
+    '''
+    pixels = QrCodePixelsSource(content, border)
+    return (pixels.getSize(), tuple(pixels_to_rects(pixels, negative)))
+
 class QRCodeWizard(FootprintWizardBase.FootprintWizard):
     GetName = lambda self: '2D Barcode QRCode'
     GetDescription = lambda self: 'QR Code barcode generator'
@@ -50,18 +62,67 @@ class QRCodeWizard(FootprintWizardBase.FootprintWizard):
     def CheckParameters(self):
         self.barcode = str(self.parameters['Barcode']['Contents'])
         self.pxWidth = self.parameters['Barcode']['Pixel Width']
-        self.pxHeight = self.parameters['Barcode']['Pixel Height']
+        self.pxHeight = self.pxWidth
         self.negative = self.parameters['Barcode']['Negative']
         self.useSilkS = self.parameters['Barcode']['Use SilkS layer']
         self.useCu = self.parameters['Barcode']['Use Cu layer']
         self.onBack = self.parameters['Barcode']['Flip to back']
         self.border = int(self.parameters['Barcode']['Border'])
+        self.caption = self.parameters['Caption']['Enabled']
         self.textHeight = int(self.parameters['Caption']['Height'])
         self.textThickness = int(self.parameters['Caption']['Thickness'])
         self.textWidth = int(self.parameters['Caption']['Width'])
-        self.pixelsSource = ImagePixelsSource("qr.png") # HACK
         self.module.Value().SetText(str(self.barcode))
 
+    def _createAxisAlignedRect(self, layer: int, origin: (int, int), rect: (int, int, int, int)):
+        '''
+        Builds an axis-aligned rectangle (as a polygon) as a graphical element/drawing,
+        from a rectangle of merged pixels (col, row, width, height)
+        (see pixels_geometry.pixels_to_rects()),
+        with the top-left pixel of the QR-Code at origin.
+        '''
+        (col, row, width, height) = rect
+        (x_min, y_min) = (origin[0] + col * self.pxWidth, origin[1] + row * self.pxHeight)
+        (x_max, y_max) = (x_min + width * self.pxWidth, y_min + height * self.pxHeight)
+        polygon = pcbnew.FP_SHAPE(self.module)
+        polygon.SetShape(pcbnew.S_POLYGON)
+        polygon.SetWidth(0)
+        polygon.SetLayer(layer)
+        polygon.GetPolyShape().NewOutline()
+        polygon.GetPolyShape().Append(x_max, y_max)
+        polygon.GetPolyShape().Append(x_max, y_min)
+        polygon.GetPolyShape().Append(x_min, y_min)
+        polygon.GetPolyShape().Append(x_min, y_max)
+        polygon.SetFilled(True)
+        return polygon
+
+    def BuildThisFootprint(self):
+        '''
+        Draws the QR-Code centered on the footprint origin,
+        one polygon per rectangle of merged pixels.
+        '''
+        ((width, height), rects) = qr_code_rects(self.barcode, self.border, self.negative)
+        (origin_x, origin_y) = (-width * self.pxWidth // 2, -height * self.pxHeight // 2)
+        layers = []
+        if self.useSilkS:
+            layers.append(pcbnew.F_SilkS)
+        if self.useCu:
+            layers.append(pcbnew.F_Cu)
+        for layer in layers:
+            for rect in rects:
+                self.module.Add(self._createAxisAlignedRect(layer, (origin_x, origin_y), rect))
+
+        text_offset = -origin_y + self.textHeight
+        self.module.Value().SetPosition(pcbnew.wxPoint(0, text_offset))
+        self.module.Value().SetTextSize(pcbnew.wxSize(self.textWidth, self.textHeight))
+        self.module.Value().SetTextThickness(self.textThickness)
+        self.module.Value().SetLayer(pcbnew.F_SilkS)
+        self.module.Value().SetVisible(self.caption)
+        self.module.Reference().SetPosition(pcbnew.wxPoint(0, -text_offset))
+        self.module.Reference().SetVisible(False)
+        if self.onBack:
+            self.module.Flip(self.module.GetPosition(), False)
+
 if __name__ != "__main__":
     # Run as a KiCad plugin
     QRCodeWizard().register()
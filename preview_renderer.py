@@ -0,0 +1,174 @@
+'''
+Renders previews of the injected codes and images, to SVG or PNG,
+straight from the replacements (see placeholder2image.Replacement),
+without plotting the board through KiCad.
+Only the placeholder regions and the geometry generated for them are drawn,
+so this is fast enough to run for every output of a batch.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import re
+
+import click
+from PIL import Image, ImageDraw
+
+from image_pixels_source import BINARIZE_METHODS
+
+NM_PER_MM = 1000000
+PREVIEW_FORMATS = ['svg', 'png']
+# Space around the placeholders, in nanometers
+MARGIN = 2 * NM_PER_MM
+# Pixels per millimeter, for PNG previews
+DEFAULT_SCALE = 20
+# Colors similar to the KiCad default color theme
+BACKGROUND_COLOR = '#001023'
+PLACEHOLDER_COLOR = '#848484'
+LAYER_COLORS = {
+    'F.Cu': '#c83434',
+    'B.Cu': '#4d7fc4',
+    'F.SilkS': '#f2eda1',
+    'B.SilkS': '#e8b2a7',
+}
+R_KICAD_PCB_EXT = re.compile(r"\.kicad_pcb$")
+
+def _mm(nm) -> str:
+    return f"{nm / NM_PER_MM:.4f}".rstrip('0').rstrip('.')
+
+def calc_bounds(replacements) -> (int, int, int, int):
+    '''
+    Returns the area (x_min, y_min, x_max, y_max) covering
+    the placeholders of all the replacements, plus a margin.
+    '''
+    if len(replacements) == 0:
+        return (0, 0, 2 * MARGIN, 2 * MARGIN)
+    placeholders = [repl.placeholder for repl in replacements]
+    return (min(ph.top_left[0] for ph in placeholders) - MARGIN,
+            min(ph.top_left[1] for ph in placeholders) - MARGIN,
+            max(ph.bottom_right[0] for ph in placeholders) + MARGIN,
+            max(ph.bottom_right[1] for ph in placeholders) + MARGIN)
+
+def render_svg(replacements) -> str:
+    '''
+    Renders the replacements as SVG, in millimeters,
+    each one as its placeholder outline
+    and a single path containing all its rectangles
+    (or the text, for order labels, see placeholder2image.OrderLabel).
+    '''
+    (x_min, y_min, x_max, y_max) = calc_bounds(replacements)
+    (width, height) = (x_max - x_min, y_max - y_min)
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_mm(width)}mm" height="{_mm(height)}mm"'
+                + f' viewBox="{_mm(x_min)} {_mm(y_min)} {_mm(width)} {_mm(height)}">',
+        f'<rect x="{_mm(x_min)}" y="{_mm(y_min)}" width="{_mm(width)}" height="{_mm(height)}" fill="{BACKGROUND_COLOR}"/>',
+    ]
+    for repl in replacements:
+        placeholder = repl.placeholder
+        color = LAYER_COLORS.get(placeholder.getLayerName(), PLACEHOLDER_COLOR)
+        (size_x, size_y) = placeholder.size_space
+        lines.append(f'<rect x="{_mm(placeholder.top_left[0])}" y="{_mm(placeholder.top_left[1])}"'
+                + f' width="{_mm(size_x)}" height="{_mm(size_y)}" fill="none" stroke="{PLACEHOLDER_COLOR}"'
+                + ' stroke-width="0.05" stroke-dasharray="0.3 0.2"/>')
+        if hasattr(repl, 'getRects'):
+            path = ''.join(f'M{_mm(rx_min)} {_mm(ry_min)}H{_mm(rx_max)}V{_mm(ry_max)}H{_mm(rx_min)}Z'
+                    for (rx_min, ry_min, rx_max, ry_max) in repl.getRects())
+            lines.append(f'<path d="{path}" fill="{color}"/>')
+        else:
+            lines.append(f'<text x="{_mm(repl.position[0])}" y="{_mm(repl.position[1])}" fill="{color}"'
+                    + f' font-size="{_mm(repl.size)}" font-family="monospace" text-anchor="middle"'
+                    + f' dominant-baseline="central">{repl.text}</text>')
+    lines.append('</svg>')
+    return '\n'.join(lines) + '\n'
+
+def render_png(replacements, scale: float = DEFAULT_SCALE) -> Image.Image:
+    '''
+    Renders the replacements like render_svg() does,
+    but as a pixel image, with scale pixels per millimeter.
+    '''
+    (x_min, y_min, x_max, y_max) = calc_bounds(replacements)
+    factor = scale / NM_PER_MM
+    size = (max(1, round((x_max - x_min) * factor)), max(1, round((y_max - y_min) * factor)))
+    image = Image.new('RGB', size, BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(image)
+    to_px = lambda x, y: (round((x - x_min) * factor), round((y - y_min) * factor))
+    for repl in replacements:
+        placeholder = repl.placeholder
+        color = LAYER_COLORS.get(placeholder.getLayerName(), PLACEHOLDER_COLOR)
+        draw.rectangle([to_px(*placeholder.top_left), to_px(*placeholder.bottom_right)], outline=PLACEHOLDER_COLOR)
+        if hasattr(repl, 'getRects'):
+            for (rx_min, ry_min, rx_max, ry_max) in repl.getRects():
+                (left, top) = to_px(rx_min, ry_min)
+                (right, bottom) = to_px(rx_max, ry_max)
+                # the end coordinates are inclusive
+                draw.rectangle([left, top, max(left, right - 1), max(top, bottom - 1)], fill=color)
+        else:
+            draw.text(to_px(*repl.position), repl.text, fill=color, anchor='mm')
+    return image
+
+def preview_path(board_path, fmt: str) -> str:
+    '''
+    Returns the path of the preview for a board,
+    next to it, e.g. "board-REPLACED-preview.svg" for "board-REPLACED.kicad_pcb".
+    '''
+    return R_KICAD_PCB_EXT.sub("", board_path) + f"-preview.{fmt}"
+
+def write_preview(preview_path, replacements, scale: float = DEFAULT_SCALE):
+    '''
+    Writes a preview of the replacements to an SVG or PNG file,
+    depending on the file extension of preview_path.
+    '''
+    if preview_path.lower().endswith('.png'):
+        render_png(replacements, scale).save(preview_path)
+    elif preview_path.lower().endswith('.svg'):
+        with open(preview_path, 'w') as preview_f:
+            preview_f.write(render_svg(replacements))
+    else:
+        raise RuntimeError(f"Unknown preview format of '{preview_path}', choose one of: {PREVIEW_FORMATS}")
+
+@click.command()
+@click.argument("repl_identifiers", type=click.STRING, nargs=-1)
+@click.option('--input', '-i', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), required=1,
+        help='Path to the *.kicad_pcb file with the placeholders')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, file_okay=True, writable=True), required=1,
+        help='Path of the preview to write, ending in .svg or .png')
+@click.option('--images-root', '-r', type=click.Path(exists=True, dir_okay=True, file_okay=False, readable=True), envvar='IMAGES_ROOT',
+        default=None, help='Where to resolve relative image paths to (default: CWD)')
+@click.option('--repl-idents-list-file', '-l', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), envvar='REPL_IDENTS_LIST_FILE',
+        default=None, help='File that contains a list of image paths (one per line) to inject')
+@click.option('--fit', '-f', type=click.Choice(BINARIZE_METHODS), envvar='FIT',
+        default=None, help='Downsample images that are too large for their placeholder (see placeholder2image.py --fit)')
+@click.option('--scale', '-s', type=click.FloatRange(min=0, min_open=True), default=DEFAULT_SCALE,
+        help=f'Pixels per millimeter, for PNG previews (default: {DEFAULT_SCALE})')
+def preview_cli(repl_identifiers={}, input=None, output=None, images_root=None, repl_idents_list_file=None, fit=None, scale=DEFAULT_SCALE):
+    '''
+    Renders a preview of what placeholder2image.py would inject into a board,
+    without loading the board through KiCad, nor writing it.
+
+    REPL_IDENTIFIERS - see placeholder2image.py --help
+    '''
+    # imported here, as placeholder2image uses this module too
+    from placeholder2image import ReplIdentsList, replace_all_with, scan_placeholders_text, submit_pixels_sources
+    import concurrent.futures
+
+    if images_root is None:
+        images_root = os.curdir
+    repl_idents_list = ReplIdentsList(list(repl_identifiers))
+    if repl_idents_list_file is not None:
+        if len(repl_identifiers) > 0:
+            raise RuntimeError("You may not specify replacement identifiers both on the command line (REPL_IDENTIFIERS) and through a file (--repl-idents-list-file)!")
+        repl_idents_list = ReplIdentsList.read(repl_idents_list_file)
+    repl_identifiers = repl_idents_list.getFor(input)
+    placeholders = scan_placeholders_text(input)
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = submit_pixels_sources(executor, images_root, repl_identifiers, fit, placeholders)
+        pixels_sources = [future.result() for future in futures]
+    replacements = replace_all_with(None, placeholders, pixels_sources, draw=False)
+    write_preview(output, replacements, scale)
+    print(f"Written {output}!")
+
+if __name__ == "__main__":
+    preview_cli()
@@ -6,32 +6,127 @@ Defines a class representing a black&white image of a QR-Code.
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import string
+
 from pixels_source import PixelsSource
+from pixels_geometry import pixels_to_rects
 
 # see https://github.com/kazuhikoarase/qrcode-generator/blob/master/python/qrcode.py
 #import kicad_qrcode as qrcode  # TODO: local qrcode package is prefered, so we renamed it
 import qrcode
+from qr_payload import QrCompaction, format_version, min_type_number as min_compacted_type_number
+
+ERROR_CORRECT_LEVEL = qrcode.ErrorCorrectLevel.L
+# How to choose the mask pattern of a QR-Code:
+# by the penalty of the QR-Code specification only,
+# or by the number of rectangles needed to draw it
+# (see pixels_geometry.pixels_to_rects()), the penalty breaking ties
+MASK_PENALTY = 'penalty'
+MASK_GEOMETRY = 'geometry'
+MASK_STRATEGIES = [MASK_PENALTY, MASK_GEOMETRY]
+# With MASK_GEOMETRY, only masks with a penalty
+# at most this much higher than the lowest one are considered,
+# to not make the code harder to read for scanners
+MASK_MAX_PENALTY_RATIO = 1.5
+
+def min_type_number(length: int) -> int:
+    '''
+    Returns the smallest QR-Code version that fits
+    length bytes of data, straight from the capacity tables,
+    or None if none does.
+    '''
+    for typeNumber in range(1, len(qrcode.QRUtil.MAX_LENGTH) + 1):
+        if length <= qrcode.QRUtil.getMaxLength(typeNumber, qrcode.Mode.MODE_8BIT_BYTE, ERROR_CORRECT_LEVEL):
+            return typeNumber
+    return None
+
+def calc_qr_code_size(content, border=1, compaction: QrCompaction = None) -> (int, int):
+    '''
+    Returns the size (in pixels) QrCodePixelsSource(content, border, compaction=compaction) would have,
+    from the capacity tables only, without encoding anything.
+    '''
+    length = len(content) if isinstance(content, bytes) else len(qrcode.QRUtil.stringToBytes(str(content)))
+    if compaction is None:
+        typeNumber = min_type_number(length)
+    else:
+        typeNumber = min_compacted_type_number(content, ERROR_CORRECT_LEVEL, compaction)
+    if typeNumber is None:
+        raise RuntimeError(f"Too much data ({length} bytes) for a QR-Code")
+    size = typeNumber * 4 + 17 + 2 * border
+    return (size, size)
 
 class QrCodePixelsSource(PixelsSource):
     '''
     Allows to use a string of data as sources for black&white pixels,
     encoded as a QR-Code.
     '''
-    def __init__(self, content, border=1):
+    def __init__(self, content, border=1, typeNumber=None, maskStrategy=MASK_PENALTY, compaction: QrCompaction = None):
+        '''
+        content may also be given as bytes, which are then encoded as-is.
+        If typeNumber (the QR-Code version) is None,
+        the smallest one that fits the content is used.
+        maskStrategy is one of MASK_STRATEGIES.
+        If compaction is given, the content is transformed and split
+        into segments with it (see qr_payload.QrCompaction)
+        before encoding, and typeNumber is ignored.
+        '''
         self.content = content
         self.border = border
         # Build QR-Code
         self.qrc = qrcode.QRCode()
-        #self.qrc.setTypeNumber(4)
         # ErrorCorrectLevel: L = 7%, M = 15% Q = 25% H = 30%
         #self.qrc.setErrorCorrectLevel(qrcode.ErrorCorrectLevel.M)
-        self.qrc.setErrorCorrectLevel(qrcode.ErrorCorrectLevel.L)
-        self.qrc.addData(str(content))
+        self.qrc.setErrorCorrectLevel(ERROR_CORRECT_LEVEL)
+        # the QR-Code versions without and with compaction
+        self.compactStats = None
+        if compaction is None:
+            self.qrc.setTypeNumber(typeNumber)
+            self.qrc.addData(content if isinstance(content, bytes) else str(content))
+        else:
+            for segment in compaction.segments(content, ERROR_CORRECT_LEVEL):
+                self.qrc.addSegment(segment)
         self.qrc.make()
+        if compaction is not None:
+            self.compactStats = {
+                'version_before': min_compacted_type_number(content, ERROR_CORRECT_LEVEL),
+                'version': self.qrc.getTypeNumber(),
+            }
         self.len = self.qrc.modules.__len__() + (self.border * 2)
+        # (mask pattern, number of rectangles) of the chosen mask,
+        # and of the one the penalty alone would have chosen
+        self.maskStats = None
+        if maskStrategy == MASK_GEOMETRY:
+            self._chooseMaskByGeometry()
+
+    def _chooseMaskByGeometry(self):
+        '''
+        Re-makes the QR-Code with each mask pattern,
+        and keeps the one resulting in the fewest rectangles.
+        The rectangles and the penalty of each mask are counted
+        on the same (final) layout, the one that gets drawn,
+        and the mask the penalty alone chose always stays a candidate,
+        so the result never needs more rectangles than that one.
+        '''
+        penalty_mask = self.qrc.maskPattern
+        candidates = []
+        for maskPattern in range(8):
+            self.qrc.make(maskPattern)
+            penalty = qrcode.QRUtil.getLostPoint(self.qrc)
+            candidates.append((len(pixels_to_rects(self)), penalty, maskPattern))
+        min_penalty = min(penalty for (_, penalty, _) in candidates)
+        best = min(candidate for candidate in candidates
+                if candidate[1] <= min_penalty * MASK_MAX_PENALTY_RATIO or candidate[2] == penalty_mask)
+        self.qrc.make(best[2])
+        self.maskStats = {
+            'mask': best[2],
+            'rects': best[0],
+            'penalty_mask': penalty_mask,
+            'penalty_mask_rects': candidates[penalty_mask][0],
+        }
 
     def __str__(self):
-        return f"QR-Code-PixelsSource[data: '{self.content}']"
+        content = self.content.decode('latin-1') if isinstance(self.content, bytes) else self.content
+        return f"QR-Code-PixelsSource[data: '{content}']"
 
     def getSize(self):
         return (self.len, self.len)
@@ -56,6 +151,67 @@ class QrCodePixelsSource(PixelsSource):
             data.extend(line)
         return list(data)
 
+class QrCodeTemplate:
+    '''
+    Creates many QR-Codes from a single template string
+    in Python format syntax (e.g. "https://x.org/{serial}"),
+    as is needed for serial-number runs.
+    The constant parts of the template are converted to bytes only once,
+    and the QR-Code version is chosen once per encoded data length,
+    straight from the capacity tables.
+    '''
+    def __init__(self, template: str):
+        self.template = template
+        self.formatter = string.Formatter()
+        # list of (literal bytes, field name, format spec, conversion)
+        self.parts = [
+                (bytes(qrcode.QRUtil.stringToBytes(literal)), field_name, format_spec, conversion)
+                for (literal, field_name, format_spec, conversion) in self.formatter.parse(template)]
+        self.typeNumbers = {}
+
+    def __str__(self):
+        return f"QR-Code-Template[template: '{self.template}']"
+
+    def render(self, variables: dict) -> bytes:
+        '''
+        Fills in the variables, returning the data to be encoded.
+        '''
+        data = bytearray()
+        for (literal, field_name, format_spec, conversion) in self.parts:
+            data += literal
+            if field_name is not None:
+                value = self.formatter.get_field(field_name, (), variables)[0]
+                value = self.formatter.convert_field(value, conversion)
+                value = self.formatter.format_field(value, format_spec)
+                data += bytes(qrcode.QRUtil.stringToBytes(value))
+        return bytes(data)
+
+    def getTypeNumber(self, length: int) -> int:
+        '''
+        Returns the smallest QR-Code version that fits
+        length bytes of data.
+        '''
+        typeNumber = self.typeNumbers.get(length)
+        if typeNumber is None:
+            typeNumber = min_type_number(length)
+            if typeNumber is None:
+                raise RuntimeError(f"Too much data ({length} bytes) for a QR-Code, from template '{self.template}'")
+            self.typeNumbers[length] = typeNumber
+        return typeNumber
+
+    def createPixelsSource(self, variables: dict, border=1, maskStrategy=MASK_PENALTY, compaction: QrCompaction = None) -> QrCodePixelsSource:
+        data = self.render(variables)
+        if compaction is not None:
+            return QrCodePixelsSource(data, border, maskStrategy=maskStrategy, compaction=compaction)
+        return QrCodePixelsSource(data, border, self.getTypeNumber(len(data)), maskStrategy)
+
+def format_compact_stats(compactStats) -> str:
+    '''
+    Formats the QR-Code versions before and after compaction
+    (see QrCodePixelsSource.compactStats).
+    '''
+    return f"{format_version(compactStats['version_before'])} -> {format_version(compactStats['version'])}"
+
 def testing():
     '''
     Testing - output to stdout.
@@ -64,6 +220,12 @@ def testing():
     data = "My Data"
     pixels = QrCodePixelsSource(data, 1)
     pixels.debug_to_stdout()
+    pixels = QrCodePixelsSource(data, 1, maskStrategy=MASK_GEOMETRY)
+    pixels.debug_to_stdout()
+    print(pixels.maskStats)
+    pixels = QrCodePixelsSource("https://example.org/SN/0000042", 1, compaction=QrCompaction(['upper']))
+    pixels.debug_to_stdout()
+    print(format_compact_stats(pixels.compactStats))
 
 if __name__ == "__main__":
     testing()
@@ -0,0 +1,274 @@
+'''
+Makes QR-Code payloads more compact, so they fit into smaller QR-Code versions,
+which are faster to encode and need fewer polygons to draw.
+This is done by splitting the payload into numeric, alpha-numeric
+and byte segments, and optionally by transforming the payload before that.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import itertools
+import math
+import re
+import zlib
+
+import qrcode
+
+# Only split the payload into the most compact mode segments,
+# leaving the payload itself as it is
+TRANSFORM_SEGMENTS = 'segments'
+# Upper-case the scheme and host of URLs, and hexadecimal strings,
+# which are both case-insensitive, and then fit the alpha-numeric mode
+TRANSFORM_UPPER = 'upper'
+# Replace hexadecimal strings with decimal digits, for the numeric mode;
+# the reader has to convert them back
+TRANSFORM_HEX_NUMERIC = 'hex-numeric'
+# Compress the payload with deflate (zlib), and encode that in base45
+# (RFC 9285), for the alpha-numeric mode; the reader has to decode it
+TRANSFORM_BASE45_DEFLATE = 'base45-deflate'
+TRANSFORMS = [TRANSFORM_SEGMENTS, TRANSFORM_UPPER, TRANSFORM_HEX_NUMERIC, TRANSFORM_BASE45_DEFLATE]
+# Hexadecimal strings shorter than this are left alone
+HEX_MIN_LENGTH = 8
+# At least one of the characters has to be a letter,
+# so decimal numbers (e.g. dates) are left alone
+R_HEX = re.compile(rb"\b(?=[0-9]*[a-fA-F])[0-9a-fA-F]{%d,}\b" % HEX_MIN_LENGTH)
+# The scheme, the user info (which is case-sensitive) and the host of URLs
+R_URL_HOST = re.compile(rb"\b([a-zA-Z][a-zA-Z0-9+.-]*://)([^/?#\s@]*@)?([^/?#\s]*)")
+DIGITS = frozenset(b"0123456789")
+ALPHA_NUM = frozenset(qrcode.ALPHA_NUM_CHARS.encode('ascii'))
+BASE45_CHARS = qrcode.ALPHA_NUM_CHARS
+# Bits needed per character in the numeric, alpha-numeric and byte modes,
+# times 6, to get whole numbers
+MODE_CHAR_COSTS = {
+    qrcode.Mode.MODE_NUMBER: 20,
+    qrcode.Mode.MODE_ALPHA_NUM: 33,
+    qrcode.Mode.MODE_8BIT_BYTE: 48,
+}
+
+# To look up the length of the segment headers, per mode
+EMPTY_SEGMENTS = {
+    qrcode.Mode.MODE_NUMBER: qrcode.QRNumber(''),
+    qrcode.Mode.MODE_ALPHA_NUM: qrcode.QRAlphaNum(''),
+    qrcode.Mode.MODE_8BIT_BYTE: qrcode.QR8BitByte(b''),
+}
+
+def _to_bytes(content) -> bytes:
+    return content if isinstance(content, bytes) else bytes(qrcode.QRUtil.stringToBytes(str(content)))
+
+def read_prefix_map(map_file) -> tuple:
+    '''
+    Reads a map of long (URL) prefixes to the short ones to replace them with,
+    e.g. pointing to a local redirection service;
+    one pair per line, separated by white-space,
+    with empty lines and lines starting with '#' ignored.
+    '''
+    prefixes = []
+    with open(map_file) as map_f:
+        for line in map_f:
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            parts = line.split()
+            if len(parts) != 2:
+                raise RuntimeError(f"Invalid line in prefix map '{map_file}', expected 'LONG_PREFIX SHORT_PREFIX': '{line}'")
+            prefixes.append((_to_bytes(parts[0]), _to_bytes(parts[1])))
+    return tuple(prefixes)
+
+def apply_prefix_map(data: bytes, prefix_map) -> bytes:
+    '''
+    Replaces all occurrences of the long prefixes in the map with the short ones,
+    preferring the longest matching prefix.
+    '''
+    if len(prefix_map) == 0:
+        return data
+    replacements = dict(prefix_map)
+    pattern = re.compile(b'|'.join(re.escape(long) for long in sorted(replacements, key=len, reverse=True)))
+    return pattern.sub(lambda match: replacements[match.group(0)], data)
+
+def upper_case(data: bytes) -> bytes:
+    '''
+    Upper-cases the scheme and host of URLs, and hexadecimal strings.
+    '''
+    data = R_URL_HOST.sub(lambda match: match.group(1).upper() + (match.group(2) or b'') + match.group(3).upper(), data)
+    return R_HEX.sub(lambda match: match.group(0).upper(), data)
+
+def hex_to_numeric(data: bytes) -> bytes:
+    '''
+    Replaces hexadecimal strings with their value in decimal digits,
+    zero-padded to the number of digits the longest value of that many
+    hexadecimal digits would have, so leading zeros are kept.
+    '''
+    def to_decimal(match):
+        hex_str = match.group(0)
+        width = math.ceil(len(hex_str) * math.log10(16))
+        return str(int(hex_str, 16)).zfill(width).encode('ascii')
+    return R_HEX.sub(to_decimal, data)
+
+def base45_encode(data: bytes) -> bytes:
+    '''
+    Encodes data in base45, as specified in RFC 9285.
+    '''
+    chars = []
+    for i in range(0, len(data) - 1, 2):
+        value = data[i] * 256 + data[i + 1]
+        chars.extend((value % 45, value // 45 % 45, value // 2025))
+    if len(data) % 2 == 1:
+        chars.extend((data[-1] % 45, data[-1] // 45))
+    return ''.join(BASE45_CHARS[char] for char in chars).encode('ascii')
+
+def deflate_base45(data: bytes) -> bytes:
+    return base45_encode(zlib.compress(data, 9))
+
+def segment(data: bytes, typeNumber: int = 1) -> list:
+    '''
+    Splits data into the numeric, alpha-numeric and byte segments
+    that need the fewest bits to encode in a QR-Code of version typeNumber,
+    including the segment headers.
+    Returns them as qrcode.QR8BitByte (and sub-class) instances.
+    '''
+    if len(data) == 0:
+        return [qrcode.QR8BitByte(data)]
+    modes = list(MODE_CHAR_COSTS)
+    header_costs = {mode: (4 + empty.getLengthInBits(typeNumber)) * 6
+            for (mode, empty) in EMPTY_SEGMENTS.items()}
+    # costs[mode] is the cost of the cheapest encoding of the data so far,
+    # ending in a segment of that mode, and paths[mode] its modes per character
+    costs = {mode: 0 for mode in modes}
+    paths = {mode: [] for mode in modes}
+    for (index, char) in enumerate(data):
+        new_costs = {}
+        new_paths = {}
+        for mode in modes:
+            if mode == qrcode.Mode.MODE_NUMBER and char not in DIGITS:
+                continue
+            if mode == qrcode.Mode.MODE_ALPHA_NUM and char not in ALPHA_NUM:
+                continue
+            (cost, prev_mode) = min(
+                    (costs[prev] + (0 if prev == mode and index > 0 else header_costs[mode]), prev)
+                    for prev in costs)
+            new_costs[mode] = cost + MODE_CHAR_COSTS[mode]
+            new_paths[mode] = paths[prev_mode] if prev_mode == mode and index > 0 else paths[prev_mode] + [(index, mode)]
+        (costs, paths) = (new_costs, new_paths)
+    best = min(costs, key=lambda mode: (costs[mode], mode))
+    starts = paths[best] + [(len(data), None)]
+    segments = []
+    for ((start, mode), (end, _)) in zip(starts, starts[1:]):
+        chunk = data[start:end]
+        if mode == qrcode.Mode.MODE_NUMBER:
+            segments.append(qrcode.QRNumber(chunk.decode('ascii')))
+        elif mode == qrcode.Mode.MODE_ALPHA_NUM:
+            segments.append(qrcode.QRAlphaNum(chunk.decode('ascii')))
+        else:
+            segments.append(qrcode.QR8BitByte(chunk))
+    return segments
+
+class QrCompaction:
+    '''
+    The transforms to apply to QR-Code payloads before encoding them
+    (a sub-set of TRANSFORMS), and the prefix map to shorten URLs with
+    (see read_prefix_map()).
+    Instances are immutable and hashable, so they may be used in cache keys.
+    '''
+    def __init__(self, transforms=(), prefix_map=()):
+        for transform in transforms:
+            if transform not in TRANSFORMS:
+                raise RuntimeError(f"Unknown QR-Code payload transform '{transform}', choose from: {TRANSFORMS}")
+        self.transforms = tuple(transform for transform in TRANSFORMS if transform in transforms)
+        self.prefix_map = tuple(prefix_map)
+
+    def _key(self):
+        return (self.transforms, self.prefix_map)
+
+    def __eq__(self, other):
+        return isinstance(other, QrCompaction) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __str__(self):
+        return f"QR-Compaction[transforms: {', '.join(self.transforms) or 'none'}, prefixes: {len(self.prefix_map)}]"
+
+    def apply(self, content) -> bytes:
+        '''
+        Returns the payload to encode instead of content.
+        '''
+        data = apply_prefix_map(_to_bytes(content), self.prefix_map)
+        if TRANSFORM_HEX_NUMERIC in self.transforms:
+            data = hex_to_numeric(data)
+        if TRANSFORM_UPPER in self.transforms:
+            data = upper_case(data)
+        if TRANSFORM_BASE45_DEFLATE in self.transforms:
+            data = deflate_base45(data)
+        return data
+
+    def segments(self, content, errorCorrectLevel) -> list:
+        '''
+        Returns the segments to encode content with,
+        for the smallest QR-Code version they fit into.
+        '''
+        data = self.apply(content)
+        segments = segment(data)
+        typeNumber = qrcode.getMinTypeNumber(segments, errorCorrectLevel)
+        if typeNumber >= 10:
+            # Longer count indicators may change what is cheapest
+            segments = segment(data, typeNumber)
+        return segments
+
+def min_type_number(content, errorCorrectLevel, compaction: QrCompaction = None) -> int:
+    '''
+    Returns the smallest QR-Code version that fits content,
+    with the given compaction, or as plain bytes,
+    or None if none does.
+    '''
+    try:
+        if compaction is None:
+            return qrcode.getMinTypeNumber((qrcode.QR8BitByte(_to_bytes(content)),), errorCorrectLevel)
+        return qrcode.getMinTypeNumber(compaction.segments(content, errorCorrectLevel), errorCorrectLevel)
+    except RuntimeError:
+        return None
+
+def format_version(typeNumber) -> str:
+    if typeNumber is None:
+        return "too large"
+    modules = typeNumber * 4 + 17
+    return f"version {typeNumber} ({modules}x{modules} modules)"
+
+def report(content, prefix_map=None):
+    '''
+    Prints the QR-Code version content would be encoded in,
+    with each combination of payload transforms,
+    and the transformed payload.
+    '''
+    from qr_code_pixels_source import ERROR_CORRECT_LEVEL
+
+    prefixes = () if prefix_map is None else read_prefix_map(prefix_map)
+    print(f"{'as-is':<48} {format_version(min_type_number(content, ERROR_CORRECT_LEVEL))}")
+    optional = TRANSFORMS[1:]
+    for num in range(len(optional) + 1):
+        for transforms in itertools.combinations(optional, num):
+            compaction = QrCompaction((TRANSFORM_SEGMENTS,) + transforms, prefixes)
+            name = ' + '.join(compaction.transforms) + (' + prefix-map' if len(prefixes) > 0 else '')
+            print(f"{name:<48} {format_version(min_type_number(content, ERROR_CORRECT_LEVEL, compaction))}"
+                    + f" - '{compaction.apply(content).decode('latin-1')}'")
+
+if __name__ == "__main__":
+    # imported here, so the KiCad plugin (using this through qr_code_pixels_source)
+    # does not require click
+    import click
+
+    @click.command()
+    @click.argument("content", type=click.STRING)
+    @click.option('--prefix-map', type=click.Path(exists=True, dir_okay=False, file_okay=True, readable=True), envvar='QR_PREFIX_MAP',
+            default=None, help='File mapping long URL prefixes to short ones, one "LONG SHORT" pair per line')
+    def report_cli(content, prefix_map=None):
+        '''
+        Reports the QR-Code version and size CONTENT would be encoded in,
+        with each combination of payload transforms
+        (see placeholder2image.py --qr-compact),
+        so you can choose the smallest one your readers support.
+        '''
+        report(content, prefix_map)
+
+    report_cli()
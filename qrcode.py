@@ -12,6 +12,8 @@ DENSO WAVE INCORPORATED
 #
 # SPDX-License-Identifier: MIT
 
+import functools
+
 class QRCode:
     '''
     QR Code Generator for Python
@@ -28,6 +30,10 @@ class QRCode:
     # generate with auto type number
     # qr = QRCode.getMinimumQRCode('here comes qr!', ErrorCorrectLevel.M)
 
+    # or without any object state, e.g. from many threads at once
+    # (typeNumber, maskPattern, modules) = encode(
+    #     (QR8BitByte('here comes qr!'),), ErrorCorrectLevel.M)
+
     # create an image
     for r in range(qr.getModuleCount() ):
         for c in range(qr.getModuleCount() ):
@@ -43,6 +49,7 @@ class QRCode:
         self.errorCorrectLevel = ErrorCorrectLevel.H
         self.qrDataList = []
         self.modules = []
+        self.maskPattern = None
         self.moduleCount = 0
 
     def getTypeNumber(self):
@@ -63,6 +70,10 @@ class QRCode:
     def addData(self, data):
         self.qrDataList.append(QR8BitByte(data) )
 
+    def addSegment(self, segment):
+        # e.g. a QRNumber or QRAlphaNum, for more compact encodings
+        self.qrDataList.append(segment)
+
     def getDataCount(self):
         return len(self.qrDataList)
 
@@ -76,159 +87,73 @@ class QRCode:
     def getModuleCount(self):
         return self.moduleCount
 
-    def make(self):
-        self._make(False, self._getBestMaskPattern() )
-
-    def _getBestMaskPattern(self):
-        minLostPoint = 0
-        pattern = 0
-        for i in range(8):
-            self._make(True, i)
-            lostPoint = QRUtil.getLostPoint(self)
-            if i == 0 or minLostPoint > lostPoint:
-                minLostPoint = lostPoint
-                pattern = i
-        return pattern
-
-    def _determineMinTypeNumber(self):
-        self.typeNumber = 0
-        while True:
-            try:
-                self.typeNumber = self.typeNumber + 1
-                self._make(True, 1)
-                break
-            except:
-                continue
-        res = self.typeNumber
-        self.typeNumber = None
-        return res
-
-    def _make(self, test, maskPattern):
-
-        if self.typeNumber is None:
-            # Auto-determine minimal required type
-            self.typeNumber = self._determineMinTypeNumber()
-
-        self.moduleCount = self.typeNumber * 4 + 17
-        self.modules = [[None] * self.moduleCount
-            for i in range(self.moduleCount)]
-
-        self._setupPositionProbePattern(0, 0)
-        self._setupPositionProbePattern(self.moduleCount - 7, 0)
-        self._setupPositionProbePattern(0, self.moduleCount - 7)
-
-        self._setupPositionAdjustPattern()
-        self._setupTimingPattern()
-
-        self._setupTypeInfo(test, maskPattern)
-
-        if self.typeNumber >= 7:
-            self._setupTypeNumber(test)
-
-        data = QRCode._createData(
-            self.typeNumber,
+    def make(self, maskPattern=None):
+        # All the work happens in encode(), without touching self,
+        # which only receives the results at the end
+        (self.typeNumber, self.maskPattern, self.modules) = encode(
+            tuple(self.qrDataList),
             self.errorCorrectLevel,
-            self.qrDataList)
+            self.typeNumber,
+            maskPattern)
+        self.moduleCount = len(self.modules)
 
-        self._mapData(data, maskPattern)
+    @staticmethod
+    def _layOut(typeNumber, errorCorrectLevel, data, maskPattern, test):
+        '''
+        Returns the modules of a QR Code with the given data codewords,
+        as a new list of rows.
+        In test mode (used for choosing the mask pattern),
+        the type info and type number cells stay light.
+        '''
+        template = QRTemplate.get(typeNumber)
+        modules = [row[:] for row in
+            (template.testModules if test else template.modules)]
+        QRCode._setupTypeInfo(modules, errorCorrectLevel, test, maskPattern)
+        QRCode._mapData(modules, data, maskPattern, template.dataCells)
+        return modules
 
-    def _mapData(self, data, maskPattern):
+    @staticmethod
+    def _mapData(modules, data, maskPattern, dataCells):
 
-        rows = list(range(self.moduleCount) )
-        cols = [col - 1 if col <= 6 else col
-            for col in range(self.moduleCount - 1, 0, -2)]
         maskFunc = QRUtil.getMaskFunction(maskPattern)
+        bitCount = len(data) * 8
 
-        byteIndex = 0
-        bitIndex = 7
-
-        for col in cols:
-            rows.reverse()
-            for row in rows:
-                for c in range(2):
-                    if self.modules[row][col - c] is None:
-
-                        dark = False
-                        if byteIndex < len(data):
-                            dark = ( (data[byteIndex] >> bitIndex) & 1) == 1
-                        if maskFunc(row, col - c):
-                            dark = not dark
-                        self.modules[row][col - c] = dark
-
-                        bitIndex -= 1
-                        if bitIndex == -1:
-                            byteIndex += 1
-                            bitIndex = 7
-
-    def _setupPositionAdjustPattern(self):
-        pos = QRUtil.getPatternPosition(self.typeNumber)
-        for row in pos:
-            for col in pos:
-                if self.modules[row][col] is not None:
-                    continue
-                for r in range(-2, 3):
-                    for c in range(-2, 3):
-                        self.modules[row + r][col + c] = (
-                            r == -2 or r == 2 or c == -2 or c == 2
-                            or (r == 0 and c == 0) )
+        for (index, (row, col)) in enumerate(dataCells):
+            dark = (index < bitCount
+                and ( (data[index >> 3] >> (7 - (index & 7) ) ) & 1) == 1)
+            if maskFunc(row, col):
+                dark = not dark
+            modules[row][col] = dark
 
-    def _setupPositionProbePattern(self, row, col):
-        for r in range(-1, 8):
-            for c in range(-1, 8):
-                if (row + r <= -1 or self.moduleCount <= row + r
-                        or col + c <= -1 or self.moduleCount <= col + c):
-                    continue
-                self.modules[row + r][col + c] = (
-                    (0 <= r and r <= 6 and (c == 0 or c == 6) )
-                    or (0 <= c <= 6 and (r == 0 or r == 6) )
-                    or (2 <= r <= 4 and 2 <= c <= 4) )
-
-    def _setupTimingPattern(self):
-        for r in range(8, self.moduleCount - 8):
-            if self.modules[r][6] is not None:
-                continue
-            self.modules[r][6] = r % 2 == 0
-        for c in range(8, self.moduleCount - 8):
-            if self.modules[6][c] is not None:
-                continue
-            self.modules[6][c] = c % 2 == 0
-
-    def _setupTypeNumber(self, test):
-        bits = QRUtil.getBCHTypeNumber(self.typeNumber)
-        for i in range(18):
-            self.modules[i // 3][i % 3 + self.moduleCount - 8 - 3] = (
-                not test and ( (bits >> i) & 1) == 1)
-        for i in range(18):
-            self.modules[i % 3 + self.moduleCount - 8 - 3][i // 3] = (
-                not test and ( (bits >> i) & 1) == 1)
-
-    def _setupTypeInfo(self, test, maskPattern):
+    @staticmethod
+    def _setupTypeInfo(modules, errorCorrectLevel, test, maskPattern):
 
-        data = (self.errorCorrectLevel << 3) | maskPattern
+        moduleCount = len(modules)
+        data = (errorCorrectLevel << 3) | maskPattern
         bits = QRUtil.getBCHTypeInfo(data)
 
         # vertical
         for i in range(15):
             mod = not test and ( (bits >> i) & 1) == 1
             if i < 6:
-                self.modules[i][8] = mod
+                modules[i][8] = mod
             elif i < 8:
-                self.modules[i + 1][8] = mod
+                modules[i + 1][8] = mod
             else:
-                self.modules[self.moduleCount - 15 + i][8] = mod
+                modules[moduleCount - 15 + i][8] = mod
 
         # horizontal
         for i in range(15):
             mod = not test and ( (bits >> i) & 1) == 1
             if i < 8:
-                self.modules[8][self.moduleCount - i - 1] = mod
+                modules[8][moduleCount - i - 1] = mod
             elif i < 9:
-                self.modules[8][15 - i - 1 + 1] = mod
+                modules[8][15 - i - 1 + 1] = mod
             else:
-                self.modules[8][15 - i - 1] = mod
+                modules[8][15 - i - 1] = mod
 
         # fixed
-        self.modules[self.moduleCount - 8][8] = not test
+        modules[moduleCount - 8][8] = not test
 
     @staticmethod
     def _createData(typeNumber, errorCorrectLevel, dataArray):
@@ -255,7 +180,7 @@ class QRCode:
 
         # padding
         while buf.getLengthInBits() % 8 != 0:
-            buf.put(False)
+            buf.putBit(False)
 
         # padding
         while True:
@@ -337,6 +262,179 @@ class QRCode:
         qr.make()
         return qr
 
+# The highest type number (version) the tables here cover
+MAX_TYPE_NUMBER = 10
+
+def getMinTypeNumber(dataList, errorCorrectLevel):
+    '''
+    Returns the smallest type number (version) the data fits into,
+    only counting bits; no need to encode or lay out anything.
+    '''
+    for typeNumber in range(1, MAX_TYPE_NUMBER + 1):
+        totalDataCount = sum(rsBlock.getDataCount() for rsBlock in
+            RSBlock.getRSBlocks(typeNumber, errorCorrectLevel) )
+        bitLength = sum(4 + data.getLengthInBits(typeNumber)
+            + data.getBitLength() for data in dataList)
+        if bitLength <= totalDataCount * 8:
+            return typeNumber
+    raise RuntimeError('code length overflow: the data does not fit'
+        + ' into the highest supported type number (%s)' % MAX_TYPE_NUMBER)
+
+def encode(dataList, errorCorrectLevel, typeNumber=None, maskPattern=None):
+    '''
+    Encodes the data (a sequence of QR8BitByte) as a QR Code.
+    This is a pure function:
+    it only reads the shared tables and templates,
+    so it may be called from many threads at once.
+    If typeNumber or maskPattern are None,
+    the smallest fitting type number and the mask pattern
+    with the lowest penalty are chosen.
+    Returns (typeNumber, maskPattern, modules),
+    with the modules as a new list of rows of booleans.
+    '''
+    if typeNumber is None:
+        typeNumber = getMinTypeNumber(dataList, errorCorrectLevel)
+    # The data codewords do not depend on the mask pattern
+    data = QRCode._createData(typeNumber, errorCorrectLevel, dataList)
+    if maskPattern is None:
+        # the first of the lowest penalty ones
+        maskPattern = min(range(8), key=lambda pattern:
+            QRUtil.getLostPointOfModules(QRCode._layOut(
+                typeNumber, errorCorrectLevel, data, pattern, True) ) )
+    modules = QRCode._layOut(
+        typeNumber, errorCorrectLevel, data, maskPattern, False)
+    return (typeNumber, maskPattern, modules)
+
+class QRTemplate:
+    '''
+    The parts of a QR Code that only depend on its type number (version):
+    the function patterns (finder-, alignment- and timing patterns,
+    and the type number itself), the cells reserved for them
+    (and for the type info), and the coordinates of the data cells,
+    in the zig-zag order in which the data bits are placed.
+
+    Templates are built once per type number, on first use,
+    and are shared between all QRCode instances;
+    see QRTemplate.get(typeNumber).
+    They are never modified after construction,
+    so they may be shared between threads too.
+    '''
+
+    def __init__(self, typeNumber):
+        self.typeNumber = typeNumber
+        self.moduleCount = typeNumber * 4 + 17
+        self.modules = [[None] * self.moduleCount
+            for i in range(self.moduleCount)]
+
+        self._setupPositionProbePattern(0, 0)
+        self._setupPositionProbePattern(self.moduleCount - 7, 0)
+        self._setupPositionProbePattern(0, self.moduleCount - 7)
+
+        self._setupPositionAdjustPattern()
+        self._setupTimingPattern()
+        self._reserveTypeInfo()
+
+        # In test mode (used for choosing the mask pattern),
+        # the type number cells stay light.
+        if self.typeNumber >= 7:
+            self._setupTypeNumber(True)
+        self.testModules = self.modules
+        self.modules = [row[:] for row in self.testModules]
+        if self.typeNumber >= 7:
+            self._setupTypeNumber(False)
+
+        self.reserved = [[cell is not None for cell in row]
+            for row in self.modules]
+        self.dataCells = tuple(self._createDataCells() )
+
+    @staticmethod
+    def get(typeNumber):
+        template = _templates.get(typeNumber)
+        if template is None:
+            # Two threads may both build it; the first one stored wins
+            template = _templates.setdefault(typeNumber,
+                QRTemplate(typeNumber) )
+        return template
+
+    def _createDataCells(self):
+
+        rows = list(range(self.moduleCount) )
+        cols = [col - 1 if col <= 6 else col
+            for col in range(self.moduleCount - 1, 0, -2)]
+
+        dataCells = []
+        for col in cols:
+            rows.reverse()
+            for row in rows:
+                for c in range(2):
+                    if not self.reserved[row][col - c]:
+                        dataCells.append( (row, col - c) )
+        return dataCells
+
+    def _setupPositionAdjustPattern(self):
+        pos = QRUtil.getPatternPosition(self.typeNumber)
+        for row in pos:
+            for col in pos:
+                if self.modules[row][col] is not None:
+                    continue
+                for r in range(-2, 3):
+                    for c in range(-2, 3):
+                        self.modules[row + r][col + c] = (
+                            r == -2 or r == 2 or c == -2 or c == 2
+                            or (r == 0 and c == 0) )
+
+    def _setupPositionProbePattern(self, row, col):
+        for r in range(-1, 8):
+            for c in range(-1, 8):
+                if (row + r <= -1 or self.moduleCount <= row + r
+                        or col + c <= -1 or self.moduleCount <= col + c):
+                    continue
+                self.modules[row + r][col + c] = (
+                    (0 <= r and r <= 6 and (c == 0 or c == 6) )
+                    or (0 <= c <= 6 and (r == 0 or r == 6) )
+                    or (2 <= r <= 4 and 2 <= c <= 4) )
+
+    def _setupTimingPattern(self):
+        for r in range(8, self.moduleCount - 8):
+            if self.modules[r][6] is not None:
+                continue
+            self.modules[r][6] = r % 2 == 0
+        for c in range(8, self.moduleCount - 8):
+            if self.modules[6][c] is not None:
+                continue
+            self.modules[6][c] = c % 2 == 0
+
+    def _setupTypeNumber(self, test):
+        bits = QRUtil.getBCHTypeNumber(self.typeNumber)
+        for i in range(18):
+            self.modules[i // 3][i % 3 + self.moduleCount - 8 - 3] = (
+                not test and ( (bits >> i) & 1) == 1)
+        for i in range(18):
+            self.modules[i % 3 + self.moduleCount - 8 - 3][i // 3] = (
+                not test and ( (bits >> i) & 1) == 1)
+
+    def _reserveTypeInfo(self):
+        # The actual values are set per mask pattern,
+        # see QRCode._setupTypeInfo()
+        for i in range(15):
+            if i < 6:
+                self.modules[i][8] = False
+            elif i < 8:
+                self.modules[i + 1][8] = False
+            else:
+                self.modules[self.moduleCount - 15 + i][8] = False
+        for i in range(15):
+            if i < 8:
+                self.modules[8][self.moduleCount - i - 1] = False
+            elif i < 9:
+                self.modules[8][15 - i - 1 + 1] = False
+            else:
+                self.modules[8][15 - i - 1] = False
+        self.modules[self.moduleCount - 8][8] = False
+
+# QRTemplate instances by type number, see QRTemplate.get()
+_templates = {}
+
 class Mode:
     MODE_NUMBER    = 1 << 0
     MODE_ALPHA_NUM = 1 << 1
@@ -439,6 +537,7 @@ class QRUtil:
         return QRUtil.MAX_LENGTH[t][e][m]
 
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def getErrorCorrectPolynomial(errorCorrectLength):
         a = Polynomial([1])
         for i in range(errorCorrectLength):
@@ -468,15 +567,20 @@ class QRUtil:
 
     @staticmethod
     def getLostPoint(qrcode):
+        return QRUtil.getLostPointOfModules(qrcode.modules)
 
-        moduleCount = qrcode.getModuleCount()
+    @staticmethod
+    def getLostPointOfModules(modules):
+
+        moduleCount = len(modules)
+        dark = [[bool(cell) for cell in row] for row in modules]
         lostPoint = 0
 
         # LEVEL1
         for row in range(moduleCount):
             for col in range(moduleCount):
                 sameCount = 0
-                dark = qrcode.isDark(row, col)
+                isDark = dark[row][col]
                 for r in range(-1, 2):
                     if row + r < 0 or moduleCount <= row + r:
                         continue
@@ -485,7 +589,7 @@ class QRUtil:
                             continue
                         if r == 0 and c == 0:
                             continue
-                        if dark == qrcode.isDark(row + r, col + c):
+                        if isDark == dark[row + r][col + c]:
                             sameCount += 1
                 if sameCount > 5:
                     lostPoint += (3 + sameCount - 5)
@@ -494,13 +598,13 @@ class QRUtil:
         for row in range(moduleCount - 1):
             for col in range(moduleCount - 1):
                 count = 0
-                if qrcode.isDark(row, col):
+                if dark[row][col]:
                     count += 1
-                if qrcode.isDark(row + 1, col):
+                if dark[row + 1][col]:
                     count += 1
-                if qrcode.isDark(row, col + 1):
+                if dark[row][col + 1]:
                     count += 1
-                if qrcode.isDark(row + 1, col + 1):
+                if dark[row + 1][col + 1]:
                     count += 1
                 if count in (0, 4):
                     lostPoint += 3
@@ -508,31 +612,31 @@ class QRUtil:
         # LEVEL3
         for row in range(moduleCount):
             for col in range(moduleCount - 6):
-                if (qrcode.isDark(row, col)
-                        and not qrcode.isDark(row, col + 1)
-                        and     qrcode.isDark(row, col + 2)
-                        and     qrcode.isDark(row, col + 3)
-                        and     qrcode.isDark(row, col + 4)
-                        and not qrcode.isDark(row, col + 5)
-                        and     qrcode.isDark(row, col + 6) ):
+                if (dark[row][col]
+                        and not dark[row][col + 1]
+                        and     dark[row][col + 2]
+                        and     dark[row][col + 3]
+                        and     dark[row][col + 4]
+                        and not dark[row][col + 5]
+                        and     dark[row][col + 6] ):
                     lostPoint += 40
 
         for col in range(moduleCount):
             for row in range(moduleCount - 6):
-                if (qrcode.isDark(row, col)
-                        and not qrcode.isDark(row + 1, col)
-                        and     qrcode.isDark(row + 2, col)
-                        and     qrcode.isDark(row + 3, col)
-                        and     qrcode.isDark(row + 4, col)
-                        and not qrcode.isDark(row + 5, col)
-                        and     qrcode.isDark(row + 6, col) ):
+                if (dark[row][col]
+                        and not dark[row + 1][col]
+                        and     dark[row + 2][col]
+                        and     dark[row + 3][col]
+                        and     dark[row + 4][col]
+                        and not dark[row + 5][col]
+                        and     dark[row + 6][col] ):
                     lostPoint += 40
 
         # LEVEL4
         darkCount = 0
         for col in range(moduleCount):
             for row in range(moduleCount):
-                if qrcode.isDark(row, col):
+                if dark[row][col]:
                     darkCount += 1
 
         ratio = abs(100 * darkCount // moduleCount // moduleCount - 50) // 5
@@ -572,6 +676,8 @@ class QRUtil:
 
     @staticmethod
     def stringToBytes(s):
+        if isinstance(s, bytes):
+            return list(s)
         return [ord(c) & 0xff for c in s]
 
 class QR8BitByte:
@@ -599,6 +705,9 @@ class QR8BitByte:
     def getLength(self):
         return len(QRUtil.stringToBytes(self.getData() ) )
 
+    def getBitLength(self):
+        return self.getLength() * 8
+
     def getLengthInBits(self, qr_type):
         if 0 < qr_type < 10: # 1 - 9
             return {
@@ -626,40 +735,86 @@ class QR8BitByte:
 
         raise Exception('type:%s' % type)
 
-class QRMath:
+# The characters encodable in MODE_ALPHA_NUM, by their value
+ALPHA_NUM_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+
+class QRNumber(QR8BitByte):
+    '''
+    A string of decimal digits, encoded with 10 bits per 3 digits.
+    '''
 
-    EXP_TABLE = []
-    LOG_TABLE = []
+    def __init__(self, data):
+        super().__init__(data)
+        self.mode = Mode.MODE_NUMBER
 
-    @staticmethod
-    def _init():
+    def write(self, buf):
+        data = self.getData()
+        for i in range(0, len(data), 3):
+            chunk = data[i:i + 3]
+            buf.put(int(chunk), (4, 7, 10)[len(chunk) - 1])
+
+    def getLength(self):
+        return len(self.getData() )
+
+    def getBitLength(self):
+        length = self.getLength()
+        return length // 3 * 10 + (0, 4, 7)[length % 3]
+
+class QRAlphaNum(QR8BitByte):
+    '''
+    A string of ALPHA_NUM_CHARS, encoded with 11 bits per 2 characters.
+    '''
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.mode = Mode.MODE_ALPHA_NUM
+
+    def write(self, buf):
+        data = self.getData()
+        for i in range(0, len(data) - 1, 2):
+            buf.put(ALPHA_NUM_CHARS.index(data[i]) * 45
+                + ALPHA_NUM_CHARS.index(data[i + 1]), 11)
+        if len(data) % 2 == 1:
+            buf.put(ALPHA_NUM_CHARS.index(data[-1]), 6)
+
+    def getLength(self):
+        return len(self.getData() )
+
+    def getBitLength(self):
+        length = self.getLength()
+        return length // 2 * 11 + length % 2 * 6
+
+def _createExpTable():
+    table = [0] * 256
+    for i in range(256):
+        table[i] = (1 << i if i < 8 else
+                 table[i - 4] ^ table[i - 5] ^ table[i - 6] ^ table[i - 8])
+    return tuple(table)
 
-        QRMath.EXP_TABLE = [0] * 256
-        for i in range(256):
-            QRMath.EXP_TABLE[i] = (1 << i if i < 8 else
-                     QRMath.EXP_TABLE[i - 4] ^ QRMath.EXP_TABLE[i - 5] ^
-                     QRMath.EXP_TABLE[i - 6] ^ QRMath.EXP_TABLE[i - 8])
+def _createLogTable(expTable):
+    table = [0] * 256
+    for i in range(255):
+        table[expTable[i] ] = i
+    return tuple(table)
+
+# Read-only, and shared by all threads
+EXP_TABLE = _createExpTable()
+LOG_TABLE = _createLogTable(EXP_TABLE)
+
+class QRMath:
 
-        QRMath.LOG_TABLE = [0] * 256
-        for i in range(255):
-            QRMath.LOG_TABLE[QRMath.EXP_TABLE[i] ] = i
+    EXP_TABLE = EXP_TABLE
+    LOG_TABLE = LOG_TABLE
 
     @staticmethod
     def glog(n):
         if n < 1:
             raise Exception('log(%s)' % n)
-        return QRMath.LOG_TABLE[n]
+        return LOG_TABLE[n]
 
     @staticmethod
     def gexp(n):
-        while n < 0:
-            n += 255
-        while n >= 256:
-            n -= 255
-        return QRMath.EXP_TABLE[n]
-
-# initialize statics
-QRMath._init()
+        return EXP_TABLE[n % 255]
 
 class Polynomial:
 
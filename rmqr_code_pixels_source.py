@@ -0,0 +1,79 @@
+'''
+Defines a class representing a black&white image of a rectangular Micro QR-Code (rMQR).
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from pixels_source import PixelsSource
+
+import qrcode
+import rmqrcode
+
+def _to_bytes(content) -> bytes:
+    return content if isinstance(content, bytes) else bytes(qrcode.QRUtil.stringToBytes(str(content)))
+
+def calc_rmqr_code_size(content, border=1) -> (int, int):
+    '''
+    Returns the size (in pixels) RmqrCodePixelsSource(content, border) would have,
+    from the capacity tables only, without encoding anything.
+    '''
+    data = _to_bytes(content)
+    version = rmqrcode.min_version(data)
+    if version is None:
+        raise RuntimeError(f"Too much data ({len(data)} bytes) for an rMQR-Code")
+    (height, width, _, _, _) = rmqrcode.VERSIONS[version]
+    return (width + 2 * border, height + 2 * border)
+
+class RmqrCodePixelsSource(PixelsSource):
+    '''
+    Allows to use a string of data as sources for black&white pixels,
+    encoded as a rectangular Micro QR-Code (rMQR, 7 to 17 modules high,
+    and 27 to 139 modules wide), which fits narrow placeholders.
+    These hold at most 361 digits, 219 alpha-numeric characters or 150 bytes.
+    '''
+    def __init__(self, content, border=1, version=None):
+        '''
+        content may also be given as bytes, which are then encoded as-is.
+        If version (an index into rmqrcode.VERSIONS) is None,
+        the one with the fewest modules that fits the content is used.
+        '''
+        self.content = content
+        self.border = border
+        self.qrc = rmqrcode.RMQRCode(_to_bytes(content), version)
+        (width, height) = self.qrc.getSize()
+        self.size = (width + 2 * self.border, height + 2 * self.border)
+
+    def __str__(self):
+        content = self.content.decode('latin-1') if isinstance(self.content, bytes) else self.content
+        return f"rMQR-Code-PixelsSource[data: '{content}', version: {rmqrcode.version_name(self.qrc.version)}]"
+
+    def getSize(self):
+        return self.size
+
+    def getData(self):
+        data = []
+        empty_line = [0] * self.size[0]
+        for _ in range(self.border):
+            data.extend(empty_line)
+        for row in self.qrc.modules:
+            data.extend([0] * self.border)
+            data.extend(1 if dark else 0 for dark in row)
+            data.extend([0] * self.border)
+        for _ in range(self.border):
+            data.extend(empty_line)
+        return data
+
+def testing():
+    '''
+    Testing - output to stdout.
+    '''
+
+    for data in ("12345", "SN-0042", "https://example.org/boards/0042"):
+        pixels = RmqrCodePixelsSource(data, 1)
+        print(pixels)
+        pixels.debug_to_stdout()
+
+if __name__ == "__main__":
+    testing()
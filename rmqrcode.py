@@ -0,0 +1,337 @@
+'''
+Rectangular Micro QR Code (rMQR) generator,
+following ISO/IEC 23941:2022.
+rMQR Codes are 7 to 17 modules high and 27 to 139 modules wide,
+which makes them fit into narrow placeholders,
+like strips along the edge of a board.
+The Reed-Solomon arithmetic is shared with qrcode.py.
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import functools
+
+from qrcode import BitBuffer, Polynomial, QRUtil
+
+MODE_NUMBER = 'number'
+MODE_ALPHA_NUM = 'alpha_num'
+MODE_8BIT_BYTE = '8bit_byte'
+ALPHA_NUM_CHARS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:'
+MODE_INDICATORS = {MODE_NUMBER: 1, MODE_ALPHA_NUM: 2, MODE_8BIT_BYTE: 3}
+MODE_INDICATOR_BITS = 3
+TERMINATOR_BITS = 3
+ERROR_CORRECT_LEVELS = ('M', 'H')
+# The centers of the columns with alignment patterns, per symbol width
+ALIGNMENT_COLUMNS = {
+    27: (),
+    43: (21,),
+    59: (19, 39),
+    77: (25, 51),
+    99: (23, 49, 75),
+    139: (27, 55, 83, 111),
+}
+# Per version (in the order of the version indicator):
+# (height, width,
+#  character count indicator length (in bits) for the numeric, alpha-numeric and byte modes,
+#  error correction blocks for level M, and for level H,
+#  each as a list of (number of blocks, data codewords per block),
+#  all the blocks having the same number of error correction codewords)
+VERSIONS = (
+    (7, 43, (4, 3, 3), ((1, 6),), ((1, 3),)),
+    (7, 59, (5, 5, 4), ((1, 12),), ((1, 7),)),
+    (7, 77, (6, 5, 5), ((1, 20),), ((1, 10),)),
+    (7, 99, (7, 6, 5), ((1, 28),), ((1, 14),)),
+    (7, 139, (7, 6, 6), ((1, 44),), ((2, 12),)),
+    (9, 43, (5, 5, 4), ((1, 12),), ((1, 7),)),
+    (9, 59, (6, 5, 5), ((1, 21),), ((1, 11),)),
+    (9, 77, (7, 6, 5), ((1, 31),), ((1, 8), (1, 9))),
+    (9, 99, (7, 6, 6), ((1, 42),), ((2, 11),)),
+    (9, 139, (8, 7, 6), ((1, 31), (1, 32)), ((3, 11),)),
+    (11, 27, (4, 4, 3), ((1, 7),), ((1, 5),)),
+    (11, 43, (6, 5, 5), ((1, 19),), ((1, 11),)),
+    (11, 59, (7, 6, 5), ((1, 31),), ((1, 7), (1, 8))),
+    (11, 77, (7, 6, 6), ((1, 43),), ((1, 11), (1, 12))),
+    (11, 99, (8, 7, 6), ((1, 28), (1, 29)), ((1, 14), (1, 15))),
+    (11, 139, (8, 7, 7), ((2, 42),), ((3, 14),)),
+    (13, 27, (5, 5, 4), ((1, 12),), ((1, 7),)),
+    (13, 43, (6, 6, 5), ((1, 27),), ((1, 13),)),
+    (13, 59, (7, 6, 6), ((1, 38),), ((2, 10),)),
+    (13, 77, (7, 7, 6), ((1, 26), (1, 27)), ((1, 14), (1, 15))),
+    (13, 99, (8, 7, 7), ((1, 36), (1, 37)), ((1, 11), (2, 12))),
+    (13, 139, (8, 8, 7), ((2, 35), (1, 36)), ((2, 13), (2, 14))),
+    (15, 43, (7, 6, 6), ((1, 33),), ((1, 7), (1, 8))),
+    (15, 59, (7, 7, 6), ((1, 48),), ((2, 13),)),
+    (15, 77, (8, 7, 7), ((1, 33), (1, 34)), ((2, 10), (1, 11))),
+    (15, 99, (8, 7, 7), ((2, 44),), ((4, 12),)),
+    (15, 139, (9, 8, 7), ((2, 42), (1, 43)), ((1, 13), (4, 14))),
+    (17, 43, (7, 6, 6), ((1, 39),), ((1, 10), (1, 11))),
+    (17, 59, (8, 7, 6), ((2, 28),), ((2, 14),)),
+    (17, 77, (8, 7, 7), ((2, 39),), ((1, 12), (2, 13))),
+    (17, 99, (8, 8, 7), ((2, 33), (1, 34)), ((4, 14),)),
+    (17, 139, (9, 8, 8), ((4, 38),), ((2, 12), (4, 13))),
+)
+# The masks of the format information, beside the finder pattern
+# and beside the finder sub-pattern
+FORMAT_INFO_MASKS = (0b011111101010110010, 0b100000101001111011)
+# Generator polynomial of the BCH(18, 6) code protecting the format information
+FORMAT_INFO_G18 = 0b1111100100101
+PAD_CODEWORDS = (0xEC, 0x11)
+
+def version_name(version: int) -> str:
+    (height, width, _, _, _) = VERSIONS[version]
+    return f"R{height}x{width}"
+
+def choose_mode(data: bytes) -> str:
+    '''
+    Returns the most compact mode that can encode all of data.
+    '''
+    if len(data) > 0 and all(0x30 <= byte <= 0x39 for byte in data):
+        return MODE_NUMBER
+    if all(chr(byte) in ALPHA_NUM_CHARS for byte in data):
+        return MODE_ALPHA_NUM
+    return MODE_8BIT_BYTE
+
+@functools.lru_cache(maxsize=None)
+def count_modules(height: int, width: int) -> int:
+    '''
+    Returns the number of modules available for codewords
+    (and remainder bits) in a symbol of the given size.
+    '''
+    return sum(1 for row in _layOutFunctionPatterns(height, width) for cell in row if cell is None)
+
+def data_codewords(version: int, errorCorrectLevel: str) -> int:
+    blocks = VERSIONS[version][3 + ERROR_CORRECT_LEVELS.index(errorCorrectLevel)]
+    return sum(count * size for (count, size) in blocks)
+
+def data_length_in_bits(version: int, mode: str, length: int) -> int:
+    '''
+    Returns the length of the encoded data (without terminator),
+    or None if the version can not store that many characters.
+    '''
+    count_bits = VERSIONS[version][2][(MODE_NUMBER, MODE_ALPHA_NUM, MODE_8BIT_BYTE).index(mode)]
+    if length >= (1 << count_bits):
+        return None
+    if mode == MODE_NUMBER:
+        payload = 10 * (length // 3) + (0, 4, 7)[length % 3]
+    elif mode == MODE_ALPHA_NUM:
+        payload = 11 * (length // 2) + 6 * (length % 2)
+    else:
+        payload = 8 * length
+    return MODE_INDICATOR_BITS + count_bits + payload
+
+def fits(data: bytes, version: int, errorCorrectLevel: str = 'M') -> bool:
+    length = data_length_in_bits(version, choose_mode(data), len(data))
+    return length is not None and length <= 8 * data_codewords(version, errorCorrectLevel)
+
+def min_version(data: bytes, errorCorrectLevel: str = 'M') -> int:
+    '''
+    Returns the version (index into VERSIONS) with the fewest modules
+    that fits data, preferring the lower one in case of a tie,
+    or None if none does.
+    '''
+    candidates = [(height * width, height, version)
+            for (version, (height, width, _, _, _)) in enumerate(VERSIONS)
+            if fits(data, version, errorCorrectLevel)]
+    if len(candidates) == 0:
+        return None
+    return min(candidates)[2]
+
+def _getBCHFormatInfo(data: int) -> int:
+    d = data << 12
+    while QRUtil.getBCHDigit(d) - QRUtil.getBCHDigit(FORMAT_INFO_G18) >= 0:
+        d ^= (FORMAT_INFO_G18 << (QRUtil.getBCHDigit(d) - QRUtil.getBCHDigit(FORMAT_INFO_G18)))
+    return (data << 12) | d
+
+def _layOutFunctionPatterns(height: int, width: int) -> list:
+    '''
+    Returns the modules of a symbol of the given size,
+    with the function patterns laid out (True for dark, False for light),
+    the format information reserved (False),
+    and None for the modules available for codewords.
+    '''
+    modules = [[None] * width for _ in range(height)]
+    # timing patterns, along all the edges ...
+    for col in range(width):
+        modules[0][col] = col % 2 == 0
+        modules[height - 1][col] = col % 2 == 0
+    for row in range(height):
+        modules[row][0] = row % 2 == 0
+        modules[row][width - 1] = row % 2 == 0
+    # ... and through the alignment patterns
+    for center in ALIGNMENT_COLUMNS[width]:
+        for row in range(height):
+            modules[row][center] = row % 2 == 0
+        for center_row in (1, height - 2):
+            for r in range(center_row - 1, center_row + 2):
+                for c in range(center - 1, center + 2):
+                    modules[r][c] = r != center_row or c != center
+    # corner finder patterns, top-right and bottom-left
+    modules[0][width - 2] = True
+    modules[1][width - 2] = False
+    modules[1][width - 1] = True
+    modules[height - 1][1] = True
+    modules[height - 1][2] = True
+    if height >= 11:
+        modules[height - 2][0] = True
+        modules[height - 2][1] = False
+    # finder sub-pattern, bottom-right
+    for r in range(5):
+        for c in range(5):
+            modules[height - 5 + r][width - 5 + c] = r in (0, 4) or c in (0, 4) or (r, c) == (2, 2)
+    # finder pattern, top-left, with its separator
+    for r in range(min(8, height)):
+        for c in range(8):
+            modules[r][c] = (
+                (r <= 6 and c <= 6)
+                and (r in (0, 6) or c in (0, 6) or (2 <= r <= 4 and 2 <= c <= 4)))
+    # reserve the format information
+    (left, right) = _formatInfoPositions(height, width)
+    for (row, col) in left + right:
+        modules[row][col] = False
+    return modules
+
+def _formatInfoPositions(height: int, width: int) -> (list, list):
+    '''
+    Returns the positions (row, column) of the 18 bits of the format information
+    beside the finder pattern, and beside the finder sub-pattern,
+    starting with the least significant bit.
+    '''
+    left = [(1 + n % 5, 8 + n // 5) for n in range(15)] + [(1, 11), (2, 11), (3, 11)]
+    right = ([(height - 6 + n % 5, width - 8 + n // 5) for n in range(15)]
+            + [(height - 6, width - 5), (height - 6, width - 4), (height - 6, width - 3)])
+    return (left, right)
+
+class RMQRCode:
+    '''
+    A rectangular Micro QR Code encoding some data (bytes) in a single segment,
+    using the most compact mode that supports all of it.
+    If version (an index into VERSIONS) is None,
+    the one with the fewest modules that fits the data is used.
+
+    qr = RMQRCode(b'12345')
+    for row in qr.modules:
+        for dark in row:
+            # set pixel ...
+    '''
+
+    def __init__(self, data: bytes, version: int = None, errorCorrectLevel: str = 'M'):
+        if errorCorrectLevel not in ERROR_CORRECT_LEVELS:
+            raise RuntimeError(f"rMQR Codes only support the error correction levels {ERROR_CORRECT_LEVELS}, not {errorCorrectLevel}")
+        self.data = data
+        self.errorCorrectLevel = errorCorrectLevel
+        if version is None:
+            version = min_version(data, errorCorrectLevel)
+            if version is None:
+                raise RuntimeError(f"Too much data ({len(data)} bytes) for an rMQR Code")
+        self.version = version
+        (self.height, self.width, _, _, _) = VERSIONS[version]
+        self.mode = choose_mode(data)
+        self.modules = []
+        self._make()
+
+    def getSize(self) -> (int, int):
+        return (self.width, self.height)
+
+    def isDark(self, row, col):
+        return self.modules[row][col]
+
+    def _encodeData(self, buf: BitBuffer):
+        count_bits = VERSIONS[self.version][2][(MODE_NUMBER, MODE_ALPHA_NUM, MODE_8BIT_BYTE).index(self.mode)]
+        buf.put(MODE_INDICATORS[self.mode], MODE_INDICATOR_BITS)
+        buf.put(len(self.data), count_bits)
+        if self.mode == MODE_NUMBER:
+            digits = self.data.decode('ascii')
+            for start in range(0, len(digits), 3):
+                group = digits[start:start + 3]
+                buf.put(int(group), (0, 4, 7, 10)[len(group)])
+        elif self.mode == MODE_ALPHA_NUM:
+            chars = [ALPHA_NUM_CHARS.index(chr(byte)) for byte in self.data]
+            for start in range(0, len(chars) - 1, 2):
+                buf.put(chars[start] * 45 + chars[start + 1], 11)
+            if len(chars) % 2 == 1:
+                buf.put(chars[-1], 6)
+        else:
+            for byte in self.data:
+                buf.put(byte, 8)
+
+    def _createCodewords(self) -> list:
+        '''
+        Encodes the data, splits it into blocks,
+        appends the error correction codewords to each,
+        and returns all of them interleaved.
+        '''
+        blocks = VERSIONS[self.version][3 + ERROR_CORRECT_LEVELS.index(self.errorCorrectLevel)]
+        dataCount = sum(count * size for (count, size) in blocks)
+        totalCount = count_modules(self.height, self.width) // 8
+        numBlocks = sum(count for (count, _) in blocks)
+        ecCount = (totalCount - dataCount) // numBlocks
+        capacity = dataCount * 8
+        if not fits(self.data, self.version, self.errorCorrectLevel):
+            raise RuntimeError(f"Too much data ({len(self.data)} bytes) for rMQR Code version {version_name(self.version)}-{self.errorCorrectLevel}")
+        buf = BitBuffer()
+        self._encodeData(buf)
+        # the terminator may be truncated, if the symbol is full
+        buf.put(0, min(TERMINATOR_BITS, capacity - buf.getLengthInBits()))
+        while buf.getLengthInBits() % 8 != 0:
+            buf.putBit(False)
+        index = 0
+        while buf.getLengthInBits() < capacity:
+            buf.put(PAD_CODEWORDS[index % 2], 8)
+            index += 1
+        data = [0xff & buf.getBuffer()[i] for i in range(dataCount)]
+
+        rsPoly = QRUtil.getErrorCorrectPolynomial(ecCount)
+        dcdata = []
+        ecdata = []
+        offset = 0
+        for (count, size) in blocks:
+            for _ in range(count):
+                block = data[offset:offset + size]
+                offset += size
+                modPoly = Polynomial(block, rsPoly.getLength() - 1).mod(rsPoly)
+                ecBlock = [0] * ecCount
+                for i in range(ecCount):
+                    modIndex = i + modPoly.getLength() - ecCount
+                    ecBlock[i] = modPoly.get(modIndex) if modIndex >= 0 else 0
+                dcdata.append(block)
+                ecdata.append(ecBlock)
+        codewords = []
+        for i in range(max(len(block) for block in dcdata)):
+            codewords.extend(block[i] for block in dcdata if i < len(block))
+        for i in range(ecCount):
+            codewords.extend(block[i] for block in ecdata)
+        return codewords
+
+    def _setupFormatInfo(self):
+        data = (ERROR_CORRECT_LEVELS.index(self.errorCorrectLevel) << 5) | self.version
+        bits = _getBCHFormatInfo(data)
+        for (positions, mask) in zip(_formatInfoPositions(self.height, self.width), FORMAT_INFO_MASKS):
+            masked = bits ^ mask
+            for (n, (row, col)) in enumerate(positions):
+                self.modules[row][col] = ((masked >> n) & 1) == 1
+
+    def _make(self):
+        self.modules = _layOutFunctionPatterns(self.height, self.width)
+        bits = []
+        for codeword in self._createCodewords():
+            bits.extend(((codeword >> (7 - i)) & 1) == 1 for i in range(8))
+        index = 0
+        upwards = True
+        # two module wide columns, right to left, zig-zagging up and down,
+        # skipping the function patterns; the remaining modules stay light,
+        # and all of them get the only mask pattern of rMQR
+        for col in range(self.width - 2, 0, -2):
+            rows = range(self.height - 2, 0, -1) if upwards else range(1, self.height - 1)
+            for row in rows:
+                for c in (col, col - 1):
+                    if self.modules[row][c] is not None:
+                        continue
+                    dark = index < len(bits) and bits[index]
+                    index += 1
+                    if (row // 2 + c // 3) % 2 == 0:
+                        dark = not dark
+                    self.modules[row][c] = dark
+            upwards = not upwards
+        self._setupFormatInfo()
@@ -0,0 +1,113 @@
+'''
+Measures how loading, placeholder detection, injection and saving
+scale with board size, on synthetic boards (see board_generator.py).
+'''
+
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import concurrent.futures
+import csv
+import os
+import resource
+import time
+
+import click
+import pcbnew
+
+from board_generator import generate_board
+from kicad_pcb_patcher import patch_board
+from pixels_geometry import pixels_to_rects
+from placeholder2image import ident2pixels_source, replace_all_with, scanForPlaceholders, ID_PREFIX_QR_CODE, ID_PREFIX_DATA_MATRIX, ID_PREFIX_DATA_MATRIX_RECT
+
+COLUMNS = ('size', 'placeholders', 'board_mb', 'load_s', 'scan_s', 'inject_s', 'save_s', 'peak_rss_mb', 'rects')
+# The kinds of codes that can be injected, by identifier prefix
+CODE_PREFIXES = [ID_PREFIX_QR_CODE, ID_PREFIX_DATA_MATRIX, ID_PREFIX_DATA_MATRIX_RECT]
+
+def measure_board(board_file, output_file, patch=False, prefix=ID_PREFIX_QR_CODE) -> dict:
+    '''
+    Injects one small code (QR-Code by default,
+    see CODE_PREFIXES) per placeholder into a board,
+    timing each stage.
+    Meant to be run in a fresh process,
+    so the peak memory usage is that of this board alone.
+    '''
+    start = time.perf_counter()
+    pcb = pcbnew.LoadBoard(board_file)
+    loaded = time.perf_counter()
+    placeholders = scanForPlaceholders(pcb)
+    scanned = time.perf_counter()
+    pixels_sources = [ident2pixels_source(os.curdir, f"{prefix}Placeholder {index + 1}") for index in range(len(placeholders))]
+    replacements = replace_all_with(pcb, placeholders, pixels_sources, draw=not patch)
+    injected = time.perf_counter()
+    if patch:
+        patch_board(board_file, output_file, replacements)
+    else:
+        pcbnew.SaveBoard(output_file, pcb)
+    saved = time.perf_counter()
+    return {
+        'placeholders': len(placeholders),
+        'board_mb': os.path.getsize(board_file) / (1024 * 1024),
+        'load_s': loaded - start,
+        'scan_s': scanned - loaded,
+        'inject_s': injected - scanned,
+        'save_s': saved - injected,
+        # in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'rects': sum(len(pixels_to_rects(repl.pixels)) for repl in replacements),
+    }
+
+def run_benchmark(work_dir, sizes, patch=False, seed=0, prefix=ID_PREFIX_QR_CODE):
+    '''
+    Generates a board per size (that many placeholder polygons and decoys,
+    a quarter as many zones and footprints, and ten times as many tracks),
+    and measures each in a process of its own, yielding the results.
+    '''
+    os.makedirs(work_dir, exist_ok=True)
+    for size in sizes:
+        board_file = os.path.join(work_dir, f"synthetic-{size}.kicad_pcb")
+        output_file = os.path.join(work_dir, f"synthetic-{size}-REPLACED.kicad_pcb")
+        generate_board(board_file, polygons=size, zones=size // 4, decoys=size,
+                tracks=size * 10, footprints=size // 4, seed=seed)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(measure_board, board_file, output_file, patch, prefix).result()
+        result['size'] = size
+        yield result
+
+@click.command()
+@click.option('--work-dir', '-w', type=click.Path(dir_okay=True, file_okay=False, writable=True), default='scaling-benchmark',
+        help='Where to write the generated and injected boards to (default: scaling-benchmark)')
+@click.option('--size', '-s', 'sizes', type=click.IntRange(min=1), multiple=True,
+        help='Number of placeholder polygons per board; may be given multiple times (default: 10, 100, 1000)')
+@click.option('--patch', '-p', is_flag=True,
+        help='Write the output boards by patching the input file text (see placeholder2image.py --patch)')
+@click.option('--csv', 'csv_file', type=click.Path(dir_okay=False, file_okay=True, writable=True),
+        default=None, help='Also write the results to this CSV file')
+@click.option('--seed', type=click.INT, default=0,
+        help='Seed for the board generator (default: 0)')
+@click.option('--code', 'prefix', type=click.Choice(CODE_PREFIXES), default=ID_PREFIX_QR_CODE,
+        help='The kind of code to inject, by identifier prefix: QR-Code, square or rectangular Data Matrix (default: qr:)')
+def scaling_benchmark_cli(work_dir='scaling-benchmark', sizes=(), patch=False, csv_file=None, seed=0, prefix=ID_PREFIX_QR_CODE):
+    '''
+    Runs the injector over synthetic boards of increasing size,
+    and reports the time per stage, the peak memory usage
+    and the number of rectangles drawn.
+    '''
+    if len(sizes) == 0:
+        sizes = (10, 100, 1000)
+    print(' '.join(f"{column:>12}" for column in COLUMNS))
+    results = []
+    for result in run_benchmark(work_dir, sorted(sizes), patch, seed, prefix):
+        results.append(result)
+        print(' '.join(f"{result[column]:>12.3f}" if isinstance(result[column], float) else f"{result[column]:>12}"
+                for column in COLUMNS))
+    if csv_file is not None:
+        with open(csv_file, 'w', newline='') as csv_f:
+            writer = csv.DictWriter(csv_f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Written {csv_file}!")
+
+if __name__ == "__main__":
+    scaling_benchmark_cli()
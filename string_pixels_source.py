@@ -18,7 +18,9 @@ class StringPixelsSource(PixelsSource):
     '''
     def __init__(self, text: str):
         self.text = text
-        text_size = _FONT.getsize(text)
+        # getsize() was removed in Pillow 10; this is what it returned
+        (_, _, right, bottom) = _FONT.getbbox(text)
+        text_size = (right, bottom)
         image_size = (text_size[0] + 2, text_size[1] + 2)
         self.image = Image.new("RGBA", image_size, (0, 0, 0, 0))
         draw = ImageDraw.Draw(self.image)
@@ -0,0 +1,51 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from click.testing import CliRunner
+
+from board_generator import PLACEHOLDER_LAYERS, generate_board, generate_board_cli
+from kicad_pcb_patcher import scan_placeholder_elements
+from placeholder2image import ReplIdentsList, scan_placeholders_text
+
+def test_counts(tmp_path):
+    board = tmp_path / "board.kicad_pcb"
+
+    num_placeholders = generate_board(str(board), polygons=8, zones=3, decoys=5, tracks=7, footprints=2)
+
+    text = board.read_text()
+    assert num_placeholders == 11
+    assert text.count('\n  (gr_poly\n') == 8 + 5
+    assert text.count('\n  (zone ') == 3
+    assert text.count('\n  (segment ') == 7
+    assert text.count('\n  (footprint ') == 2
+    assert text.count('(') == text.count(')')
+
+def test_only_the_rectangles_are_placeholders(tmp_path):
+    board = tmp_path / "board.kicad_pcb"
+    generate_board(str(board), polygons=8, zones=2, decoys=10)
+
+    elements = scan_placeholder_elements(board.read_text())
+
+    assert len(elements) == 10
+    assert [props['zone'] for props in elements] == [True] * 2 + [False] * 8
+    assert [props['layers'][0] for props in elements[2:]] == list(PLACEHOLDER_LAYERS) * 2
+    assert len(scan_placeholders_text(str(board))) == 10
+
+def test_equal_seeds_give_equal_boards(tmp_path):
+    boards = [tmp_path / name for name in ("a.kicad_pcb", "b.kicad_pcb", "c.kicad_pcb")]
+    for (board, seed) in zip(boards, (1, 1, 2)):
+        generate_board(str(board), polygons=5, zones=1, decoys=3, tracks=4, footprints=1, seed=seed)
+
+    assert boards[0].read_bytes() == boards[1].read_bytes()
+    assert boards[0].read_bytes() != boards[2].read_bytes()
+
+def test_cli_writes_a_matching_list_file(tmp_path):
+    board = tmp_path / "board.kicad_pcb"
+    list_file = tmp_path / "idents.txt"
+
+    result = CliRunner().invoke(generate_board_cli, ['--output', str(board), '--polygons', '3', '--zones', '1',
+            '--repl-idents-list-file', str(list_file)])
+
+    assert result.exit_code == 0, result.output
+    assert ReplIdentsList.read(str(list_file)).getFor(str(board)) == [f"qr:Placeholder {index}" for index in range(1, 5)]
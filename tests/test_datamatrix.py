@@ -0,0 +1,78 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pytest
+
+import datamatrix
+from data_matrix_pixels_source import DataMatrixPixelsSource, calc_data_matrix_size
+
+# The 10x10 symbol encoding "123456" from ISO/IEC 16022, Annex O
+ISO_10X10_123456 = [
+    "#.#.#.#.#.",
+    "##..#.##.#",
+    "##.....#..",
+    "##...###.#",
+    "##....#...",
+    "#.....####",
+    "###.##....",
+    "####.##..#",
+    "#..###.#..",
+    "##########",
+]
+# The same data in the smallest rectangular symbol (read back with zxing-cpp)
+RECT_8X18_123456 = [
+    "#.#.#.#.#.#.#.#.#.",
+    "##..#.....##.....#",
+    "##...#..##.####.#.",
+    "##..##...#...###.#",
+    "####.##..###..#...",
+    "#.####...#...#.###",
+    "#....####.##.##.#.",
+    "##################",
+]
+
+def _rows(modules):
+    return [''.join('#' if dark else '.' for dark in row) for row in modules]
+
+def test_iso_example():
+    dm = datamatrix.DataMatrix(b'123456')
+
+    assert dm.getSize() == (10, 10)
+    assert dm.codewords == [142, 164, 186, 114, 25, 5, 88, 102]
+    assert _rows(dm.modules) == ISO_10X10_123456
+
+def test_rectangle():
+    dm = datamatrix.DataMatrix(b'123456', shape=datamatrix.SHAPE_RECTANGLE)
+
+    assert dm.getSize() == (18, 8)
+    assert dm.codewords[:4] == [142, 164, 186, datamatrix.PAD]
+    assert _rows(dm.modules) == RECT_8X18_123456
+
+@pytest.mark.parametrize("data, latch", [
+    (b'HELLO WORLD 2026', datamatrix.LATCH_C40),
+    (b'hello world', datamatrix.LATCH_TEXT),
+    (bytes([200, 201, 202, 203]), datamatrix.LATCH_BASE256),
+])
+def test_most_compact_encodation(data, latch):
+    (codewords, _) = datamatrix.encode(data)
+    assert codewords[0] == latch
+    assert len(codewords) < len(datamatrix.encode_ascii(data))
+
+def test_capacity():
+    (symbol, drop) = datamatrix.find_symbol(1558)
+    assert (symbol[:2], drop) == ((144, 144), False)
+    assert datamatrix.find_symbol(1559) is None
+    with pytest.raises(RuntimeError):
+        datamatrix.DataMatrix(bytes(range(256)) * 7)
+
+@pytest.mark.parametrize("content, shape", [
+    ("123456", datamatrix.SHAPE_SQUARE),
+    ("123456", datamatrix.SHAPE_RECTANGLE),
+    ("Hello, World!", datamatrix.SHAPE_SQUARE),
+    ("Hello, World!", datamatrix.SHAPE_RECTANGLE),
+])
+def test_calculated_size_matches(content, shape):
+    pixels = DataMatrixPixelsSource(content, shape=shape)
+    assert calc_data_matrix_size(content, shape=shape) == pixels.getSize()
+    assert len(pixels.getData()) == pixels.getSize()[0] * pixels.getSize()[1]
@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import gerber.rs274x
+
+from board_generator import HEADER
+from gerber_injector import GerberLayer, inject_all
+from placeholder2image import Placeholder, placeholders_from_text
+from qr_code_pixels_source import QrCodePixelsSource
+
+# A silk-screen placeholder from (10, 10) to (30, 30) mm, with a 0.3 mm outline,
+# once in the KiCad 6 and once in the KiCad 7+ format
+BOARD_6 = (HEADER + '  (gr_poly (pts (xy 10 10) (xy 30 10) (xy 30 30) (xy 10 30))'
+        + ' (layer "F.SilkS") (width 0.3) (fill solid) (tstamp 0b6d4f3e-5a8c-4e21-9d7f-3c2a1e0f9b11))\n)\n')
+BOARD_7 = (HEADER.replace('20211014', '20221018') + '  (gr_poly\n    (pts (xy 10 10) (xy 30 10) (xy 30 30) (xy 10 30))\n'
+        + '    (stroke (width 0.3) (type solid)) (fill solid) (layer "F.SilkS") (uuid "0b6d4f3e-5a8c-4e21-9d7f-3c2a1e0f9b11"))\n)\n')
+# The placeholder as plotted by KiCad: filled, and stroked along its outline
+PLOTTED = '''%TF.FileFunction,Legend,Top*%
+%FSLAX46Y46*%
+%MOMM*%
+%LPD*%
+%ADD10C,0.300000*%
+G01*
+G36*
+X10000000Y-10000000D02*
+X30000000Y-10000000D01*
+X30000000Y-30000000D01*
+X10000000Y-30000000D01*
+X10000000Y-10000000D01*
+G37*
+D10*
+X10000000Y-10000000D02*
+X30000000Y-10000000D01*
+X30000000Y-30000000D01*
+X10000000Y-30000000D01*
+X10000000Y-10000000D01*
+M02*
+'''
+
+def _contains(outer, inner) -> bool:
+    ((outer_x_min, outer_x_max), (outer_y_min, outer_y_max)) = outer
+    ((inner_x_min, inner_x_max), (inner_y_min, inner_y_max)) = inner
+    return (outer_x_min <= inner_x_min + 1e-9 and inner_x_max <= outer_x_max + 1e-9
+            and outer_y_min <= inner_y_min + 1e-9 and inner_y_max <= outer_y_max + 1e-9)
+
+def test_outline_width_is_scanned():
+    for board in (BOARD_6, BOARD_7):
+        (placeholder,) = placeholders_from_text(board)
+        assert placeholder.width == 300000
+        assert Placeholder.fromDict(placeholder.toDict()).width == 300000
+
+def test_plotted_placeholder_is_cleared(tmp_path):
+    gerber_path = tmp_path / "board-F_Silkscreen.gto"
+    gerber_path.write_text(PLOTTED)
+    layer = GerberLayer(str(gerber_path))
+    placeholders = placeholders_from_text(BOARD_6)
+
+    texts = inject_all([layer], placeholders, [QrCodePixelsSource("My Data", 1)], (0, 0))
+
+    plotted = gerber.rs274x.loads(PLOTTED, 'plotted').primitives
+    injected = gerber.rs274x.loads(texts[str(gerber_path)], 'injected').primitives[len(plotted):]
+    cleared = [primitive.bounding_box for primitive in injected if primitive.level_polarity == 'clear']
+    drawn = [primitive for primitive in injected if primitive.level_polarity == 'dark']
+    assert len(cleared) == 1
+    for primitive in plotted:
+        assert _contains(cleared[0], primitive.bounding_box), primitive
+    assert len(drawn) > 0
+    for primitive in drawn:
+        assert _contains(((10, 30), (-30, -10)), primitive.bounding_box)
@@ -0,0 +1,92 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pytest
+from PIL import Image, ImageDraw
+
+from image_pixels_source import (ImagePixelsSource, BINARIZE_DITHER, BINARIZE_THRESHOLD,
+        calc_fit_size, load_as_binary_image, read_image_size)
+from pixels_source import PixelsSource
+from placeholder2image import calc_pixel_size
+
+def _half_dark(path, size=(400, 200), mode='L'):
+    '''
+    Writes an image with a dark left and a light right half.
+    '''
+    img = Image.new(mode, size, 255)
+    ImageDraw.Draw(img).rectangle((0, 0, size[0] // 2 - 1, size[1] - 1), fill=0)
+    img.save(path)
+    return str(path)
+
+def test_calc_fit_size():
+    assert calc_fit_size((400, 200), (100, 100)) == (100, 50)
+    assert calc_fit_size((400, 200), (400, 400)) == (400, 200)
+    assert calc_fit_size((1000, 1), (10, 10)) == (10, 1)
+
+def test_downsampling_to_fit(tmp_path):
+    path = _half_dark(tmp_path / "half.png")
+    assert read_image_size(path, (100, 100)) == (100, 50)
+
+    pixels = ImagePixelsSource(path, (100, 100), BINARIZE_THRESHOLD)
+    assert pixels.getSize() == (100, 50)
+    for row in pixels.getBitRows():
+        # PIL uses 0 for black
+        assert row == '0' * 50 + '1' * 50
+
+@pytest.mark.parametrize('binarize', [BINARIZE_THRESHOLD, BINARIZE_DITHER])
+def test_small_images_are_not_resampled(tmp_path, binarize):
+    path = _half_dark(tmp_path / "half.png", (8, 4))
+    pixels = ImagePixelsSource(path, (100, 100), binarize)
+    assert pixels.getSize() == (8, 4)
+    assert pixels.getBitRows() == ['00001111'] * 4
+
+def test_too_large_images_suggest_fit():
+    with pytest.raises(RuntimeError, match='--fit'):
+        calc_pixel_size((1000000, 1000000), (400, 400))
+
+def _grey_steps(path, mode, size=(13, 5)):
+    '''
+    Writes an image with a different grey value in each column.
+    '''
+    img = Image.new('L', size)
+    img.putdata([(col * 255) // (size[0] - 1) for _ in range(size[1]) for col in range(size[0])])
+    if mode == 'P':
+        img = img.convert('RGB').quantize(colors=size[0])
+    img.save(path)
+    return str(path)
+
+def test_bi_level_images_are_used_as_they_are(tmp_path):
+    path = _half_dark(tmp_path / "half.png", (13, 5), mode='1')
+    with Image.open(path) as original:
+        original_bytes = original.tobytes()
+
+    for binarize in (BINARIZE_THRESHOLD, BINARIZE_DITHER):
+        img = load_as_binary_image(path, binarize=binarize)
+        assert img.mode == '1'
+        assert img.tobytes() == original_bytes
+
+def test_palette_threshold_matches_converting(tmp_path):
+    path = _grey_steps(tmp_path / "steps.png", 'P')
+    with Image.open(path) as original:
+        assert original.mode == 'P'
+        converted = original.convert('L').convert('1', dither=Image.NONE)
+
+    img = load_as_binary_image(path, binarize=BINARIZE_THRESHOLD)
+
+    assert img.tobytes() == converted.tobytes()
+    assert img.getextrema() == (0, 255)
+
+def test_black_and_white_palettes_are_not_dithered(tmp_path):
+    path = tmp_path / "half.png"
+    _half_dark(path, (13, 5), mode='P')
+
+    assert load_as_binary_image(str(path), binarize=BINARIZE_DITHER).tobytes() == \
+            load_as_binary_image(str(path), binarize=BINARIZE_THRESHOLD).tobytes()
+
+@pytest.mark.parametrize('mode', ['L', 'P'])
+def test_packed_bit_rows_match_the_data(tmp_path, mode):
+    pixels = ImagePixelsSource(_grey_steps(tmp_path / "steps.png", mode), binarize=BINARIZE_DITHER)
+
+    # the generic implementation, going through getData()
+    assert pixels.getBitRows() == PixelsSource.getBitRows(pixels)
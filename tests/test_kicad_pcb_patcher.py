@@ -0,0 +1,35 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pytest
+
+from board_generator import generate_board
+from kicad_pcb_patcher import find_placeholder_element, patch_text, scan_placeholder_elements
+from placeholder2image import ident2pixels_source, placeholders_from_text, replace_all_with
+
+def _board_text(tmp_path, newline='\n') -> str:
+    board = tmp_path / "board.kicad_pcb"
+    generate_board(str(board), polygons=3, zones=1, decoys=2, tracks=5, footprints=2)
+    return board.read_text().replace('\n', newline)
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_only_placeholders_change(tmp_path, newline):
+    text = _board_text(tmp_path, newline)
+    placeholders = placeholders_from_text(text)
+    replacements = replace_all_with(None, placeholders, [ident2pixels_source('.', "qr:Data"), None, None, None], draw=False)
+
+    patched = patch_text(text, replacements)
+
+    (start, end, _) = find_placeholder_element(text, replacements[0].placeholder.uuid, '  ')
+    assert patched.startswith(text[:start])
+    assert patched.endswith(text[end:])
+    footprint = patched[start:len(patched) - len(text) + end]
+    assert footprint.startswith('  (footprint "" ')
+    assert ('\r\n' in footprint) == (newline == '\r\n')
+    assert footprint.count('(fp_poly ') == len(replacements[0].getRects())
+    assert {props['uuid'] for props in scan_placeholder_elements(patched)} == {placeholder.uuid for placeholder in placeholders[1:]}
+
+def test_decoys_are_no_placeholders(tmp_path):
+    elements = scan_placeholder_elements(_board_text(tmp_path))
+    assert [props['zone'] for props in elements] == [True, False, False, False]
@@ -0,0 +1,64 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pytest
+
+import micro_qrcode
+from micro_qr_code_pixels_source import MicroQrCodePixelsSource, calc_micro_qr_code_size
+
+# The M2-L symbol encoding "01234567" from ISO/IEC 18004, Annex I,
+# with mask pattern 1 (also read back with zxing-cpp)
+ISO_M2_L_01234567 = [
+    "#######.#.#.#",
+    "#.....#.###.#",
+    "#.###.#..##.#",
+    "#.###.#..####",
+    "#.###.#.###..",
+    "#.....#.#...#",
+    "#######..####",
+    ".........##..",
+    "##.#....#...#",
+    ".##.#.#.#.#.#",
+    "###..#######.",
+    "...#.#....##.",
+    "###.#..##.###",
+]
+
+def _rows(modules):
+    return [''.join('#' if dark else '.' for dark in row) for row in modules]
+
+def test_iso_codewords():
+    qr = micro_qrcode.MicroQRCode(b'01234567')
+
+    assert (qr.version, qr.mode) == ('M2', micro_qrcode.MODE_NUMBER)
+    assert qr.codewords == ([0x40, 0x18, 0xAC, 0xC3, 0x00], [0x86, 0x0D, 0x22, 0xAE, 0x30])
+
+def test_iso_symbol():
+    qr = micro_qrcode.MicroQRCode(b'01234567')
+
+    assert qr.maskPattern == 1
+    assert _rows(qr.modules) == ISO_M2_L_01234567
+
+@pytest.mark.parametrize("data, version", [
+    (b'12345', 'M1'),
+    (b'1' * 6, 'M2'),
+    (b'SN-42', 'M2'),
+    (b'A' * 7, 'M3'),
+    (b'My Data', 'M3'),
+    (b'1' * 35, 'M4'),
+    (b'a' * 15, 'M4'),
+])
+def test_smallest_version(data, version):
+    assert micro_qrcode.MicroQRCode(data).version == version
+
+def test_too_much_data():
+    assert micro_qrcode.min_version(b'1' * 36) is None
+    with pytest.raises(RuntimeError):
+        micro_qrcode.MicroQRCode(b'a' * 16)
+
+@pytest.mark.parametrize("content", ["12345", "SN-0042", "My Data", "0" * 35])
+def test_calculated_size_matches(content):
+    pixels = MicroQrCodePixelsSource(content)
+    assert calc_micro_qr_code_size(content) == pixels.getSize()
+    assert len(pixels.getData()) == pixels.getSize()[0] * pixels.getSize()[1]
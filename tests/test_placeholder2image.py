@@ -0,0 +1,460 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import concurrent.futures
+import time
+
+import pytest
+from click.testing import CliRunner
+from PIL import Image
+
+import placeholder2image
+from board_generator import HEADER, generate_board
+from image_pixels_source import BINARIZE_THRESHOLD
+from kicad_pcb_patcher import scan_placeholder_elements
+from pixels_source import PixelsSource
+from qr_code_pixels_source import MASK_GEOMETRY
+
+IDENTS = ["qr:First", "skip", "qr:Third", "mqr:SN-4"]
+
+def _board(tmp_path, name="board.kicad_pcb", polygons=4, seed=0):
+    board = tmp_path / name
+    generate_board(str(board), polygons=polygons, seed=seed)
+    return str(board)
+
+def test_patch_without_kicad(tmp_path, monkeypatch):
+    monkeypatch.setattr(placeholder2image, 'pcbnew', None)
+    board = _board(tmp_path)
+    output = str(tmp_path / "board-REPLACED.kicad_pcb")
+    placeholders = placeholder2image.scan_placeholders_text(board)
+
+    stats = placeholder2image.process_board(board, output, str(tmp_path), IDENTS, patch=True)
+
+    assert (stats['replaced'], stats['skipped']) == (3, 1)
+    with open(output) as output_f:
+        text = output_f.read()
+    assert text.count('(footprint "" ') == 3
+    remaining = [props['uuid'] for props in scan_placeholder_elements(text)]
+    assert remaining == [placeholders[1].uuid]
+
+def test_patch_matches_kicad(tmp_path):
+    pcbnew = pytest.importorskip('pcbnew')
+    board = _board(tmp_path)
+    patched = str(tmp_path / "patched.kicad_pcb")
+    saved = str(tmp_path / "saved.kicad_pcb")
+
+    placeholder2image.process_board(board, patched, str(tmp_path), IDENTS, patch=True)
+    placeholder2image.process_board(board, saved, str(tmp_path), IDENTS)
+
+    def footprints(path):
+        pcb = pcbnew.LoadBoard(path)
+        return sorted((fp.m_Uuid.AsString(), tuple(fp.GetPosition()), fp.GetLayer(),
+                sorted((item.m_Uuid.AsString(), item.GetLayer(), tuple(item.GetBoundingBox().GetOrigin()), tuple(item.GetBoundingBox().GetEnd()))
+                        for item in fp.GraphicalItems()))
+                for fp in pcb.GetFootprints())
+    assert footprints(patched) == footprints(saved)
+
+def test_discover_boards_skips_outputs(tmp_path):
+    for name in ("a.kicad_pcb", "a-REPLACED.kicad_pcb", "a-REPLACED-0.kicad_pcb", "a-REPLACED-SN-7.kicad_pcb"):
+        (tmp_path / name).write_text("(kicad_pcb)\n")
+    assert placeholder2image.discover_boards(str(tmp_path)) == [str(tmp_path / "a.kicad_pcb")]
+
+def test_batch_rerun(tmp_path):
+    _board(tmp_path, polygons=2)
+    args = ['--batch', str(tmp_path), '--patch', '--images-root', str(tmp_path), '--range', 'serial=1:3',
+            'qr:A-{serial}', 'qr:B-{serial}']
+    outputs = [tmp_path / "board-REPLACED-0.kicad_pcb", tmp_path / "board-REPLACED-1.kicad_pcb"]
+
+    first = CliRunner().invoke(placeholder2image.replace_all_cli, args)
+    assert first.exit_code == 0, first.output
+    written = [output.read_bytes() for output in outputs]
+    second = CliRunner().invoke(placeholder2image.replace_all_cli, args)
+    assert second.exit_code == 0, second.output
+
+    assert "2 of 2 boards processed" in second.output
+    assert [output.read_bytes() for output in outputs] == written
+
+def _placeholder(layers, top_left=(0, 0), bottom_right=(10000000, 10000000)):
+    return placeholder2image.Placeholder.fromLayers(None, top_left, bottom_right,
+            [placeholder2image.layer_id(layer) for layer in layers], False)
+
+def test_footprint_cache_names_per_layer():
+    get_name = lambda placeholder: placeholder2image.FootprintLibraryCache.getName('.', "qr:Data", placeholder)
+    names = [get_name(_placeholder([layer])) for layer in ('F_SilkS', 'B_SilkS', 'F_Cu', 'In1_Cu', 'B_Cu')]
+    assert len(set(names)) == len(names)
+    # the position does not matter, as the footprints are placed relative to it
+    moved = _placeholder(['F_SilkS'], (5000000, 5000000), (15000000, 15000000))
+    assert get_name(moved) == names[0]
+    assert get_name(_placeholder(['F_SilkS'], bottom_right=(20000000, 10000000))) != names[0]
+
+def test_footprint_cache_lookup_follows_placeholders(tmp_path):
+    cache = placeholder2image.FootprintLibraryCache(str(tmp_path / "cache.pretty"))
+    placeholders = [_placeholder(['B_SilkS']), _placeholder(['F_Cu'])]
+    (names, futures) = cache.lookup('.', ["qr:A", "skip"], placeholders, load=False)
+    assert names == [placeholder2image.FootprintLibraryCache.getName('.', "qr:A", placeholders[0]), None]
+    assert names[0].endswith('-B_SilkS')
+    assert futures == [None, None]
+
+def test_geometry_mask_on_thin_placeholder(tmp_path):
+    board = tmp_path / "thin.kicad_pcb"
+    board.write_text(HEADER + '  (gr_poly (pts (xy 10 10) (xy 50 10) (xy 50 22) (xy 10 22))'
+            + ' (layer "F.SilkS") (width 0) (fill solid) (tstamp 6c8c5e1a-3c55-4d8e-9f4e-2b0f3f6a1d01))\n)\n')
+    output = str(tmp_path / "thin-REPLACED.kicad_pcb")
+    idents = ["qr:https://example.org/boards/0042"]
+
+    penalty = placeholder2image.process_board(str(board), output, str(tmp_path), idents, patch=True)
+    geometry = placeholder2image.process_board(str(board), output, str(tmp_path), idents, patch=True, qr_mask=MASK_GEOMETRY)
+
+    assert 'qr_rects' not in penalty
+    assert geometry['qr_rects'] < geometry['qr_rects_penalty']
+    with open(output) as output_f:
+        assert output_f.read().count('(fp_poly ') == geometry['qr_rects']
+
+def test_repl_idents_list_sections(tmp_path):
+    list_file = tmp_path / "idents.txt"
+    list_file.write_text("qr:Default\nskip\n[panels/*.kicad_pcb]\nqr:Panel\n[other.kicad_pcb]\n")
+    idents_list = placeholder2image.ReplIdentsList.read(str(list_file))
+    assert idents_list.getFor("main.kicad_pcb") == ["qr:Default", "skip"]
+    assert idents_list.getFor("panels/a.kicad_pcb") == ["qr:Panel"]
+    assert idents_list.getFor("sub/dir/other.kicad_pcb") == []
+
+def test_batch_over_project_tree(tmp_path):
+    (tmp_path / "panels").mkdir()
+    main = _board(tmp_path, "main.kicad_pcb", polygons=2)
+    panel = _board(tmp_path / "panels", "panel.kicad_pcb", polygons=1, seed=1)
+    broken = _board(tmp_path / "panels", "broken.kicad_pcb", polygons=3, seed=2)
+    list_file = tmp_path / "idents.txt"
+    list_file.write_text("qr:Main\nskip\n[panels/panel.kicad_pcb]\nqr:Panel\n")
+    args = ['--batch', str(tmp_path), '--patch', '--jobs', '2', '--repl-idents-list-file', str(list_file)]
+
+    result = CliRunner().invoke(placeholder2image.replace_all_cli, args)
+
+    assert "1 of 3 boards failed" in str(result.exception)
+    assert f"FAILED {broken}" in result.output
+    assert "2 of 3 boards processed" in result.output
+    for (board, replaced) in ((main, 1), (panel, 1)):
+        with open(board.replace('.kicad_pcb', '-REPLACED.kicad_pcb')) as output_f:
+            assert output_f.read().count('(footprint "" ') == replaced
+
+def test_expand_variables(tmp_path):
+    vars_csv = tmp_path / "vars.csv"
+    vars_csv.write_text("lot,site\nA,x\nB,y\n")
+    assert placeholder2image.parse_range("serial=10:16:3") == ('serial', range(10, 16, 3))
+    with pytest.raises(RuntimeError):
+        placeholder2image.parse_range("serial=10")
+    variables = list(placeholder2image.expand_variables([placeholder2image.parse_range("serial=1:3")], str(vars_csv)))
+    assert variables == [
+        {'lot': 'A', 'site': 'x', 'serial': 1},
+        {'lot': 'A', 'site': 'x', 'serial': 2},
+        {'lot': 'B', 'site': 'y', 'serial': 1},
+        {'lot': 'B', 'site': 'y', 'serial': 2},
+    ]
+
+def test_templated_qr_codes_match_literal_ones():
+    variables = {'serial': 42, 'index': 0}
+    templated = placeholder2image.ident2pixels_source('.', "qr:https://example.org/SN/{serial:05d}", variables=variables)
+    literal = placeholder2image.ident2pixels_source('.', "qr:https://example.org/SN/00042")
+    assert templated.getDigest() == literal.getDigest()
+
+def test_templated_outputs(tmp_path):
+    _board(tmp_path, polygons=1)
+    args = ['--input', str(tmp_path / "board.kicad_pcb"), '--output', str(tmp_path / "out-{serial}.kicad_pcb"), '--patch',
+            '--range', 'serial=7:10', 'qr:SN-{serial}']
+    result = CliRunner().invoke(placeholder2image.replace_all_cli, args)
+    assert result.exit_code == 0, result.output
+    for serial in range(7, 10):
+        assert f"SN-{serial}" in (tmp_path / f"out-{serial}.kicad_pcb").read_text()
+
+    result = CliRunner().invoke(placeholder2image.replace_all_cli, args[:3] + ['out.kicad_pcb'] + args[4:])
+    assert "--output has to be a template too" in str(result.exception)
+
+class _Pixels(PixelsSource):
+    '''
+    A 2x2 pixels source, with only the top-left pixel on.
+    '''
+    def getSize(self):
+        return (2, 2)
+
+    def getData(self):
+        return [1, 0, 0, 0]
+
+def test_placeholders_and_replacements_are_slotted():
+    placeholder = _placeholder(['F_SilkS'])
+    assert not hasattr(placeholder, '__dict__')
+    assert not hasattr(placeholder2image.Replacement(None, placeholder, _Pixels()), '__dict__')
+    assert placeholder2image.Placeholder.fromDict(placeholder.toDict()).toDict() == placeholder.toDict()
+
+def test_replacement_geometry():
+    # 10 x 6 mm, so the pixels are 3 mm squares, centered horizontally
+    front = placeholder2image.Replacement(None, _placeholder(['F_SilkS'], (0, 0), (10000000, 6000000)), _Pixels())
+    assert front.size_pixel == (3000000, 3000000)
+    assert front.first_pixel_pos == (2000000, 0)
+    assert front.getRects() == [(2000000, 0, 5000000, 3000000)]
+    assert front.getRects(relative=True) == [(0, 0, 3000000, 3000000)]
+    # on the back, the pixels are laid out from right to left
+    back = placeholder2image.Replacement(None, _placeholder(['B_SilkS'], (0, 0), (10000000, 6000000)), _Pixels())
+    assert back.first_pixel_pos == (8000000, 0)
+    assert back.getRects() == [(5000000, 0, 8000000, 3000000)]
+    stretched = placeholder2image.Replacement(None, _placeholder(['F_Cu'], (0, 0), (10000000, 6000000)), _Pixels(), stretch=True)
+    assert stretched.size_pixel == (5000000, 3000000)
+
+def test_geometry_keys_of_equal_replacements():
+    qr = placeholder2image.ident2pixels_source('.', "qr:Same")
+    (first, second, back, larger) = [placeholder2image.Replacement(None, placeholder, qr) for placeholder in (
+            _placeholder(['F_SilkS'], (0, 0), (20000000, 20000000)),
+            _placeholder(['F_SilkS'], (30000000, 0), (50000000, 20000000)),
+            _placeholder(['B_SilkS'], (60000000, 0), (80000000, 20000000)),
+            _placeholder(['F_SilkS'], (0, 30000000), (40000000, 70000000)))]
+    assert first.getGeometryKey() == second.getGeometryKey()
+    assert back.getGeometryKey() != first.getGeometryKey()
+    assert back.getGeometryKey(flipped=True) == first.getGeometryKey()
+    assert larger.getGeometryKey() != first.getGeometryKey()
+
+def test_equal_replacements_are_drawn_once(tmp_path, monkeypatch):
+    pytest.importorskip('pcbnew')
+    board = tmp_path / "same.kicad_pcb"
+    board.write_text(HEADER + ''.join(
+            f'  (gr_poly (pts (xy {x} 10) (xy {x + 20} 10) (xy {x + 20} 30) (xy {x} 30))'
+            + f' (layer "{layer}") (width 0) (fill solid) (tstamp 00000000-0000-4000-8000-00000000000{index}))\n'
+            for (index, (x, layer)) in enumerate(((10, 'F.SilkS'), (40, 'F.SilkS'), (70, 'B.SilkS')))) + ')\n')
+    drawn = []
+    draw_pixels = placeholder2image.Replacement.drawPixels
+    monkeypatch.setattr(placeholder2image.Replacement, 'drawPixels', lambda repl: drawn.append(repl) or draw_pixels(repl))
+
+    stats = placeholder2image.process_board(str(board), str(tmp_path / "same-REPLACED.kicad_pcb"), str(tmp_path), ["qr:Same"] * 3)
+
+    assert stats['replaced'] == 3
+    assert len(drawn) == 1
+
+def test_pixels_sources_before_placeholders(tmp_path):
+    Image.new('1', (400, 400), 1).save(tmp_path / "logo.png")
+    idents = ["qr:Early", "logo.png", "skip"]
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = placeholder2image.submit_pixels_sources(executor, str(tmp_path), idents, BINARIZE_THRESHOLD,
+                cache=placeholder2image.PixelsSourcesCache())
+        # fitting the image has to wait for its placeholder
+        assert futures[1] is None
+        early = futures[0]
+        placeholders = [_placeholder(['F_SilkS'])] * 3
+        futures = placeholder2image.submit_pixels_sources(executor, str(tmp_path), idents, BINARIZE_THRESHOLD, placeholders,
+                futures=futures)
+        assert futures[0] is early
+        sources = [future.result() for future in futures]
+    assert sources[1].getSize() == (200, 200)
+    assert sources[2] is None
+
+def test_pixels_sources_are_created_once(monkeypatch):
+    created = []
+    def create(*args):
+        created.append(args[1])
+        time.sleep(0.05)
+        return args[1]
+    monkeypatch.setattr(placeholder2image, 'ident2pixels_source', create)
+    cache = placeholder2image.PixelsSourcesCache()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda ident: cache.get('.', ident), ["qr:A"] * 8 + ["qr:B"] * 8))
+    assert results == ["qr:A"] * 8 + ["qr:B"] * 8
+    assert sorted(created) == ["qr:A", "qr:B"]
+    assert (cache.hits, cache.misses) == (14, 2)
+
+def test_uuids_are_stable():
+    repl = placeholder2image.Replacement(None, _placeholder(['F_SilkS']), placeholder2image.ident2pixels_source('.', "qr:Data"))
+    # changing these changes every output, and thus invalidates all downstream caches
+    assert repl.pixels.getDigest() == 'adc643b20bfae5b9dc811fa6a7d8c749e7c5c07c'
+    assert repl.getUuid() == 'e4b197ac-64e9-508f-94e1-51237445b453'
+    assert repl.getUuid(0) == '815379a9-04c7-5ad5-8caa-f3707041105f'
+
+def test_outputs_are_reproducible(tmp_path):
+    board = _board(tmp_path)
+    digest_file = str(tmp_path / "sums.txt")
+    outputs = [str(tmp_path / f"run-{run}.kicad_pcb") for run in range(2)]
+    for output in outputs:
+        placeholder2image.process_board(board, output, str(tmp_path), IDENTS, patch=True)
+    assert placeholder2image.file_digest(outputs[0]) == placeholder2image.file_digest(outputs[1])
+
+    assert placeholder2image.write_digest_file(digest_file, outputs[:1])
+    assert not placeholder2image.write_digest_file(digest_file, outputs[:1])
+    with open(digest_file) as digest_f:
+        assert digest_f.read() == f"{placeholder2image.file_digest(outputs[0])}  {outputs[0]}\n"
+    placeholder2image.process_board(board, outputs[0], str(tmp_path), ["qr:Changed"] + IDENTS[1:], patch=True)
+    assert placeholder2image.write_digest_file(digest_file, outputs[:1])
+
+def test_show_order_as_text(tmp_path):
+    board = _board(tmp_path)
+    output = str(tmp_path / "order.kicad_pcb")
+    placeholders = placeholder2image.scan_placeholders_text(board)
+
+    stats = placeholder2image.process_board(board, output, str(tmp_path), [], show_order=placeholder2image.SHOW_ORDER_TEXT, patch=True)
+
+    assert stats['replaced'] == len(placeholders)
+    with open(output) as output_f:
+        text = output_f.read()
+    for (index, placeholder) in enumerate(placeholders):
+        label = placeholder2image.OrderLabel(None, placeholder, str(index + 1))
+        assert f'(gr_text "{index + 1}" ' in text
+        assert f'(layer "{placeholder.getLayerName()}") (tstamp {label.getUuid()})' in text
+        # the text fits its placeholder
+        assert label.size * len(label.text) * placeholder2image.OrderLabel.GLYPH_WIDTH <= placeholder.size_space[0]
+        assert label.size <= placeholder.size_space[1]
+    assert text.count('(justify mirror)') == sum(1 for placeholder in placeholders if placeholder.reverse)
+
+def test_show_order_as_pixels(tmp_path):
+    board = _board(tmp_path)
+    output = str(tmp_path / "order.kicad_pcb")
+    stats = placeholder2image.process_board(board, output, str(tmp_path), [], show_order=placeholder2image.SHOW_ORDER_RASTER, patch=True)
+    with open(output) as output_f:
+        assert output_f.read().count('(footprint "" ') == stats['replaced'] == 4
+
+def test_dry_run_board(tmp_path):
+    board = _board(tmp_path)
+    Image.new('1', (8, 6), 1).save(tmp_path / "logo.png")
+
+    stats = placeholder2image.dry_run_board(board, str(tmp_path), ["qr:First", "skip", "logo.png", "mqr:SN-4"])
+
+    assert (stats['placeholders'], stats['replaced'], stats['skipped']) == (4, 3, 1)
+    # the codes include a border of one module
+    assert stats['pixels'] == 23 * 23 + 8 * 6 + 15 * 15
+    assert stats['min_pitch'] >= placeholder2image.MIN_PIXEL_WIDTH
+    assert not (tmp_path / "board-REPLACED.kicad_pcb").exists()
+
+def test_dry_run_fails_on_too_large_content(tmp_path):
+    board = _board(tmp_path, polygons=1)
+    Image.new('1', (2000, 2000), 1).save(tmp_path / "huge.png")
+    args = ['--input', board, '--images-root', str(tmp_path), '--dry-run']
+
+    failed = CliRunner().invoke(placeholder2image.replace_all_cli, args + ['huge.png'])
+    assert failed.exit_code != 0
+    assert "WOULD FAIL" in failed.output
+    assert "too large" in failed.output
+
+    fitted = CliRunner().invoke(placeholder2image.replace_all_cli, args + ['--fit', BINARIZE_THRESHOLD, 'huge.png'])
+    assert fitted.exit_code == 0, fitted.output
+    assert "1 of 1 jobs would succeed" in fitted.output
+    assert not any(path.name.endswith("-REPLACED.kicad_pcb") for path in tmp_path.iterdir())
+
+def test_cpu_profile_includes_worker_threads(tmp_path):
+    import pstats
+    board = _board(tmp_path, polygons=2)
+    profile = tmp_path / "cpu.pstats"
+
+    result = CliRunner().invoke(placeholder2image.replace_all_cli, ['--input', board, '--images-root', str(tmp_path), '--patch',
+            '--profile-cpu', str(profile), 'qr:Profiled-1', 'qr:Profiled-2'])
+
+    assert result.exit_code == 0, result.output
+    functions = set(name for (_, _, name) in pstats.Stats(str(profile)).stats)
+    # main thread, and the worker threads creating the pixels sources
+    assert {'process_board', 'ident2pixels_source', 'encode'} <= functions
+
+def test_memory_profile_per_stage(tmp_path):
+    board = _board(tmp_path, polygons=2)
+
+    result = CliRunner().invoke(placeholder2image.replace_all_cli, ['--input', board, '--images-root', str(tmp_path), '--patch',
+            '--profile-mem', 'qr:Memory-1', 'qr:Memory-2'])
+
+    assert result.exit_code == 0, result.output
+    stages = [line.split(':')[0] for line in result.output.splitlines() if line.startswith("Memory after ")]
+    assert stages[:2] == ["Memory after scan placeholders", "Memory after pixels sources"]
+    assert stages[-1] == "Memory after SaveBoard"
+    assert "KiB" in result.output
+
+def _footprint_descrs(text):
+    return [line.strip() for line in text.splitlines() if line.strip().startswith('(descr ')]
+
+def test_watcher_redoes_only_the_changed_image(tmp_path, monkeypatch):
+    board = _board(tmp_path, polygons=2)
+    output = tmp_path / "board-REPLACED.kicad_pcb"
+    image = tmp_path / "logo.png"
+    Image.new('1', (4, 4), 1).save(image)
+    created = []
+    ident2pixels_source = placeholder2image.ident2pixels_source
+    def counting_ident2pixels_source(images_root, ident, *args):
+        created.append(ident)
+        return ident2pixels_source(images_root, ident, *args)
+    monkeypatch.setattr(placeholder2image, 'ident2pixels_source', counting_ident2pixels_source)
+    watcher = placeholder2image.BoardWatcher(board, str(output), str(tmp_path), ["logo.png", "qr:Watched"])
+
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        changed = watcher.findChanges()
+        assert changed == {board, str(image)}
+        watcher.update(changed, executor)
+        first = output.read_text()
+        assert watcher.findChanges() == set()
+
+        Image.new('1', (6, 3), 1).save(image)
+        changed = watcher.findChanges()
+        assert changed == {str(image)}
+        watcher.update(changed, executor)
+        second = output.read_text()
+
+    assert sorted(created) == ["logo.png", "logo.png", "qr:Watched"]
+    assert first.count('(footprint "" ') == second.count('(footprint "" ') == 2
+    assert first != second
+    assert _footprint_descrs(first)[1] == _footprint_descrs(second)[1]
+
+def test_watcher_follows_the_list_file(tmp_path):
+    board = _board(tmp_path, polygons=2)
+    output = tmp_path / "board-REPLACED.kicad_pcb"
+    list_file = tmp_path / "idents.txt"
+    list_file.write_text("qr:One\nskip\n")
+    watcher = placeholder2image.BoardWatcher(board, str(output), str(tmp_path),
+            placeholder2image.ReplIdentsList.read(str(list_file)).getFor(board), str(list_file))
+
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        watcher.update(watcher.findChanges(), executor)
+        assert output.read_text().count('(footprint "" ') == 1
+
+        list_file.write_text("qr:One\nqr:Two, now\n")
+        watcher.update(watcher.findChanges(), executor)
+        assert output.read_text().count('(footprint "" ') == 2
+
+def test_rects_index():
+    cell = placeholder2image.RECTS_INDEX_CELL
+    index = placeholder2image.RectsIndex([(0, 0, 10, 10), (-3 * cell, cell // 2, -cell, 3 * cell)])
+
+    assert index.intersects((5, 5, 6, 6))
+    # touching edges count
+    assert index.intersects((10, 10, 20, 20))
+    assert index.intersects((-cell // 2 - 2 * cell, 2 * cell, -cell // 2 - 2 * cell, 2 * cell))
+    # in the same grid cell, but apart
+    assert not index.intersects((11, 11, 20, 20))
+    assert not index.intersects((5 * cell, 5 * cell, 6 * cell, 6 * cell))
+    assert not placeholder2image.RectsIndex().intersects((0, 0, 10, 10))
+
+def test_zones_can_not_be_refilled_when_patching(tmp_path):
+    board = _board(tmp_path)
+    with pytest.raises(RuntimeError, match='--patch'):
+        placeholder2image.process_board(board, str(tmp_path / "out.kicad_pcb"), str(tmp_path), IDENTS, patch=True, refill=True)
+
+def _board_with_zones(tmp_path, layer):
+    '''
+    Writes a board with one placeholder on the given layer,
+    one (pentagon shaped) zone overlapping it, and one far away.
+    '''
+    from board_generator import BoardGenerator
+    gen = BoardGenerator()
+    pentagon = lambda x, y: [(x, y), (x + 20, y), (x + 25, y + 10), (x + 10, y + 20), (x - 5, y + 10)]
+    board = tmp_path / "zones.kicad_pcb"
+    board.write_text(HEADER
+            + gen.polygon([(10, 10), (20, 10), (20, 20), (10, 20)], layer)
+            + gen.zone(pentagon(5, 5), 'F.Cu')
+            + gen.zone(pentagon(100, 100), 'F.Cu')
+            + ')\n')
+    return str(board)
+
+def test_only_affected_zones_are_refilled(tmp_path):
+    pytest.importorskip('pcbnew')
+    board = _board_with_zones(tmp_path, 'F.Cu')
+
+    stats = placeholder2image.process_board(board, str(tmp_path / "out.kicad_pcb"), str(tmp_path), ["qr:Refill"], refill=True)
+
+    assert (stats['zones_refilled'], stats['zones_total']) == (1, 2)
+    assert stats['refill_seconds'] >= 0
+
+def test_silk_only_boards_are_not_refilled(tmp_path):
+    pytest.importorskip('pcbnew')
+    board = _board_with_zones(tmp_path, 'F.SilkS')
+
+    stats = placeholder2image.process_board(board, str(tmp_path / "out.kicad_pcb"), str(tmp_path), ["qr:Refill"], refill=True)
+
+    assert 'zones_refilled' not in stats
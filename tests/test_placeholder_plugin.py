@@ -0,0 +1,26 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pytest
+
+# The wizard can only be loaded with KiCad's python modules
+pcbnew = pytest.importorskip('pcbnew')
+pytest.importorskip('FootprintWizardBase')
+
+from placeholder_plugin import QRCodeWizard, qr_code_rects
+
+def test_qr_code_rects_are_cached():
+    qr_code_rects.cache_clear()
+    first = qr_code_rects("Example", 0, False)
+    assert qr_code_rects("Example", 0, False) is first
+    assert qr_code_rects.cache_info().hits == 1
+
+def test_rects_are_scaled_to_pixels():
+    wizard = QRCodeWizard.__new__(QRCodeWizard)
+    wizard.module = pcbnew.FOOTPRINT(None)
+    (wizard.pxWidth, wizard.pxHeight) = (500000, 500000)
+    polygon = wizard._createAxisAlignedRect(pcbnew.F_SilkS, (-1000000, -2000000), (1, 2, 3, 1))
+    box = polygon.GetPolyShape().BBox()
+    assert (box.GetLeft(), box.GetTop(), box.GetRight(), box.GetBottom()) == (-500000, -1000000, 1000000, -500000)
+    assert polygon.GetLayer() == pcbnew.F_SilkS
@@ -0,0 +1,33 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from click.testing import CliRunner
+from PIL import Image
+
+from board_generator import HEADER
+from preview_renderer import preview_cli
+
+# A single 10 mm silk-screen placeholder, which fits 200x200 pixels
+BOARD = (HEADER + '  (gr_poly (pts (xy 10 10) (xy 20 10) (xy 20 20) (xy 10 20))'
+        + ' (layer "F.SilkS") (width 0) (fill solid) (tstamp 5e0c7d2a-1f4b-4b6e-8a3d-9c2e1f0a7b44))\n)\n')
+
+def _args(tmp_path, *extra):
+    board = tmp_path / "board.kicad_pcb"
+    board.write_text(BOARD)
+    Image.new('1', (400, 400), 1).save(tmp_path / "logo.png")
+    return ['--input', str(board), '--output', str(tmp_path / "preview.svg"), '--images-root', str(tmp_path), *extra, "logo.png"]
+
+def test_preview_fits_images(tmp_path):
+    too_large = CliRunner().invoke(preview_cli, _args(tmp_path))
+    assert too_large.exit_code != 0
+    assert "--fit" in str(too_large.exception)
+
+    fitted = CliRunner().invoke(preview_cli, _args(tmp_path, '--fit', 'threshold'))
+    assert fitted.exit_code == 0, fitted.output
+    assert (tmp_path / "preview.svg").read_text().count('<rect') > 1
+
+def test_preview_rejects_unknown_fit(tmp_path):
+    result = CliRunner().invoke(preview_cli, _args(tmp_path, '--fit', 'nearest'))
+    assert result.exit_code == 2
+    assert "Invalid value for '--fit'" in result.output
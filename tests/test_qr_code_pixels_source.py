@@ -0,0 +1,26 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import qrcode
+from pixels_geometry import pixels_to_rects
+from qr_code_pixels_source import QrCodePixelsSource, MASK_GEOMETRY, MASK_MAX_PENALTY_RATIO
+
+def test_geometry_mask_stats_match_the_drawn_code():
+    pixels = QrCodePixelsSource("My Data", 1, maskStrategy=MASK_GEOMETRY)
+    penalty_pixels = QrCodePixelsSource("My Data", 1)
+    stats = pixels.maskStats
+
+    assert stats['mask'] == pixels.qrc.maskPattern
+    assert stats['rects'] == len(pixels_to_rects(pixels))
+    assert stats['penalty_mask'] == penalty_pixels.qrc.maskPattern
+    assert stats['penalty_mask_rects'] == len(pixels_to_rects(penalty_pixels))
+    assert stats['rects'] < stats['penalty_mask_rects']
+
+def test_geometry_mask_penalty_is_bounded():
+    pixels = QrCodePixelsSource("https://example.org/boards/0042", 1, maskStrategy=MASK_GEOMETRY)
+    penalties = []
+    for maskPattern in range(8):
+        pixels.qrc.make(maskPattern)
+        penalties.append(qrcode.QRUtil.getLostPoint(pixels.qrc))
+    assert penalties[pixels.maskStats['mask']] <= min(penalties) * MASK_MAX_PENALTY_RATIO
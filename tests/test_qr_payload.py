@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import zlib
+
+import pytest
+
+import qrcode
+import qr_payload
+from qr_code_pixels_source import ERROR_CORRECT_LEVEL, QrCodePixelsSource, calc_qr_code_size
+from qr_payload import (QrCompaction, TRANSFORM_BASE45_DEFLATE, TRANSFORM_HEX_NUMERIC, TRANSFORM_SEGMENTS,
+        TRANSFORM_UPPER)
+
+# A typical CI payload: a URL with a commit hash
+URL = "https://ci.example.org/builds/0123abcdef4567890abcdef0123456789abcdef01?serial=SN-0042"
+
+def _base45_decode(text: bytes) -> bytes:
+    values = [qr_payload.BASE45_CHARS.index(chr(char)) for char in text]
+    data = []
+    for i in range(0, len(values), 3):
+        chunk = values[i:i + 3]
+        value = sum(part * 45 ** power for (power, part) in enumerate(chunk))
+        data.extend(divmod(value, 256) if len(chunk) == 3 else (value,))
+    return bytes(data)
+
+@pytest.mark.parametrize('data, encoded', [
+    # the examples of RFC 9285
+    (b"AB", b"BB8"),
+    (b"Hello!!", b"%69 VD92EX0"),
+    (b"base-45", b"UJCLQE7W581"),
+    (b"ietf!", b"QED8WEX0"),
+    (b"", b""),
+])
+def test_base45(data, encoded):
+    assert qr_payload.base45_encode(data) == encoded
+    assert _base45_decode(encoded) == data
+
+def test_deflate_base45_round_trip():
+    compacted = qr_payload.deflate_base45(URL.encode())
+    assert set(compacted) <= qr_payload.ALPHA_NUM
+    assert zlib.decompress(_base45_decode(compacted)) == URL.encode()
+
+def test_hex_to_numeric():
+    assert qr_payload.hex_to_numeric(b"id=ffffffff") == b"id=4294967295"
+    # leading zeros are kept, through the width
+    assert qr_payload.hex_to_numeric(b"0000abcd") == b"0000043981"
+    # decimal numbers and short strings are left alone
+    assert qr_payload.hex_to_numeric(b"date=20260101 short=abc1234") == b"date=20260101 short=abc1234"
+
+def test_upper_case():
+    assert qr_payload.upper_case(b"https://User:Pw@Example.org/Path/ab12cd34ef?q=x") \
+            == b"HTTPS://User:Pw@EXAMPLE.ORG/Path/AB12CD34EF?q=x"
+    assert qr_payload.upper_case(b"no url, v1.2 20260101") == b"no url, v1.2 20260101"
+
+def test_prefix_map(tmp_path):
+    map_file = tmp_path / "prefixes.txt"
+    map_file.write_text("# long short\nhttps://ci.example.org/ https://c.io/\n\nhttps://ci.example.org/builds/ B:\n")
+
+    prefix_map = qr_payload.read_prefix_map(str(map_file))
+
+    # the longest prefix wins
+    assert qr_payload.apply_prefix_map(URL.encode(), prefix_map).startswith(b"B:0123abcdef")
+    assert qr_payload.apply_prefix_map(b"https://ci.example.org/x", prefix_map) == b"https://c.io/x"
+    map_file.write_text("just-one-column\n")
+    with pytest.raises(RuntimeError):
+        qr_payload.read_prefix_map(str(map_file))
+
+def test_segments_need_fewer_bits():
+    data = b"SN-0042/0123456789012345678901234567890123456789"
+    segments = qr_payload.segment(data)
+
+    assert b''.join(bytes(qrcode.QRUtil.stringToBytes(segment.data)) if isinstance(segment.data, str) else segment.data
+            for segment in segments) == data
+    assert [segment.getMode() for segment in segments] == [qrcode.Mode.MODE_ALPHA_NUM, qrcode.Mode.MODE_NUMBER]
+    def bits(segments):
+        return sum(4 + segment.getLengthInBits(1) + segment.getLength() * qr_payload.MODE_CHAR_COSTS[segment.getMode()] // 6
+                for segment in segments)
+    assert bits(segments) < bits([qrcode.QR8BitByte(data)])
+
+@pytest.mark.parametrize('transforms, version', [
+    ((), 5),
+    ((TRANSFORM_SEGMENTS,), 5),
+    ((TRANSFORM_SEGMENTS, TRANSFORM_UPPER), 4),
+    ((TRANSFORM_SEGMENTS, TRANSFORM_HEX_NUMERIC), 4),
+    ((TRANSFORM_SEGMENTS, TRANSFORM_BASE45_DEFLATE), 5),
+])
+def test_compaction_versions(transforms, version):
+    assert qr_payload.min_type_number(URL, ERROR_CORRECT_LEVEL) == 5
+    assert qr_payload.min_type_number(URL, ERROR_CORRECT_LEVEL, QrCompaction(transforms)) == version
+
+def test_compacted_pixels_source():
+    compaction = QrCompaction((TRANSFORM_SEGMENTS, TRANSFORM_HEX_NUMERIC))
+    pixels = QrCodePixelsSource(URL, compaction=compaction)
+
+    assert pixels.compactStats == {'version_before': 5, 'version': 4}
+    assert pixels.getSize() == calc_qr_code_size(URL, compaction=compaction) == (35, 35)
+    assert QrCodePixelsSource(URL).compactStats is None
+
+def test_compactions_are_cache_keys():
+    assert QrCompaction((TRANSFORM_UPPER, TRANSFORM_SEGMENTS)) == QrCompaction((TRANSFORM_SEGMENTS, TRANSFORM_UPPER))
+    assert len({QrCompaction((TRANSFORM_SEGMENTS,)), QrCompaction((TRANSFORM_SEGMENTS,)), QrCompaction()}) == 2
+    with pytest.raises(RuntimeError):
+        QrCompaction(('gzip',))
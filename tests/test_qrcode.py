@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import concurrent.futures
+import hashlib
+
+import pytest
+
+import qrcode
+
+# The total number of codewords of each QR-Code version (ISO/IEC 18004, table 1)
+TOTAL_CODEWORDS = (26, 44, 70, 100, 134, 172, 196, 242, 292, 346, 404, 466, 532, 581, 655, 733, 815, 901, 991, 1085,
+        1156, 1258, 1364, 1474, 1588, 1706, 1828, 1921, 2051, 2185, 2323, 2465, 2611, 2761, 2876, 3034, 3196, 3362, 3532, 3706)
+# ... and the number of remainder bits following them
+REMAINDER_BITS = (0, 7, 7, 7, 7, 7, 0, 0, 0, 0, 0, 0, 0, 3, 3, 3, 3, 3, 3, 3,
+        4, 4, 4, 4, 4, 4, 4, 3, 3, 3, 3, 3, 3, 3, 0, 0, 0, 0, 0, 0)
+# "my data" in byte mode, version 1-L, as encoded by an independent encoder (zxing-cpp)
+MY_DATA = (
+    '111111100101101111111',
+    '100000101101001000001',
+    '101110101100101011101',
+    '101110100101001011101',
+    '101110101000101011101',
+    '100000101001101000001',
+    '111111101010101111111',
+    '000000001111100000000',
+    '110100110110001110110',
+    '001010010000001101101',
+    '000110101100110001101',
+    '011011010011000000001',
+    '011100111000101010010',
+    '000000001111000101001',
+    '111111101100010111110',
+    '100000100011110100001',
+    '101110100111001100001',
+    '101110101001000011011',
+    '101110100010100110101',
+    '100000101100011010000',
+    '111111101101100011010',
+)
+
+def _encode(data, maskPattern=None):
+    return qrcode.encode((qrcode.QR8BitByte(data),), qrcode.ErrorCorrectLevel.L, None, maskPattern)
+
+def _rows(modules) -> list:
+    return [''.join('1' if dark else '0' for dark in row) for row in modules]
+
+def test_reference_code():
+    (typeNumber, maskPattern, modules) = _encode("my data")
+    assert (typeNumber, maskPattern) == (1, 7)
+    assert tuple(_rows(modules)) == MY_DATA
+
+@pytest.mark.parametrize('data, maskPattern, typeNumber, digest', [
+    # also verified with zxing-cpp, which however chooses other masks
+    ("https://example.org/" + "x" * 110, 0, 6, '634f66036f9abc9ec625282ce1bf4b07b0ff086282886ee92316ea6019aa3378'),
+    # with the version information blocks
+    ("z" * 250, 1, 10, 'dbc8e785816dd54d8872ccc7b04f79e83e98b9ec6ef366641f162889f09cdab3'),
+])
+def test_reference_digests(data, maskPattern, typeNumber, digest):
+    (actual_type_number, _, modules) = _encode(data, maskPattern)
+    assert actual_type_number == typeNumber
+    assert hashlib.sha256(''.join(_rows(modules)).encode()).hexdigest() == digest
+
+def test_templates_are_shared_and_complete():
+    for typeNumber in range(1, 41):
+        template = qrcode.QRTemplate.get(typeNumber)
+        assert qrcode.QRTemplate.get(typeNumber) is template
+        assert len(template.dataCells) == TOTAL_CODEWORDS[typeNumber - 1] * 8 + REMAINDER_BITS[typeNumber - 1]
+        assert len(set(template.dataCells)) == len(template.dataCells)
+
+def test_templates_stay_untouched():
+    template = qrcode.QRTemplate.get(1)
+    before = [row[:] for row in template.modules]
+    _encode("my data")
+    _encode("other data", 3)
+    assert template.modules == before
+
+def test_concurrent_encoding_matches_sequential(monkeypatch):
+    # start without any templates, so the threads also race to build them
+    monkeypatch.setattr(qrcode, '_templates', {})
+    payloads = [(f"payload {index} " + "x" * (index * 4), index % 8 if index % 3 == 0 else None)
+            for index in range(48)]
+    sequential = [_encode(data, maskPattern) for (data, maskPattern) in payloads]
+    monkeypatch.setattr(qrcode, '_templates', {})
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        concurrent_results = list(executor.map(lambda payload: _encode(*payload), payloads))
+
+    assert concurrent_results == sequential
+
+def test_qrcode_objects_only_receive_the_results():
+    qr = qrcode.QRCode()
+    qr.setErrorCorrectLevel(qrcode.ErrorCorrectLevel.L)
+    qr.addData("my data")
+    qr.make()
+
+    assert (qr.getTypeNumber(), qr.maskPattern, qr.getModuleCount()) == (1, 7, 21)
+    assert tuple(_rows(qr.modules)) == MY_DATA
@@ -0,0 +1,70 @@
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import pytest
+
+import rmqrcode
+from rmqr_code_pixels_source import RmqrCodePixelsSource, calc_rmqr_code_size
+
+# The R11x27-M symbol encoding "123456" (read back with zxing-cpp)
+R11X27_M_123456 = [
+    "#######.#.#.#.#.#.#.#.#.###",
+    "#.....#.###...#..###....#.#",
+    "#.###.#..######..#.......##",
+    "#.###.#...#...#.....#...#..",
+    "#.###.#......#..#######..##",
+    "#.....#..##....#....###.##.",
+    "#######.##.#.#.##.#..######",
+    "........##.##...###.#.#...#",
+    "##..#.###.#..#....##.##.#.#",
+    "#.#...##...##.#..#..#.#...#",
+    "###.#.#.#.#.#.#.#.#.#.#####",
+]
+
+def _rows(modules):
+    return [''.join('#' if dark else '.' for dark in row) for row in modules]
+
+def test_reference_symbol():
+    qr = rmqrcode.RMQRCode(b'123456')
+
+    assert rmqrcode.version_name(qr.version) == 'R11x27'
+    assert qr.getSize() == (27, 11)
+    assert _rows(qr.modules) == R11X27_M_123456
+
+def test_versions_are_consistent():
+    for (version, (height, width, _, blocks_m, blocks_h)) in enumerate(rmqrcode.VERSIONS):
+        total = rmqrcode.count_modules(height, width) // 8
+        for (level, blocks) in zip(rmqrcode.ERROR_CORRECT_LEVELS, (blocks_m, blocks_h)):
+            num_blocks = sum(count for (count, _) in blocks)
+            assert rmqrcode.data_codewords(version, level) < total
+            # all the blocks have the same number of error correction codewords
+            assert (total - rmqrcode.data_codewords(version, level)) % num_blocks == 0
+
+@pytest.mark.parametrize("data, level, name", [
+    (b'123456', 'M', 'R11x27'),
+    (b'HELLO WORLD', 'M', 'R13x27'),
+    (b'https://example.org/x', 'M', 'R13x43'),
+    # the largest capacities, of R17x139
+    (b'1' * 361, 'M', 'R17x139'),
+    (b'a' * 150, 'M', 'R17x139'),
+])
+def test_smallest_version(data, level, name):
+    assert rmqrcode.version_name(rmqrcode.min_version(data, level)) == name
+
+def test_too_much_data():
+    assert rmqrcode.min_version(b'1' * 362) is None
+    assert rmqrcode.min_version(b'a' * 151) is None
+    assert rmqrcode.min_version(b'1' * 361, 'H') is None
+    with pytest.raises(RuntimeError):
+        rmqrcode.RMQRCode(b'a' * 151)
+
+def test_unsupported_level():
+    with pytest.raises(RuntimeError):
+        rmqrcode.RMQRCode(b'123456', errorCorrectLevel='L')
+
+@pytest.mark.parametrize("content", ["123456", "SN-0042", "https://example.org/x"])
+def test_calculated_size_matches(content):
+    pixels = RmqrCodePixelsSource(content)
+    assert calc_rmqr_code_size(content) == pixels.getSize()
+    assert len(pixels.getData()) == pixels.getSize()[0] * pixels.getSize()[1]